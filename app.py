@@ -1,16 +1,28 @@
 # app.py
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context
+import numpy as np
 import pandas as pd
 from waitress import serve
+import json
+import os
 import sys
 
 # --- Import your matcher logic ---
-from matcher.preprocessing import load_and_clean_dataset
-from matcher.features import pre_filter_score
-from matcher.scoring import rank_candidates
+from matcher.preprocessing import load_candidates
+from matcher.ingest import DirectoryHolder, InvalidRecord, build_directory, journal_path_for
+from matcher.scoring import (
+    SCORING_MODES,
+    iter_rank_candidates,
+    rank_candidates_local,
+    rerank_pool,
+)
+from matcher.parallel_scoring import SCORING_WORKERS, ProcessScoringBackend
+from matcher.bulk import iter_bulk_matches
+from matcher.sessions import SESSION_POOL_SIZE, SearchSession, fetch_page, parse_page_query, search_sessions
 from matcher.llm_utils import extract_job_info_from_text, is_available
 from matcher.llm_utils import get_friendly_chat_response, extract_job_info_from_text, is_available
+from matcher import metrics
 
 # --- Initialize Flask App ---
 app = Flask(__name__)
@@ -18,18 +30,43 @@ app = Flask(__name__)
 # --- Global Initialization ---
 CANDIDATES_TO_SCORE_WITH_AI = 30
 TOP_N_RESULTS = 10
+LLM_BATCH_SIZE = None  # e.g. 5 to score five candidates per prompt; None scores one per call
+CANDIDATES_CSV = "data/Talent Profiles.csv"
+# "llm": LLM-scored shortlist; "local": every candidate scored offline; "hybrid": local, then LLM rerank of the best few
+SCORING_MODE = os.getenv("SCORING_MODE", "llm")
+LLM_RERANK_TOP = int(os.getenv("LLM_RERANK_TOP", "15"))
+BULK_MAX_JOBS = int(os.getenv("BULK_MAX_JOBS", "100"))
+PORT = int(os.getenv("PORT", "8080"))
+# Waitress worker threads: the number of requests served at once
+WAITRESS_THREADS = int(os.getenv("WAITRESS_THREADS", "4"))
 
-df_candidates = None
+# The live candidate data + indexes. Each request reads directory.current once and uses only that version.
+directory = None
 try:
-    df_candidates = load_and_clean_dataset("data/Talent Profiles.csv")
-    print(f"✅ Successfully loaded {len(df_candidates)} candidate profiles.")
+    candidates = load_candidates(CANDIDATES_CSV)
+    print(f"✅ Successfully loaded {len(candidates)} candidate profiles ({candidates.nbytes / 1e6:.1f} MB, memory-mapped).")
+    directory = DirectoryHolder(build_directory(candidates), journal_path=journal_path_for(CANDIDATES_CSV))
+    replayed = directory.replay_journal()
+    if replayed:
+        print(f"✅ Replayed {replayed} ingestion batches ({len(directory.current)} profiles).")
+    print(f"✅ Candidate indexes ready ({len(directory.current)} profiles).")
 except Exception as e:
     print(f"🚨 CRITICAL ERROR: Failed to load candidate data: {e}")
     sys.exit(1)
 
-if not is_available('openai') and not is_available('gemini'):
-    print("🚨 CRITICAL ERROR: No LLM providers are available.")
-    sys.exit(1)
+LLM_AVAILABLE = is_available('openai') or is_available('gemini')
+if SCORING_MODE not in SCORING_MODES:
+    print(f"⚠️ Unknown SCORING_MODE '{SCORING_MODE}'. Using 'llm'.")
+    SCORING_MODE = "llm"
+if not LLM_AVAILABLE:
+    print("⚠️ No LLM providers are available. Running in local scoring mode only.")
+    SCORING_MODE = "local"
+
+# Local/hybrid scoring of the whole directory across SCORING_WORKERS processes (1 = in the request thread)
+scoring_backend = None
+if SCORING_WORKERS > 1:
+    scoring_backend = ProcessScoringBackend(SCORING_WORKERS)
+    print(f"✅ Local scoring runs on {SCORING_WORKERS} worker processes.")
 
 
 # ==============================================================================
@@ -44,6 +81,85 @@ def home():
 # ==============================================================================
 # --- Backend API Route ---
 # ==============================================================================
+def _shortlist(snapshot, job_prompt, job_details, pool_size=None):
+    """
+    Pre-filter + semantic retrieval; returns the rows worth spending LLM calls on.
+    With pool_size, the shortlist is followed by the next best candidates, up to pool_size rows in all.
+    """
+    # Pre-filter scores are a per-request array, so the shared DataFrame is never mutated.
+    # Semantic retrieval then pools embedding neighbours with the best keyword matches.
+    with metrics.stage("prefilter"):
+        pre_scores = snapshot.prefilter_index.score(job_details)
+    with metrics.stage("retrieval"):
+        retriever = snapshot.retriever
+        query_vec = retriever.store.encode_query(job_prompt)
+        shortlist = retriever.retrieve(job_prompt, CANDIDATES_TO_SCORE_WITH_AI, pre_scores=pre_scores,
+                                       query_vec=query_vec)
+        if pool_size and pool_size > len(shortlist):
+            # A larger k re-ranks a larger pool, so the shortlist itself stays first
+            extra = retriever.retrieve(job_prompt, pool_size, pre_scores=pre_scores, query_vec=query_vec)
+            shortlist = np.concatenate([shortlist, extra[~np.isin(extra, shortlist)]])[:pool_size]
+    return snapshot.candidates.rows(shortlist)
+
+
+def _rank_local(snapshot, job_details, top_n):
+    """Local scores for the whole directory, on the process pool when one is configured."""
+    if scoring_backend is not None:
+        with metrics.stage("local_scoring"):
+            return scoring_backend.rank(snapshot, job_details, top_n)
+    return rank_candidates_local(snapshot.candidates, job_details, top_n=top_n, store=snapshot.embedding_store,
+                                 engine=snapshot.feature_engine)
+
+
+def _open_session(snapshot, job_prompt, job_details, mode):
+    """
+    A search session over up to SESSION_POOL_SIZE candidates, and the pool's local aspect scores
+    (hybrid mode; provisional stream scores). Its first TOP_N_RESULTS page scores exactly the
+    candidates a one-shot search would: the retrieval shortlist, or the LLM_RERANK_TOP best local matches.
+    """
+    if mode == "local":
+        pool = _rank_local(snapshot, job_details, max(SESSION_POOL_SIZE, TOP_N_RESULTS))
+        return SearchSession(job_prompt, job_details, mode, pool, scores=dict(zip(pool.index, pool["match_score"]))), None
+    if mode == "hybrid":
+        pool, local_scores = rerank_pool(_rank_local(snapshot, job_details, max(SESSION_POOL_SIZE, LLM_RERANK_TOP)))
+        margin = LLM_RERANK_TOP - TOP_N_RESULTS
+    else:
+        pool, local_scores = _shortlist(snapshot, job_prompt, job_details, SESSION_POOL_SIZE), None
+        margin = CANDIDATES_TO_SCORE_WITH_AI - TOP_N_RESULTS
+    session = SearchSession(job_prompt, job_details, mode, pool, store=snapshot.embedding_store,
+                            margin=max(margin, 0), llm_batch_size=LLM_BATCH_SIZE)
+    return session, local_scores
+
+
+def _scoring_mode(data):
+    """Per-request "scoring_mode" (default SCORING_MODE); anything but local degrades to local without LLM keys."""
+    mode = data.get('scoring_mode') or SCORING_MODE
+    if mode not in SCORING_MODES:
+        raise ValueError(f"scoring_mode must be one of {', '.join(SCORING_MODES)}.")
+    return mode if LLM_AVAILABLE else "local"
+
+
+def _parse_job(job_prompt, mode, snapshot):
+    """LLM extraction, except in local mode; falls back to the rule-based parser if the LLM returns nothing."""
+    with metrics.stage("job_parsing"):
+        if mode != "local":
+            job_details = extract_job_info_from_text(job_prompt)
+            if job_details:
+                return job_details
+            print("⚠️ LLM job parsing failed. Using the rule-based parser.")
+        return snapshot.job_parser.parse(job_prompt)
+
+
+def _wants_timings(data):
+    """Per-request timing breakdown, opted into with ?timings=1 or "include_timings": true."""
+    return request.args.get('timings') in ('1', 'true') or bool(data.get('include_timings'))
+
+
+def _to_records(df):
+    """JSON-safe records (NaN -> null) that carry their candidate_id."""
+    return json.loads(df.assign(candidate_id=df.index).to_json(orient='records'))
+
+
 @app.route('/api/find_matches', methods=['POST'])
 def find_matches_api():
     """Receives a job description, processes it, and returns top candidates."""
@@ -53,27 +169,197 @@ def find_matches_api():
 
         if not job_prompt:
             return jsonify({"error": "Job description cannot be empty."}), 400
+        try:
+            mode = _scoring_mode(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        trace = metrics.start_trace()
+        snapshot = directory.current
 
         # Step 1: Parse job description
         # This uses the simplified extract_job_info_from_text which has a fixed set of fields
-        job_details = extract_job_info_from_text(job_prompt)
+        job_details = _parse_job(job_prompt, mode, snapshot)
         if not job_details:
             return jsonify({"error": "Could not parse job description."}), 500
 
-        # Step 2 & 3: Filter and Score
-        df_candidates["pre_score"] = df_candidates.apply(lambda row: pre_filter_score(row, job_details), axis=1)
-        top_prospects_df = df_candidates.sort_values(by="pre_score", ascending=False).head(CANDIDATES_TO_SCORE_WITH_AI)
-        top_candidates_df = rank_candidates(top_prospects_df, job_details, top_n=TOP_N_RESULTS)
+        # Step 2 & 3: Filter and Score (the first page of a search session; later pages come from
+        # /api/find_matches/sessions/<id> without re-running the search)
+        session, _ = _open_session(snapshot, job_prompt, job_details, mode)
+        top_candidates_df = fetch_page(session, parse_page_query({}, TOP_N_RESULTS))["results"]
+        search_sessions.add(session)
+        metrics.record_search_tokens("find_matches")
 
         # Step 4: Format and return results
         results = top_candidates_df.to_dict(orient='records')
-        return jsonify(results)
+        if _wants_timings(data):
+            response = jsonify({"results": results, "timings": trace.to_dict()})
+        else:
+            response = jsonify(results)
+        response.headers['X-Search-Session'] = session.id
+        return response
 
     except Exception as e:
         print(f"🚨 An error occurred in /api/find_matches: {e}")
         return jsonify({"error": "An internal server error occurred."}), 500
 
 
+@app.route('/api/find_matches/stream', methods=['POST'])
+def find_matches_stream_api():
+    """
+    Streaming variant of /api/find_matches (NDJSON, one event per line):
+    job -> shortlist (provisional feature scores) -> score (per candidate, as LLM scores arrive) -> results.
+    The results event carries the search session_id.
+    """
+    data = request.get_json() or {}
+    job_prompt = data.get('job_description')
+
+    if not job_prompt:
+        return jsonify({"error": "Job description cannot be empty."}), 400
+    try:
+        mode = _scoring_mode(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    include_timings = _wants_timings(data)
+
+    def event(payload):
+        return json.dumps(payload) + "\n"
+
+    def generate():
+        trace = metrics.start_trace()
+        try:
+            snapshot = directory.current
+            job_details = _parse_job(job_prompt, mode, snapshot)
+            if not job_details:
+                yield event({"event": "error", "error": "Could not parse job description."})
+                return
+            yield event({"event": "job", "job_details": job_details})
+
+            session, local_scores = _open_session(snapshot, job_prompt, job_details, mode)
+            first_page = parse_page_query({}, TOP_N_RESULTS)
+            if mode == "local":
+                # Nothing to wait for: the local ranking is already final
+                top_df = fetch_page(session, first_page)["results"]
+                updates = [("shortlist", top_df), ("results", top_df)]
+            else:
+                updates = iter_rank_candidates(session.unscored_rows(first_page), job_details, top_n=TOP_N_RESULTS,
+                                               store=snapshot.embedding_store, llm_batch_size=LLM_BATCH_SIZE,
+                                               provisional_scores=local_scores)
+            for update in updates:
+                if update[0] == "shortlist":
+                    yield event({"event": "shortlist", "candidates": _to_records(update[1])})
+                elif update[0] == "score":
+                    session.scores[update[1]] = update[2]
+                    yield event({"event": "score", "candidate_id": int(update[1]), "match_score": update[2]})
+                else:
+                    search_sessions.add(session)
+                    metrics.record_search_tokens("stream")
+                    results = {"event": "results", "results": _to_records(update[1]), "session_id": session.id}
+                    if include_timings:
+                        results["timings"] = trace.to_dict()
+                    yield event(results)
+
+        except Exception as e:
+            print(f"🚨 An error occurred in /api/find_matches/stream: {e}")
+            yield event({"event": "error", "error": "An internal server error occurred."})
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/find_matches/sessions/<session_id>')
+def search_session_api(session_id):
+    """
+    Another page of an earlier search, re-sorted and filtered from its session:
+    ?page=&page_size=&sort=match_score|monthly_rate|hourly_rate|views&order=asc|desc&country=&city=&min_rate=&max_rate=
+    Only candidates the page needs that were never scored cost LLM calls.
+    """
+    try:
+        session = search_sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown or expired search session."}), 404
+        try:
+            query = parse_page_query(request.args, TOP_N_RESULTS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        trace = metrics.start_trace()
+        page = fetch_page(session, query)
+        metrics.record_search_tokens("session_page")
+        response = dict(page, session_id=session.id, results=_to_records(page["results"]))
+        if _wants_timings({}):
+            response["timings"] = trace.to_dict()
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/find_matches/sessions: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+@app.route('/api/find_matches/bulk', methods=['POST'])
+def find_matches_bulk_api():
+    """
+    Many job descriptions in one call: {"jobs": [text or {"id", "job_description"}, ...]}.
+    Streams one JSON line per job ({"index", "id", "job_details", "results"}) as each job finishes.
+    """
+    data = request.get_json() or {}
+    jobs = data.get('jobs')
+
+    if not isinstance(jobs, list) or not jobs:
+        return jsonify({"error": "jobs must be a non-empty list of job descriptions."}), 400
+    if len(jobs) > BULK_MAX_JOBS:
+        return jsonify({"error": f"At most {BULK_MAX_JOBS} jobs per request."}), 400
+    try:
+        mode = _scoring_mode(data)
+        top_n = int(data.get('top_n', TOP_N_RESULTS))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def generate():
+        metrics.start_trace()
+        snapshot = directory.current
+        try:
+            for match in iter_bulk_matches(jobs, snapshot, mode, top_n=top_n,
+                                           shortlist_size=CANDIDATES_TO_SCORE_WITH_AI, rerank_top=LLM_RERANK_TOP,
+                                           llm_batch_size=LLM_BATCH_SIZE, backend=scoring_backend):
+                yield json.dumps(match) + "\n"
+        except Exception as e:
+            print(f"🚨 An error occurred in /api/find_matches/bulk: {e}")
+            yield json.dumps({"error": "An internal server error occurred."}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/candidates/ingest', methods=['POST'])
+def ingest_candidates_api():
+    """Adds, updates or deletes candidate profiles without a restart."""
+    try:
+        data = request.get_json() or {}
+        upserts = data.get('upserts', [])
+        deletes = data.get('deletes', [])
+
+        if not upserts and not deletes:
+            return jsonify({"error": "Nothing to ingest."}), 400
+
+        summary = directory.apply_batch(upserts, deletes)
+        print(f"✅ Ingested batch: {summary}")
+        return jsonify(summary)
+
+    except InvalidRecord as e:
+        return jsonify({"error": str(e), "field": e.field}), 400
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/candidates/ingest: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+@app.route('/metrics')
+def metrics_api():
+    """Prometheus text exposition of stage latencies, LLM calls, fallbacks, retries, tokens and cache hits."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/ai_chat', methods=['POST'])
 def ai_chat_api():
     """Handles messages for the friendly AI assistant."""
@@ -98,4 +384,4 @@ def ai_chat_api():
 # ==============================================================================
 if __name__ == '__main__':
     print("🚀 Starting AI Talent Dashboard server...")
-    serve(app, host='0.0.0.0', port=8080)
\ No newline at end of file
+    serve(app, host='0.0.0.0', port=PORT, threads=WAITRESS_THREADS)
\ No newline at end of file
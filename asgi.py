@@ -0,0 +1,305 @@
+# asgi.py
+"""
+Async serving mode: the same routes and responses as app.py, as an ASGI app (Quart, Flask's async twin).
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+
+LLM calls go through the async OpenAI / Gemini clients (matcher.async_llm), so a search waiting on
+a provider costs a coroutine rather than a server thread; the CPU-bound steps (job parsing, pre-filter,
+retrieval, embedding and local / feature scoring) run on a bounded thread pool.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify, render_template, Response
+
+# Candidate directory, scoring backend and request helpers are shared with the WSGI server
+import app as wsgi
+from matcher import async_llm, metrics
+from matcher.bulk import iter_bulk_matches
+from matcher.ingest import InvalidRecord
+from matcher.scoring import iter_rank_candidates_async
+from matcher.sessions import fetch_page_async, parse_page_query, search_sessions
+
+# Threads for the CPU-bound steps of every in-flight search (numpy / torch release the GIL)
+ASYNC_CPU_WORKERS = int(os.getenv("ASYNC_CPU_WORKERS", str(min(32, (os.cpu_count() or 1) + 4))))
+
+app = Quart(__name__)
+
+
+@app.before_serving
+async def configure_executor():
+    # asyncio.to_thread runs on the loop's default executor and carries the request trace along
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS, thread_name_prefix="cpu"))
+    print(f"✅ Async server ready ({ASYNC_CPU_WORKERS} CPU worker threads).")
+
+
+def _llm_available():
+    return async_llm.is_available('openai') or async_llm.is_available('gemini')
+
+
+def _scoring_mode(data):
+    """app._scoring_mode, against the async clients."""
+    mode = wsgi._scoring_mode(data)
+    return mode if _llm_available() else "local"
+
+
+async def _parse_job(job_prompt, mode, snapshot):
+    """app._parse_job with the LLM extraction awaited."""
+    with metrics.stage("job_parsing"):
+        if mode != "local":
+            job_details = await async_llm.extract_job_info_from_text(job_prompt)
+            if job_details:
+                return job_details
+            print("⚠️ LLM job parsing failed. Using the rule-based parser.")
+        return await asyncio.to_thread(snapshot.job_parser.parse, job_prompt)
+
+
+def _wants_timings(data):
+    return request.args.get('timings') in ('1', 'true') or bool(data.get('include_timings'))
+
+
+async def _open_session(snapshot, job_prompt, job_details, mode):
+    """app._open_session on a worker thread (ranking, retrieval and feature scores are CPU work)."""
+    return await asyncio.to_thread(wsgi._open_session, snapshot, job_prompt, job_details, mode)
+
+
+# ==============================================================================
+# --- Frontend Route ---
+# ==============================================================================
+@app.route('/')
+async def home():
+    """Renders the main dashboard HTML page."""
+    return await render_template('index.html')
+
+
+# ==============================================================================
+# --- Backend API Routes ---
+# ==============================================================================
+@app.route('/api/find_matches', methods=['POST'])
+async def find_matches_api():
+    """Receives a job description, processes it, and returns top candidates."""
+    try:
+        data = await request.get_json()
+        job_prompt = data.get('job_description')
+
+        if not job_prompt:
+            return jsonify({"error": "Job description cannot be empty."}), 400
+        try:
+            mode = _scoring_mode(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        trace = metrics.start_trace()
+        snapshot = wsgi.directory.current
+
+        job_details = await _parse_job(job_prompt, mode, snapshot)
+        if not job_details:
+            return jsonify({"error": "Could not parse job description."}), 500
+
+        session, _ = await _open_session(snapshot, job_prompt, job_details, mode)
+        top_candidates_df = (await fetch_page_async(session, parse_page_query({}, wsgi.TOP_N_RESULTS)))["results"]
+        search_sessions.add(session)
+        metrics.record_search_tokens("find_matches")
+
+        results = top_candidates_df.to_dict(orient='records')
+        if _wants_timings(data):
+            response = jsonify({"results": results, "timings": trace.to_dict()})
+        else:
+            response = jsonify(results)
+        response.headers['X-Search-Session'] = session.id
+        return response
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/find_matches: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+@app.route('/api/find_matches/stream', methods=['POST'])
+async def find_matches_stream_api():
+    """Streaming variant of /api/find_matches (NDJSON; same events as app.py)."""
+    data = await request.get_json() or {}
+    job_prompt = data.get('job_description')
+
+    if not job_prompt:
+        return jsonify({"error": "Job description cannot be empty."}), 400
+    try:
+        mode = _scoring_mode(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    include_timings = _wants_timings(data)
+
+    def event(payload):
+        return json.dumps(payload) + "\n"
+
+    async def local_updates(session, first_page):
+        # Nothing to wait for: the local ranking is already final
+        top_df = (await fetch_page_async(session, first_page))["results"]
+        yield ("shortlist", top_df)
+        yield ("results", top_df)
+
+    async def generate():
+        trace = metrics.start_trace()
+        try:
+            snapshot = wsgi.directory.current
+            job_details = await _parse_job(job_prompt, mode, snapshot)
+            if not job_details:
+                yield event({"event": "error", "error": "Could not parse job description."})
+                return
+            yield event({"event": "job", "job_details": job_details})
+
+            session, local_scores = await _open_session(snapshot, job_prompt, job_details, mode)
+            first_page = parse_page_query({}, wsgi.TOP_N_RESULTS)
+            if mode == "local":
+                updates = local_updates(session, first_page)
+            else:
+                updates = iter_rank_candidates_async(session.unscored_rows(first_page), job_details,
+                                                     top_n=wsgi.TOP_N_RESULTS, store=snapshot.embedding_store,
+                                                     llm_batch_size=wsgi.LLM_BATCH_SIZE,
+                                                     provisional_scores=local_scores)
+            async for update in updates:
+                if update[0] == "shortlist":
+                    yield event({"event": "shortlist", "candidates": wsgi._to_records(update[1])})
+                elif update[0] == "score":
+                    session.scores[update[1]] = update[2]
+                    yield event({"event": "score", "candidate_id": int(update[1]), "match_score": update[2]})
+                else:
+                    search_sessions.add(session)
+                    metrics.record_search_tokens("stream")
+                    results = {"event": "results", "results": wsgi._to_records(update[1]), "session_id": session.id}
+                    if include_timings:
+                        results["timings"] = trace.to_dict()
+                    yield event(results)
+
+        except Exception as e:
+            print(f"🚨 An error occurred in /api/find_matches/stream: {e}")
+            yield event({"event": "error", "error": "An internal server error occurred."})
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/find_matches/sessions/<session_id>')
+async def search_session_api(session_id):
+    """Another page of an earlier search, as in app.py (sessions live in this process's memory)."""
+    try:
+        session = search_sessions.get(session_id)
+        if session is None:
+            return jsonify({"error": "Unknown or expired search session."}), 404
+        try:
+            query = parse_page_query(request.args, wsgi.TOP_N_RESULTS)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        trace = metrics.start_trace()
+        page = await fetch_page_async(session, query)
+        metrics.record_search_tokens("session_page")
+        response = dict(page, session_id=session.id, results=wsgi._to_records(page["results"]))
+        if _wants_timings({}):
+            response["timings"] = trace.to_dict()
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/find_matches/sessions: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+@app.route('/api/find_matches/bulk', methods=['POST'])
+async def find_matches_bulk_api():
+    """
+    Bulk matching as in app.py. The batch pipeline is thread-based already, so it runs on a worker
+    thread and each finished job is handed back to the event loop.
+    """
+    data = await request.get_json() or {}
+    jobs = data.get('jobs')
+
+    if not isinstance(jobs, list) or not jobs:
+        return jsonify({"error": "jobs must be a non-empty list of job descriptions."}), 400
+    if len(jobs) > wsgi.BULK_MAX_JOBS:
+        return jsonify({"error": f"At most {wsgi.BULK_MAX_JOBS} jobs per request."}), 400
+    try:
+        mode = _scoring_mode(data)
+        top_n = int(data.get('top_n', wsgi.TOP_N_RESULTS))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async def generate():
+        metrics.start_trace()
+        snapshot = wsgi.directory.current
+        matches = iter_bulk_matches(jobs, snapshot, mode, top_n=top_n,
+                                    shortlist_size=wsgi.CANDIDATES_TO_SCORE_WITH_AI, rerank_top=wsgi.LLM_RERANK_TOP,
+                                    llm_batch_size=wsgi.LLM_BATCH_SIZE, backend=wsgi.scoring_backend)
+        try:
+            while True:
+                match = await asyncio.to_thread(next, matches, None)
+                if match is None:
+                    break
+                yield json.dumps(match) + "\n"
+        except Exception as e:
+            print(f"🚨 An error occurred in /api/find_matches/bulk: {e}")
+            yield json.dumps({"error": "An internal server error occurred."}) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/candidates/ingest', methods=['POST'])
+async def ingest_candidates_api():
+    """Adds, updates or deletes candidate profiles without a restart."""
+    try:
+        data = await request.get_json() or {}
+        upserts = data.get('upserts', [])
+        deletes = data.get('deletes', [])
+
+        if not upserts and not deletes:
+            return jsonify({"error": "Nothing to ingest."}), 400
+
+        summary = await asyncio.to_thread(wsgi.directory.apply_batch, upserts, deletes)
+        print(f"✅ Ingested batch: {summary}")
+        return jsonify(summary)
+
+    except InvalidRecord as e:
+        return jsonify({"error": str(e), "field": e.field}), 400
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/candidates/ingest: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+@app.route('/metrics')
+async def metrics_api():
+    """Prometheus text exposition of stage latencies, LLM calls, fallbacks, retries, tokens and cache hits."""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/ai_chat', methods=['POST'])
+async def ai_chat_api():
+    """Handles messages for the friendly AI assistant."""
+    try:
+        data = await request.get_json()
+        user_message = data.get('message')
+
+        if not user_message:
+            return jsonify({"error": "Message cannot be empty."}), 400
+
+        ai_reply = await async_llm.get_friendly_chat_response(user_message)
+
+        return jsonify({"reply": ai_reply})
+
+    except Exception as e:
+        print(f"🚨 An error occurred in /api/ai_chat: {e}")
+        return jsonify({"error": "An internal server error occurred."}), 500
+
+
+# ==============================================================================
+# --- Run the Server ---
+# ==============================================================================
+if __name__ == '__main__':
+    import uvicorn
+
+    print("🚀 Starting AI Talent Dashboard server (async)...")
+    uvicorn.run(app, host='0.0.0.0', port=wsgi.PORT)
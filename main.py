@@ -1,14 +1,15 @@
 import pandas as pd
-from matcher.preprocessing import load_and_clean_dataset
-from matcher.features import extract_hobbies, pre_filter_score
+from matcher.preprocessing import load_candidates
+from matcher.embedding_store import build_embedding_store
+from matcher.features import pre_filter_score
 from matcher.scoring import rank_candidates
 from matcher.llm_utils import extract_job_info_from_text
 import os
 
 
-# Load and preprocess candidate profiles
-df = load_and_clean_dataset("data/Talent Profiles.csv")
-df["hobbies"] = df["Profile_clean"].apply(extract_hobbies)
+# Load and preprocess candidate profiles (hobbies, traits, verticals and creators are materialized at load time)
+df = load_candidates("data/Talent Profiles.csv").rows()
+store = build_embedding_store(df)
 
 # Parse job description using LLM
 job_prompt = """
@@ -17,7 +18,7 @@ job_prompt = """
 job = extract_job_info_from_text(job_prompt)
 
 # Score and rank
-top_candidates = rank_candidates(df, job, top_n=10)
+top_candidates = rank_candidates(df, job, top_n=10, store=store)
 
 # Display top matches
 print(top_candidates)
\ No newline at end of file
@@ -0,0 +1,267 @@
+# matcher/async_llm.py
+"""
+Async versions of the llm_utils entry points, used by the ASGI server (asgi.py).
+They send the same prompts and use the same cache and provider_manager rules, but await
+AsyncOpenAI and Gemini's generate_content_async, so a search waiting on an LLM holds no thread.
+"""
+
+import asyncio
+import json
+import os
+import weakref
+
+from openai import AsyncOpenAI
+
+from matcher import llm_utils, metrics
+from matcher.llm_utils import (
+    CHAT_FAILURE_MESSAGE,
+    CHAT_SYSTEM_PROMPT,
+    DEFAULT_JOB_FIELDS,
+    GEMINI_MODEL_NAME,
+    OPENAI_BASE_URL,
+    OPENAI_MODEL_NAME,
+    PROVIDER_LABELS,
+    ZERO_SCORES,
+    _gemini_batch_prompt,
+    _gemini_chat_prompt,
+    _gemini_extract_prompt,
+    _gemini_score_prompt,
+    _openai_batch_prompts,
+    _openai_extract_prompts,
+    _openai_request,
+    _openai_score_prompts,
+    _parse_batch_scores,
+    _record_gemini_usage,
+    _record_openai_usage,
+    clean_json_response,
+)
+from matcher.providers import HEDGED_OPERATIONS, LLM_TIMEOUT_SECONDS, openai_async_http_client
+
+# --- Concurrency (max in-flight requests per provider, per event loop) ---
+# Much higher than the thread-pool limits: a waiting request here costs a coroutine, not a thread.
+ASYNC_LLM_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_ASYNC_MAX_CONCURRENCY", "64")),
+    "gemini": int(os.getenv("GEMINI_ASYNC_MAX_CONCURRENCY", "32")),
+}
+# Scoring calls take a slot; extraction and chat are latency-critical and never queue behind them
+SLOTTED_OPERATIONS = ("score_candidate", "score_batch")
+
+async_openai_client = None
+try:
+    if os.getenv("OPENAI_API_KEY"):
+        # Retries are handled by provider_manager, not the SDK
+        async_openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=OPENAI_BASE_URL,
+                                          http_client=openai_async_http_client(), max_retries=0,
+                                          timeout=LLM_TIMEOUT_SECONDS)
+except Exception as e:
+    print(f"🚨 Failed to initialize the async OpenAI client: {type(e).__name__} - {e}")
+
+# Semaphores belong to one event loop, so each loop gets its own set
+_loop_slots = weakref.WeakKeyDictionary()
+
+
+def _slot(provider: str) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _loop_slots.get(loop)
+    if slots is None:
+        slots = _loop_slots[loop] = {name: asyncio.Semaphore(limit) for name, limit in ASYNC_LLM_CONCURRENCY.items()}
+    return slots[provider]
+
+
+def is_available(provider: str) -> bool:
+    """Check if a specific LLM provider has an async client."""
+    if provider.lower() == 'openai':
+        return async_openai_client is not None
+    if provider.lower() == 'gemini':
+        return llm_utils.GEMINI_MODEL is not None
+    return False
+
+
+def _load_json(content: str):
+    return json.loads(clean_json_response(content.strip()))
+
+
+def _load_batch(content: str) -> dict:
+    return _parse_batch_scores(content.strip())
+
+
+def _text(content: str) -> str:
+    return content
+
+
+async def _cached_call(provider: str, model: str, prompt: str, fields, call, use_cache: bool = True):
+    """llm_utils._cached_call for a coroutine call(); cache lookups run on a worker thread (SQLite)."""
+    cache = llm_utils.llm_cache
+    if not use_cache or not cache.enabled:
+        return await call()
+    key = cache.make_key(provider, model, prompt, fields)
+    cached = await asyncio.to_thread(cache.get, key)
+    metrics.record_cache(cached is not None)
+    if cached is not None:
+        return cached
+    result = await call()
+    await asyncio.to_thread(cache.set, key, result)
+    return result
+
+
+async def _openai_call(operation: str, system_prompt: str, user_prompt: str, parse, fields, use_cache: bool = True,
+                       json_mode: bool = True):
+    if async_openai_client is None:
+        raise RuntimeError("Async OpenAI client not initialized.")
+
+    request = lambda: async_openai_client.chat.completions.create(**_openai_request(system_prompt, user_prompt, json_mode))
+    if operation in SLOTTED_OPERATIONS:
+        request = _with_slot('openai', request)
+
+    async def call():
+        response = await llm_utils.provider_manager.send_async('openai', operation, request)
+        _record_openai_usage(response)
+        return parse(response.choices[0].message.content)
+
+    return await _cached_call('openai', OPENAI_MODEL_NAME, system_prompt + user_prompt, fields, call, use_cache)
+
+
+def _gemini_generate(prompt: str):
+    """
+    Awaitable generate_content. The SDK's REST transport (used with GEMINI_API_ENDPOINT) has no async
+    client, so then the blocking call runs on a worker thread.
+    """
+    options = {"timeout": LLM_TIMEOUT_SECONDS}
+    if llm_utils.GEMINI_API_ENDPOINT:
+        return asyncio.to_thread(llm_utils.GEMINI_MODEL.generate_content, prompt, request_options=options)
+    return llm_utils.GEMINI_MODEL.generate_content_async(prompt, request_options=options)
+
+
+async def _gemini_call(operation: str, prompt: str, parse, fields, use_cache: bool = True):
+    if not llm_utils.GEMINI_MODEL:
+        raise RuntimeError("Gemini model not initialized.")
+
+    request = lambda: _gemini_generate(prompt)
+    if operation in SLOTTED_OPERATIONS:
+        request = _with_slot('gemini', request)
+
+    async def call():
+        response = await llm_utils.provider_manager.send_async('gemini', operation, request)
+        _record_gemini_usage(response)
+        return parse(response.text)
+
+    return await _cached_call('gemini', GEMINI_MODEL_NAME, prompt, fields, call, use_cache)
+
+
+def _with_slot(provider: str, request):
+    """request (one HTTP call) awaited while holding one of the provider's concurrency slots, not its retries."""
+    async def run():
+        async with _slot(provider):
+            return await request()
+    return run
+
+
+async def _run_with_fallback(operation: str, action: str, attempts: dict):
+    """llm_utils._run_with_fallback for coroutine functions."""
+    def logged(provider, fn):
+        async def run():
+            print(f"-> {action} with {PROVIDER_LABELS[provider]}...")
+            try:
+                return await fn()
+            except Exception as e:
+                print(f"⚠️ {PROVIDER_LABELS[provider]} failed ({type(e).__name__}).")
+                raise
+        return run
+
+    manager = llm_utils.provider_manager
+    ready = [(provider, logged(provider, fn)) for provider, fn in attempts.items()
+             if is_available(provider) and not manager.is_open(provider)]
+    return await manager.first_success_async(operation, ready, hedge=operation in HEDGED_OPERATIONS)
+
+
+# ==============================================================================
+# --- Public entry points (same contracts as llm_utils) ---
+# ==============================================================================
+
+async def extract_job_info_from_text(text: str, fields_to_extract: list = None, use_cache: bool = True) -> dict:
+    """Async llm_utils.extract_job_info_from_text: OpenAI, then Gemini; {} if both fail."""
+    fields_to_extract = fields_to_extract or DEFAULT_JOB_FIELDS
+    try:
+        return await _run_with_fallback('extract_job', "Extracting job info", {
+            'openai': lambda: _openai_call('extract_job', *_openai_extract_prompts(text, fields_to_extract),
+                                           _load_json, fields_to_extract, use_cache),
+            'gemini': lambda: _gemini_call('extract_job', _gemini_extract_prompt(text, fields_to_extract),
+                                           _load_json, fields_to_extract, use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed ({type(e).__name__}). Cannot extract job info.")
+        return {}
+
+
+async def llm_score_candidate_aspects(candidate: dict, job: dict, use_cache: bool = True) -> dict:
+    """Async llm_utils.llm_score_candidate_aspects; zero scores if both providers fail."""
+    try:
+        return await _run_with_fallback('score_candidate', "Scoring", {
+            'openai': lambda: _openai_call(
+                'score_candidate', *_openai_score_prompts(candidate, job), _load_json, list(ZERO_SCORES), use_cache),
+            'gemini': lambda: _gemini_call(
+                'score_candidate', _gemini_score_prompt(candidate, job), _load_json, list(ZERO_SCORES), use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed ({type(e).__name__}). Returning zero scores.")
+        return dict(ZERO_SCORES)
+
+
+async def llm_score_candidate_batch(candidates: list, job: dict, use_cache: bool = True) -> list:
+    """Async llm_utils.llm_score_candidate_batch; candidates missing from the reply are scored individually."""
+    try:
+        scores = await _run_with_fallback('score_batch', f"Batch scoring {len(candidates)} candidates", {
+            'openai': lambda: _openai_call(
+                'score_batch', *_openai_batch_prompts(candidates, job), _load_batch, list(ZERO_SCORES), use_cache),
+            'gemini': lambda: _gemini_call(
+                'score_batch', _gemini_batch_prompt(candidates, job), _load_batch, list(ZERO_SCORES), use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed the batch ({type(e).__name__}). Scoring candidates individually.")
+        scores = {}
+
+    return [scores.get(str(candidate_id)) or await llm_score_candidate_aspects(candidate, job, use_cache)
+            for candidate_id, candidate in candidates]
+
+
+async def iter_candidate_scores(candidates: list, job: dict, batch_size: int = None, use_cache: bool = True):
+    """
+    Async llm_utils.iter_candidate_scores: every call (per candidate or per batch) is a task on the
+    event loop, and (candidate_id, scores) pairs are yielded as they complete.
+    Unfinished calls are cancelled if the consumer stops early (e.g. a streaming client disconnects).
+    """
+    if not candidates:
+        return
+    if batch_size and batch_size > 1:
+        chunks = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+    else:
+        chunks = [[pair] for pair in candidates]
+
+    async def work(chunk):
+        if batch_size and batch_size > 1:
+            return chunk, await llm_score_candidate_batch(chunk, job, use_cache)
+        return chunk, [await llm_score_candidate_aspects(chunk[0][1], job, use_cache)]
+
+    tasks = [asyncio.ensure_future(work(chunk)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            chunk, scores = await next_done
+            for (candidate_id, _), candidate_scores in zip(chunk, scores):
+                yield candidate_id, candidate_scores
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def get_friendly_chat_response(user_message: str) -> str:
+    """Async llm_utils.get_friendly_chat_response."""
+    try:
+        return await _run_with_fallback('chat', "Chatting", {
+            'openai': lambda: _openai_call('chat', CHAT_SYSTEM_PROMPT, user_message, _text, None,
+                                           use_cache=False, json_mode=False),
+            'gemini': lambda: _gemini_call('chat', _gemini_chat_prompt(user_message), _text, None, use_cache=False),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed for chat ({type(e).__name__}).")
+
+    return CHAT_FAILURE_MESSAGE
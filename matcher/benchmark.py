@@ -0,0 +1,318 @@
+# matcher/benchmark.py
+"""
+Offline ranking benchmark: runs the full search funnel (job parsing -> pre-filter -> retrieval ->
+rank_candidates) for the fixed jobs in benchmarks/jobs.json against the bundled CSV, with
+deterministic local stand-ins for the OpenAI/Gemini clients.
+
+    python -m matcher.benchmark --output benchmarks/results/my-change.json --compare benchmarks/results/main.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from matcher import llm_utils, metrics
+from matcher.evaluator import evaluate_ndcg_at_k, evaluate_precision_at_k, evaluate_recall_at_k
+from matcher.ingest import build_directory
+from matcher.preprocessing import load_candidates
+from matcher.prompt_builder import count_tokens
+from matcher.providers import ProviderManager
+from matcher.scoring import SCORING_MODES, rank_candidates, rank_candidates_local, rerank_pool
+
+DEFAULT_JOBS_PATH = os.path.join("benchmarks", "jobs.json")
+DEFAULT_OUTPUT_PATH = os.path.join("benchmarks", "results", "latest.json")
+DEFAULT_CSV_PATH = os.path.join("data", "Talent Profiles.csv")
+
+
+# ==============================================================================
+# --- Deterministic LLM stand-ins ---
+# ==============================================================================
+
+def _list_field(text: str, label: str) -> list:
+    """Parses a `label: a; b (+N more)` prompt line; 'none' or a missing line comes back empty."""
+    match = re.search(r"^[ \t]*" + re.escape(label) + r":[ \t]*(.*)$", text, re.MULTILINE)
+    if not match:
+        return []
+    value = re.sub(r"\s*\(\+\d+ more\)$", "", match.group(1).strip())
+    if value in ("", "none"):
+        return []
+    return [item.strip().lower() for item in value.split(";") if item.strip()]
+
+
+def _overlap(candidate_items: list, job_items: list) -> float:
+    if not job_items:
+        return 0.5
+    return round(len(set(candidate_items) & set(job_items)) / len(set(job_items)), 4)
+
+
+def _trait_overlap(profile: str, traits: list) -> float:
+    if not traits:
+        return 0.5
+    return round(sum(1 for trait in traits if trait.split("-")[0] in profile) / len(traits), 4)
+
+
+class FixtureLLM:
+    """
+    Answers extraction prompts with the recorded job_details from the fixture and scoring prompts
+    with a deterministic overlap heuristic over the lists embedded in the prompt.
+    """
+
+    def __init__(self, jobs: list, latency_s: float = 0.0):
+        self.jobs = jobs
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def respond(self, prompt: str) -> str:
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if "Job Description:" in prompt:
+            for job in self.jobs:
+                if job["description"].strip() in prompt:
+                    return json.dumps(job["job_details"])
+            return "{}"
+
+        job_skills = _list_field(prompt, "Job Skills")
+        job_types = _list_field(prompt, "Job Types")
+        job_traits = _list_field(prompt, "Job Traits")
+        blocks = re.split(r"\nCandidate (\S+):\n", prompt)
+        if len(blocks) > 1:
+            results = []
+            for candidate_id, block in zip(blocks[1::2], blocks[2::2]):
+                results.append({
+                    "candidate_id": candidate_id,
+                    "skills_score": _overlap(_list_field(block, "Skills"), job_skills),
+                    "jobtype_score": _overlap(_list_field(block, "Job Types"), job_types),
+                    "trait_score": _trait_overlap(block.lower(), job_traits),
+                })
+            return json.dumps({"results": results})
+
+        profile = prompt.split("Candidate Profile:", 1)[-1].lower()
+        return json.dumps({
+            "skills_score": _overlap(_list_field(prompt, "Candidate Skills"), job_skills),
+            "jobtype_score": _overlap(_list_field(prompt, "Candidate Job Types"), job_types),
+            "trait_score": _trait_overlap(profile, job_traits),
+        })
+
+
+class FixtureOpenAIClient:
+    """Quacks like openai.OpenAI for chat.completions.create."""
+
+    def __init__(self, llm: FixtureLLM):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self._llm = llm
+
+    def _create(self, model, messages, **kwargs):
+        prompt = "\n".join(message["content"] for message in messages)
+        content = self._llm.respond(prompt)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                total_tokens=prompt_tokens + completion_tokens)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage)
+
+
+class FixtureGeminiModel:
+    """Quacks like genai.GenerativeModel for generate_content."""
+
+    def __init__(self, llm: FixtureLLM):
+        self._llm = llm
+
+    def generate_content(self, prompt, **kwargs):
+        content = self._llm.respond(prompt)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        usage = SimpleNamespace(prompt_token_count=prompt_tokens, candidates_token_count=completion_tokens,
+                                total_token_count=prompt_tokens + completion_tokens)
+        return SimpleNamespace(text=content, usage_metadata=usage)
+
+
+def install_fixture_clients(jobs: list, latency_s: float = 0.0, provider: str = "openai") -> FixtureLLM:
+    """
+    Points llm_utils at the stand-ins (only `provider` is made available), disables the response cache
+    and lifts the provider rate limits.
+    """
+    llm = FixtureLLM(jobs, latency_s)
+    llm_utils.openai_client = FixtureOpenAIClient(llm) if provider == "openai" else None
+    llm_utils.GEMINI_MODEL = FixtureGeminiModel(llm) if provider == "gemini" else None
+    llm_utils.llm_cache.enabled = False
+    # The fixtures have no quota: measure the pipeline, not the production rate limits
+    llm_utils.provider_manager = ProviderManager(rate_limits={})
+    return llm
+
+
+# ==============================================================================
+# --- Runner ---
+# ==============================================================================
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if platform.system() == "Darwin" else peak / 1024, 1)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def _timed(timings: dict, stage: str, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[stage] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def run_benchmark(jobs_path: str = DEFAULT_JOBS_PATH, csv_path: str = DEFAULT_CSV_PATH, top_n: int = 10,
+                  shortlist_size: int = 30, llm_latency_ms: float = 0.0, llm_batch_size: int = None,
+                  provider: str = "openai", trace_memory: bool = False, scoring_mode: str = "llm",
+                  rerank_top: int = 15) -> dict:
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        jobs = json.load(f)["jobs"]
+
+    if trace_memory:
+        tracemalloc.start()
+    llm = install_fixture_clients(jobs, llm_latency_ms / 1000.0, provider)
+
+    load_timings = {}
+    candidates = _timed(load_timings, "load_candidates", load_candidates, csv_path)
+    directory = _timed(load_timings, "build_indexes", build_directory, candidates)
+
+    scored_per_job = {"llm": shortlist_size, "local": len(directory), "hybrid": len(directory)}[scoring_mode]
+    job_reports = []
+    total_start = time.perf_counter()
+    for job in jobs:
+        timings = {}
+        calls_before = llm.calls
+        trace = metrics.start_trace()
+        store = directory.embedding_store
+        if scoring_mode == "local":
+            job_details = _timed(timings, "job_parsing", directory.job_parser.parse, job["description"])
+            ranked = _timed(timings, "ranking", rank_candidates_local, directory.candidates, job_details, top_n=top_n,
+                            store=store, engine=directory.feature_engine)
+            prospects = ranked
+        else:
+            job_details = _timed(timings, "job_parsing", llm_utils.extract_job_info_from_text, job["description"])
+            if scoring_mode == "hybrid":
+                local_top = _timed(timings, "local_scoring", rank_candidates_local, directory.candidates, job_details,
+                                   top_n=rerank_top, store=store, engine=directory.feature_engine)
+                prospects, _ = rerank_pool(local_top)
+            else:
+                pre_scores = _timed(timings, "prefilter", directory.prefilter_index.score, job_details)
+                shortlist = _timed(timings, "retrieval", directory.retriever.retrieve, job["description"],
+                                   shortlist_size, pre_scores=pre_scores)
+                prospects = directory.candidates.rows(shortlist)
+            ranked = _timed(timings, "ranking", rank_candidates, prospects, job_details, top_n=top_n,
+                            store=store, llm_batch_size=llm_batch_size)
+        timings["total"] = round(sum(timings.values()), 3)
+
+        relevance = {int(cid): gain for cid, gain in job["relevance"].items()}
+        relevant = set(relevance)
+        ranked_ids = [int(cid) for cid in ranked.index]
+        shortlist_ids = [int(cid) for cid in prospects.index]
+        job_reports.append({
+            "id": job["id"],
+            "timings_ms": timings,
+            "llm_calls": llm.calls - calls_before,
+            "llm_tokens": dict(trace.tokens),
+            "quality": {
+                f"precision@{top_n}": round(evaluate_precision_at_k(ranked_ids, relevant, top_n), 4),
+                f"recall@{top_n}": round(evaluate_recall_at_k(ranked_ids, relevant, top_n), 4),
+                f"ndcg@{top_n}": round(evaluate_ndcg_at_k(ranked_ids, relevance, top_n), 4),
+                f"shortlist_recall@{len(shortlist_ids)}": round(evaluate_recall_at_k(shortlist_ids, relevant, len(shortlist_ids)), 4),
+            },
+            "top_ids": ranked_ids,
+        })
+    wall_s = time.perf_counter() - total_start
+
+    stages = job_reports[0]["timings_ms"].keys() if job_reports else []
+    quality_keys = job_reports[0]["quality"].keys() if job_reports else []
+    summary = {
+        "jobs": len(job_reports),
+        "wall_time_s": round(wall_s, 3),
+        "jobs_per_s": round(len(job_reports) / wall_s, 3) if wall_s else None,
+        "candidates_scored_per_s": round(len(job_reports) * scored_per_job / wall_s, 1) if wall_s else None,
+        "mean_timings_ms": {s: round(sum(r["timings_ms"][s] for r in job_reports) / len(job_reports), 3) for s in stages},
+        "mean_quality": {q: round(sum(r["quality"][q] for r in job_reports) / len(job_reports), 4) for q in quality_keys},
+        "llm_calls": sum(r["llm_calls"] for r in job_reports),
+        "llm_prompt_tokens": sum(r["llm_tokens"]["prompt"] for r in job_reports),
+        "llm_tokens_per_job": round(sum(r["llm_tokens"]["total"] for r in job_reports) / len(job_reports), 1)
+        if job_reports else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    if trace_memory:
+        summary["peak_python_heap_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 1)
+        tracemalloc.stop()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "candidates": len(directory),
+            "config": {"top_n": top_n, "shortlist_size": shortlist_size, "llm_latency_ms": llm_latency_ms,
+                       "llm_batch_size": llm_batch_size, "provider": provider, "scoring_mode": scoring_mode,
+                       "rerank_top": rerank_top},
+        },
+        "load_timings_ms": load_timings,
+        "summary": summary,
+        "jobs": job_reports,
+    }
+
+
+def compare_reports(current: dict, baseline: dict) -> list:
+    """Human-readable deltas of the summary timings and quality metrics."""
+    lines = []
+    for section in ("mean_timings_ms", "mean_quality"):
+        for key, value in current["summary"][section].items():
+            old = baseline.get("summary", {}).get(section, {}).get(key)
+            if old is None:
+                continue
+            delta = value - old
+            pct = f" ({delta / old * 100:+.1f}%)" if old else ""
+            lines.append(f"{section}.{key}: {old} -> {value}{pct}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ranking quality / latency benchmark.")
+    parser.add_argument("--jobs", default=DEFAULT_JOBS_PATH)
+    parser.add_argument("--csv", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--compare", help="Earlier results file to diff against")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--shortlist-size", type=int, default=30)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated per-call LLM latency")
+    parser.add_argument("--llm-batch-size", type=int, default=None)
+    parser.add_argument("--provider", choices=["openai", "gemini"], default="openai")
+    parser.add_argument("--trace-memory", action="store_true", help="Also report peak Python heap (slower)")
+    parser.add_argument("--scoring-mode", choices=SCORING_MODES, default="llm")
+    parser.add_argument("--rerank-top", type=int, default=15, help="Candidates the LLM rescores in hybrid mode")
+    args = parser.parse_args()
+
+    report = run_benchmark(args.jobs, args.csv, args.top_n, args.shortlist_size, args.llm_latency_ms,
+                           args.llm_batch_size, args.provider, args.trace_memory, args.scoring_mode,
+                           args.rerank_top)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report["summary"], indent=2))
+    print(f"✅ Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare_reports(report, json.load(f)):
+                print(line)
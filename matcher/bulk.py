@@ -0,0 +1,273 @@
+# matcher/bulk.py
+"""
+Bulk job matching: many job descriptions against one candidate directory.
+Jobs are parsed concurrently (through the LLM cache), encoded in one batch, and scored
+locally as a single candidates x jobs matrix; only the LLM rerank runs per job, and the
+per-job top N stream out as JSONL.
+
+    python -m matcher.bulk openings.jsonl --mode hybrid --output matches.jsonl
+"""
+
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from matcher import metrics
+from matcher.feature_engine import TRAIT_NAMES, budget_scores, creator_scores, top_positions, trait_weights
+from matcher.features import join_terms
+from matcher.llm_utils import extract_job_info_from_text
+from matcher.scoring import SCORE_WEIGHTS, rank_candidates
+from matcher.similarity import encode_texts
+
+BULK_PARSE_WORKERS = int(os.getenv("BULK_PARSE_WORKERS", "8"))
+BULK_RANK_WORKERS = int(os.getenv("BULK_RANK_WORKERS", "4"))
+# Candidate rows scored per block, which bounds the temporaries next to the score matrix
+MATRIX_BLOCK_ROWS = 50000
+
+# Embedding store field -> job field it is compared with
+QUERY_FIELDS = {"skills": "relevant_skills", "job_types": "job_types", "verticals": "content_verticals"}
+
+
+def normalize_jobs(items: list) -> list:
+    """Accepts job description strings or {"id", "job_description"} dicts; returns dicts with an id."""
+    jobs = []
+    for index, item in enumerate(items):
+        if isinstance(item, str):
+            item = {"job_description": item}
+        jobs.append({"id": item.get("id", index), "job_description": str(item.get("job_description") or "")})
+    return jobs
+
+
+def read_jobs(path: str) -> list:
+    """Jobs from a .jsonl file (one job per line), a .json list, or a text file with blank-line separated jobs."""
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    if path.lower().endswith(".jsonl"):
+        return normalize_jobs([json.loads(line) for line in text.splitlines() if line.strip()])
+    if path.lower().endswith(".json"):
+        data = json.loads(text)
+        return normalize_jobs(data["jobs"] if isinstance(data, dict) else data)
+    return normalize_jobs([block.strip() for block in text.split("\n\n") if block.strip()])
+
+
+def to_records(df) -> list:
+    """JSON-safe records (NaN -> null) that carry their candidate_id."""
+    return json.loads(df.assign(candidate_id=df.index).to_json(orient="records"))
+
+
+# ==============================================================================
+# --- Shared per-batch work: parsing and encoding ---
+# ==============================================================================
+
+def parse_jobs(jobs: list, directory, mode: str = "llm", max_workers: int = BULK_PARSE_WORKERS) -> list:
+    """
+    job_details per job. LLM extraction runs concurrently and goes through the LLM cache;
+    local mode, and any job the LLM can't parse, uses the directory's rule-based parser.
+    """
+    def parse(description):
+        if mode != "local" and description.strip():
+            job_details = extract_job_info_from_text(description)
+            if job_details:
+                return job_details
+        return directory.job_parser.parse(description)
+
+    with metrics.stage("job_parsing"), ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, parse, job["job_description"]) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def encode_jobs(jobs: list, job_details: list) -> dict:
+    """One encoder batch for every job field plus the full descriptions; field -> (jobs x dim) matrix."""
+    texts = {field: [join_terms(details.get(key, [])) for details in job_details]
+             for field, key in QUERY_FIELDS.items()}
+    texts["profile"] = [job["job_description"] for job in jobs]
+    flat = [text for field_texts in texts.values() for text in field_texts]
+    with metrics.stage("embedding"):
+        encoded = encode_texts(flat)
+    vectors, start = {}, 0
+    for field, field_texts in texts.items():
+        vectors[field] = encoded[start:start + len(field_texts)]
+        vectors[field + "_empty"] = np.array([not t.strip() for t in field_texts])
+        start += len(field_texts)
+    return vectors
+
+
+# ==============================================================================
+# --- Candidates x jobs local score matrix ---
+# ==============================================================================
+
+def local_score_matrix(directory, job_details: list, vectors: dict) -> np.ndarray:
+    """
+    rank_candidates_local's match_score for every (candidate, job) pair, as one (candidates x jobs) matrix.
+    Embedding scores are matrix products against all jobs at once; the feature tables come from the
+    directory's FeatureEngine, prepared once per job.
+    """
+    store, engine = directory.embedding_store, directory.feature_engine
+    prepared = [engine.prepare(details) for details in job_details]
+    weights = [trait_weights(details.get("personality_traits", [])) for details in job_details]
+    has_traits = np.array([w is not None for w in weights])
+    trait_matrix = np.stack([w if w is not None else np.zeros(len(TRAIT_NAMES), dtype=np.float32)
+                             for w in weights], axis=1)
+    location_tables = np.stack([p["location_table"] for p in prepared])
+
+    scores = np.zeros((len(engine), len(job_details)), dtype=np.float64)
+    with metrics.stage("local_scoring"):
+        for start in range(0, len(engine), MATRIX_BLOCK_ROWS):
+            stop = min(start + MATRIX_BLOCK_ROWS, len(engine))
+            block = {}
+            for field, name in (("skills", "skills_score"), ("job_types", "jobtype_score")):
+                sims = np.clip(np.asarray(store.matrices[field][start:stop] @ vectors[field].T, dtype=np.float32), 0.0, 1.0)
+                sims[:, vectors[field + "_empty"]] = 0.5
+                block[name] = sims
+            traits = np.asarray(engine.trait_flags[start:stop], dtype=np.float32) @ trait_matrix
+            traits[:, ~has_traits] = 0.5
+            block["trait_score"] = traits
+            block["vertical_sim"] = np.asarray(store.matrices["verticals"][start:stop] @ vectors["verticals"].T,
+                                               dtype=np.float32)
+            block["budget_sim"] = np.stack([budget_scores(engine.monthly_rate[start:stop], p["budget"])
+                                            for p in prepared], axis=1)
+            block["loc_sim"] = location_tables[:, engine.country_codes[start:stop]].T
+            indptr = engine.creator_indptr[start:stop + 1]
+            block["creator_sim"] = np.stack([creator_scores(indptr, engine.creator_indices, p["creator_index"])
+                                             for p in prepared], axis=1)
+            for name, weight in SCORE_WEIGHTS.items():
+                scores[start:stop] += weight * np.asarray(block[name], dtype=np.float64)
+    return np.round(scores, 4)
+
+
+def prospect_features(directory, job_details: list, vectors: dict, prospects: dict) -> dict:
+    """
+    scoring.feature_scores columns for each job's prospect rows ({job index: positions}), from the
+    directory's FeatureEngine and the batch's encoded verticals, so ranking a job only adds its LLM scores.
+    """
+    store, engine = directory.embedding_store, directory.feature_engine
+    features = {}
+    with metrics.stage("feature_scoring"):
+        for index, positions in prospects.items():
+            positions = np.asarray(positions, dtype=np.int64)
+            prepared = engine.prepare(job_details[index])
+            if vectors["verticals_empty"][index]:
+                vertical = np.zeros(len(positions), dtype=np.float32)
+            else:
+                vertical = np.asarray(store.matrices["verticals"][positions] @ vectors["verticals"][index], dtype=np.float32)
+            creators = creator_scores(engine.creator_indptr, engine.creator_indices, prepared["creator_index"])
+            features[index] = {
+                "vertical_sim": vertical.astype(np.float64),
+                "budget_sim": budget_scores(np.asarray(engine.monthly_rate[positions]), prepared["budget"]),
+                "loc_sim": prepared["location_table"][np.asarray(engine.country_codes[positions])],
+                "creator_sim": creators[positions],
+            }
+    return features
+
+
+# ==============================================================================
+# --- Driver ---
+# ==============================================================================
+
+def iter_bulk_matches(jobs: list, directory, mode: str = "llm", top_n: int = 10, shortlist_size: int = 30,
+                      rerank_top: int = 15, llm_batch_size: int = None, backend=None,
+                      max_workers: int = BULK_RANK_WORKERS):
+    """
+    Yields one dict per job ({"index", "id", "job_details", "results"} or {"index", "id", "error"}),
+    in completion order. Parsing, encoding, the local score matrix and the prospects' feature scores
+    are computed once for the whole batch; only the LLM scoring (llm / hybrid modes) runs per job,
+    max_workers jobs at a time. With a ProcessScoringBackend, the local top N are computed on its
+    process pool instead.
+    """
+    jobs = normalize_jobs(jobs)
+    if not jobs:
+        return
+    job_details = parse_jobs(jobs, directory, mode)
+    vectors = encode_jobs(jobs, job_details)
+    valid = [index for index, job in enumerate(jobs) if job["job_description"].strip()]
+
+    local_top = {}
+    if mode != "llm":
+        k = top_n if mode == "local" else rerank_top
+        if backend is not None:
+            job_vectors = [{field: vectors[field][index] for field in QUERY_FIELDS if not vectors[field + "_empty"][index]}
+                           for index in range(len(jobs))]
+            for index, top in enumerate(backend.top_positions(directory, job_details, k, job_vectors)):
+                local_top[index] = ([position for _, position in top], [score for score, _ in top])
+        else:
+            matrix = local_score_matrix(directory, job_details, vectors)
+            for index in range(len(jobs)):
+                positions = top_positions(matrix[:, index], k)
+                local_top[index] = (positions, matrix[positions, index])
+
+    prospects = {}
+    if mode == "hybrid":
+        prospects = {index: local_top[index][0] for index in valid}
+    elif mode == "llm":
+        for index in valid:
+            pre_scores = directory.prefilter_index.score(job_details[index])
+            prospects[index] = directory.retriever.retrieve(jobs[index]["job_description"], shortlist_size,
+                                                            pre_scores=pre_scores, query_vec=vectors["profile"][index])
+    features = prospect_features(directory, job_details, vectors, prospects)
+
+    def rank(index):
+        if mode == "local":
+            positions, scores = local_top[index]
+            return directory.candidates.rows(positions).assign(match_score=list(scores))
+        return rank_candidates(directory.candidates.rows(prospects[index]), job_details[index], top_n=top_n,
+                               llm_batch_size=llm_batch_size, features=features[index])
+
+    for index, job in enumerate(jobs):
+        if not job["job_description"].strip():
+            yield {"index": index, "id": job["id"], "error": "Job description cannot be empty."}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(contextvars.copy_context().run, rank, index): index for index in valid}
+        for future in as_completed(futures):
+            index = futures[future]
+            result = {"index": index, "id": jobs[index]["id"]}
+            try:
+                result.update({"job_details": job_details[index], "results": to_records(future.result())})
+            except Exception as e:
+                print(f"🚨 Bulk matching failed for job {jobs[index]['id']}: {e}")
+                result["error"] = "Could not score this job."
+            yield result
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from matcher.ingest import DirectoryHolder, build_directory, journal_path_for
+    from matcher.parallel_scoring import ProcessScoringBackend
+    from matcher.preprocessing import load_candidates
+    from matcher.scoring import SCORING_MODES
+
+    parser = argparse.ArgumentParser(description="Match many job descriptions against the candidate directory.")
+    parser.add_argument("jobs", help=".jsonl / .json with job_description (and optional id), or blank-line separated text")
+    parser.add_argument("--csv", default=os.path.join("data", "Talent Profiles.csv"))
+    parser.add_argument("--output", help="JSONL output file (default: stdout)")
+    parser.add_argument("--mode", choices=SCORING_MODES, default="llm")
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--shortlist-size", type=int, default=30)
+    parser.add_argument("--rerank-top", type=int, default=15)
+    parser.add_argument("--llm-batch-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=0, help="Process pool size for local scoring (0 = in-process)")
+    args = parser.parse_args()
+
+    holder = DirectoryHolder(build_directory(load_candidates(args.csv)), journal_path=journal_path_for(args.csv))
+    holder.replay_journal()
+    scoring_backend = ProcessScoringBackend(args.workers) if args.workers > 0 else None
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = 0
+        for match in iter_bulk_matches(read_jobs(args.jobs), holder.current, args.mode, args.top_n,
+                                       args.shortlist_size, args.rerank_top, args.llm_batch_size, scoring_backend):
+            out.write(json.dumps(match) + "\n")
+            out.flush()
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if scoring_backend is not None:
+            scoring_backend.close()
+    print(f"✅ Matched {count} jobs.", file=sys.stderr)
@@ -0,0 +1,366 @@
+# matcher/candidate_store.py
+"""
+Compact, read-only candidate table.
+Every column is a flat NumPy array so a saved store can be memory-mapped and shared between processes:
+text as UTF-8 bytes + offsets, low-cardinality fields as category codes, rates as float32 and token lists
+interned into an integer vocabulary. DataFrames are only materialized for the rows a request returns.
+"""
+
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns stored as category codes (-1 = missing)
+CATEGORICAL_COLUMNS = ("Gender", "City", "Country", "language")
+# Tokenized columns (lists of strings) follow this naming convention
+TOKEN_SUFFIX = "_list"
+# Derived from Profile Description on demand instead of storing the text twice
+PROFILE_COLUMN, PROFILE_SOURCE = "Profile_clean", "Profile Description"
+
+STORE_FORMAT = 1
+
+
+def clean_profile_text(series: pd.Series) -> pd.Series:
+    """Lowercased, stripped profile text (the Profile_clean column)."""
+    return series.fillna("").astype(str).str.lower().str.strip()
+
+
+def _gather(data: np.ndarray, offsets: np.ndarray, positions) -> tuple:
+    """Rows `positions` of a flat (data, offsets) column, as a new (data, offsets) pair."""
+    positions = np.asarray(positions, dtype=np.int64)
+    starts = np.asarray(offsets[positions])
+    lengths = np.asarray(offsets[positions + 1]) - starts
+    new_offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    index = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(new_offsets[-1], dtype=np.int64)
+    return np.asarray(data)[index], new_offsets
+
+
+def _append(data: np.ndarray, offsets: np.ndarray, other_data: np.ndarray, other_offsets: np.ndarray) -> tuple:
+    return (np.concatenate([data, other_data]),
+            np.concatenate([offsets, np.asarray(other_offsets[1:]) + offsets[-1]]))
+
+
+def _positions(positions, rows: int) -> np.ndarray:
+    return np.arange(rows, dtype=np.int64) if positions is None else np.asarray(positions, dtype=np.int64)
+
+
+class StringColumn:
+    """UTF-8 strings packed into one byte buffer with row offsets; missing values are flagged."""
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, missing: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values) -> "StringColumn":
+        missing = np.asarray(pd.isna(pd.Series(values, dtype=object)), dtype=np.bool_)
+        encoded = [b"" if absent else str(value).encode("utf-8") for value, absent in zip(values, missing)]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(encoded), dtype=np.uint8).copy(), offsets, missing)
+
+    def __len__(self):
+        return len(self.missing)
+
+    def values(self, positions=None) -> list:
+        positions = _positions(positions, len(self))
+        if len(positions) == 0:
+            return []
+        # Copy only the bytes of the requested rows: one slice for a run of rows, else a gather
+        if positions[-1] - positions[0] == len(positions) - 1 and (np.diff(positions) == 1).all():
+            start = int(self.offsets[positions[0]])
+            buffer = self.data[start:int(self.offsets[positions[-1] + 1])].tobytes()
+            bounds = (np.asarray(self.offsets[positions[0]:positions[-1] + 2]) - start).tolist()
+        else:
+            data, offsets = _gather(self.data, self.offsets, positions)
+            buffer, bounds = data.tobytes(), offsets.tolist()
+        missing = np.asarray(self.missing)[positions].tolist()
+        return [np.nan if missing[i] else buffer[bounds[i]:bounds[i + 1]].decode("utf-8")
+                for i in range(len(positions))]
+
+    def take(self, positions) -> "StringColumn":
+        data, offsets = _gather(self.data, self.offsets, positions)
+        return StringColumn(data, offsets, np.asarray(self.missing)[np.asarray(positions, dtype=np.int64)])
+
+    def concat(self, other: "StringColumn") -> "StringColumn":
+        data, offsets = _append(self.data, self.offsets, other.data, other.offsets)
+        return StringColumn(data, offsets, np.concatenate([self.missing, other.missing]))
+
+
+class TokenColumn:
+    """Token lists interned into an integer vocabulary: flat int32 codes with row offsets."""
+
+    def __init__(self, vocab: list, codes: np.ndarray, offsets: np.ndarray):
+        self.vocab = vocab
+        self.codes = codes
+        self.offsets = offsets
+
+    @classmethod
+    def from_lists(cls, token_lists) -> "TokenColumn":
+        index, codes, offsets = {}, [], [0]
+        for tokens in token_lists:
+            if isinstance(tokens, (list, tuple, np.ndarray)):
+                codes.extend(index.setdefault(str(token), len(index)) for token in tokens)
+            offsets.append(len(codes))
+        return cls(list(index), np.asarray(codes, dtype=np.int32), np.asarray(offsets, dtype=np.int64))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def terms(self) -> set:
+        """Tokens that occur in at least one row."""
+        return {self.vocab[code] for code in np.unique(self.codes).tolist()}
+
+    def lists(self, positions=None) -> list:
+        positions = _positions(positions, len(self))
+        if len(positions) > 64:
+            codes, offsets = self.codes, self.offsets
+        else:
+            codes, offsets = _gather(self.codes, self.offsets, positions)
+            positions = np.arange(len(positions))
+        codes, offsets, vocab = np.asarray(codes).tolist(), np.asarray(offsets).tolist(), self.vocab
+        return [[vocab[c] for c in codes[offsets[p]:offsets[p + 1]]] for p in positions.tolist()]
+
+    def take(self, positions) -> "TokenColumn":
+        codes, offsets = _gather(self.codes, self.offsets, positions)
+        return TokenColumn(self.vocab, codes, offsets)
+
+    def concat(self, other: "TokenColumn") -> "TokenColumn":
+        """Appends other's rows, re-coding its tokens into this vocabulary (extended as needed)."""
+        vocab = list(self.vocab)
+        index = {token: code for code, token in enumerate(vocab)}
+        mapping = np.array([index.setdefault(token, len(index)) for token in other.vocab], dtype=np.int32)
+        vocab.extend(list(index)[len(vocab):])
+        other_codes = mapping[np.asarray(other.codes)] if len(other.codes) else np.zeros(0, dtype=np.int32)
+        codes, offsets = _append(self.codes, self.offsets, other_codes, other.offsets)
+        return TokenColumn(vocab, codes, offsets)
+
+
+class CandidateStore:
+    """
+    The cleaned candidate table in compact, column-typed arrays (see the module docstring).
+    Column reads (store["Skills_list"]) return aligned Series for index builders; rows(positions)
+    materializes the usual DataFrame layout, Profile_clean included, for just those rows.
+    Stores are never modified in place: take / concat / with_numeric return new stores.
+    """
+
+    def __init__(self, ids, columns: list, text: dict, categorical: dict, numeric: dict, tokens: dict):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.columns = list(columns)
+        self.text = text                # name -> StringColumn
+        self.categorical = categorical  # name -> (int32 codes, categories)
+        self.numeric = numeric          # name -> float32 array
+        self.tokens = tokens            # name -> TokenColumn
+        self._index = None
+
+    @staticmethod
+    def _infer_kind(column: str, values: pd.Series) -> str:
+        if column == PROFILE_COLUMN:
+            return "derived"
+        if column in CATEGORICAL_COLUMNS:
+            return "categorical"
+        if column.endswith(TOKEN_SUFFIX):
+            return "tokens"
+        return "numeric" if pd.api.types.is_numeric_dtype(values) else "text"
+
+    @property
+    def kinds(self) -> dict:
+        """Column -> storage kind ("text", "categorical", "numeric", "tokens" or "derived")."""
+        kinds = {}
+        for column in self.columns:
+            for kind, columns in (("text", self.text), ("categorical", self.categorical),
+                                  ("numeric", self.numeric), ("tokens", self.tokens)):
+                if column in columns:
+                    kinds[column] = kind
+            kinds.setdefault(column, "derived")
+        return kinds
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, like: "CandidateStore" = None) -> "CandidateStore":
+        """
+        Compacts a cleaned candidate DataFrame (the output of preprocessing.clean_profiles).
+        Pass `like` to store columns the same way as an existing store (e.g. rows to be appended to it),
+        rather than inferring kinds from dtypes that a small batch may not show.
+        """
+        known = like.kinds if like is not None else {}
+        text, categorical, numeric, tokens = {}, {}, {}, {}
+        for column in df.columns:
+            values = df[column]
+            kind = known.get(column) or cls._infer_kind(column, values)
+            if kind == "categorical":
+                values = values.astype("category")
+                categories = [str(c) for c in values.cat.categories]
+                categorical[column] = (values.cat.codes.to_numpy(dtype=np.int32), categories)
+            elif kind == "tokens":
+                tokens[column] = TokenColumn.from_lists(values.tolist())
+            elif kind == "numeric":
+                numeric[column] = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float32)
+            elif kind == "text":
+                text[column] = StringColumn.from_values(values.tolist())
+        return cls(df.index, list(df.columns), text, categorical, numeric, tokens)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def index(self) -> pd.Index:
+        if self._index is None:
+            self._index = pd.Index(self.ids)
+        return self._index
+
+    def positions(self, ids) -> np.ndarray:
+        """Row positions of the given candidate ids (-1 for unknown ids)."""
+        return self.index.get_indexer(list(ids))
+
+    def _values(self, column: str, positions: np.ndarray):
+        if column == PROFILE_COLUMN:
+            return clean_profile_text(pd.Series(self.text[PROFILE_SOURCE].values(positions), dtype="str")).tolist()
+        if column in self.categorical:
+            codes, categories = self.categorical[column]
+            return pd.Categorical.from_codes(np.asarray(codes)[positions], categories=categories)
+        if column in self.numeric:
+            return np.asarray(self.numeric[column])[positions]
+        if column in self.tokens:
+            return self.tokens[column].lists(positions)
+        return pd.Series(self.text[column].values(positions), dtype="str").tolist()
+
+    def _series(self, column: str, positions: np.ndarray) -> pd.Series:
+        values = self._values(column, positions)
+        dtype = "str" if column in self.text or column == PROFILE_COLUMN else None
+        if column in self.tokens:
+            dtype = object
+        return pd.Series(values, index=pd.Index(self.ids[positions]), name=column, dtype=dtype)
+
+    def __getitem__(self, column: str) -> pd.Series:
+        """Whole column as a Series aligned with self.index (decoded, so meant for index builds, not requests)."""
+        if column not in self.columns:
+            raise KeyError(column)
+        return self._series(column, np.arange(len(self), dtype=np.int64))
+
+    def rows(self, positions=None) -> pd.DataFrame:
+        """The usual candidate DataFrame layout for the given row positions (default: every row)."""
+        positions = _positions(positions, len(self))
+        return pd.DataFrame({column: self._series(column, positions) for column in self.columns},
+                            index=pd.Index(self.ids[positions]))
+
+    def take(self, positions) -> "CandidateStore":
+        positions = np.asarray(positions, dtype=np.int64)
+        return CandidateStore(
+            self.ids[positions], self.columns,
+            {name: column.take(positions) for name, column in self.text.items()},
+            {name: (np.asarray(codes)[positions], categories) for name, (codes, categories) in self.categorical.items()},
+            {name: np.asarray(values)[positions] for name, values in self.numeric.items()},
+            {name: column.take(positions) for name, column in self.tokens.items()},
+        )
+
+    def concat(self, other: "CandidateStore") -> "CandidateStore":
+        """This store's rows followed by other's (same columns); category and token vocabularies are merged."""
+        categorical = {}
+        for name, (codes, categories) in self.categorical.items():
+            other_codes, other_categories = other.categorical[name]
+            index = {category: code for code, category in enumerate(categories)}
+            mapping = np.array([index.setdefault(c, len(index)) for c in other_categories] + [-1], dtype=np.int32)
+            categorical[name] = (np.concatenate([codes, mapping[np.asarray(other_codes)]]), list(index))
+        return CandidateStore(
+            np.concatenate([self.ids, other.ids]), self.columns,
+            {name: column.concat(other.text[name]) for name, column in self.text.items()},
+            categorical,
+            {name: np.concatenate([values, other.numeric[name]]) for name, values in self.numeric.items()},
+            {name: column.concat(other.tokens[name]) for name, column in self.tokens.items()},
+        )
+
+    def with_numeric(self, updates: dict) -> "CandidateStore":
+        """New store sharing every column except the replaced numeric ones."""
+        numeric = dict(self.numeric)
+        numeric.update({name: np.asarray(values, dtype=np.float32) for name, values in updates.items()})
+        return CandidateStore(self.ids, self.columns, self.text, self.categorical, numeric, self.tokens)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the column arrays (memory-mapped pages are shared between processes)."""
+        arrays = [self.ids] + list(self.numeric.values()) + [codes for codes, _ in self.categorical.values()]
+        for column in self.text.values():
+            arrays += [column.data, column.offsets, column.missing]
+        for column in self.tokens.values():
+            arrays += [column.codes, column.offsets]
+        return int(sum(array.nbytes for array in arrays))
+
+    # --- Persistence: one .npy per array plus a JSON header, loadable with mmap ---
+
+    def save(self, path: str):
+        """Writes the store to the directory `path`, replacing any previous store there."""
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        def save_array(name, array):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+
+        header = {"format": STORE_FORMAT, "columns": self.columns, "kinds": {}, "categories": {}, "vocabs": {}}
+        save_array("ids", self.ids)
+        for i, column in enumerate(self.columns):
+            key = f"c{i}"
+            if column in self.text:
+                header["kinds"][column] = "text"
+                save_array(f"{key}_data", self.text[column].data)
+                save_array(f"{key}_offsets", self.text[column].offsets)
+                save_array(f"{key}_missing", self.text[column].missing)
+            elif column in self.categorical:
+                header["kinds"][column] = "categorical"
+                codes, header["categories"][column] = self.categorical[column]
+                save_array(f"{key}_codes", codes)
+            elif column in self.numeric:
+                header["kinds"][column] = "numeric"
+                save_array(f"{key}_values", self.numeric[column])
+            elif column in self.tokens:
+                header["kinds"][column] = "tokens"
+                header["vocabs"][column] = self.tokens[column].vocab
+                save_array(f"{key}_codes", self.tokens[column].codes)
+                save_array(f"{key}_offsets", self.tokens[column].offsets)
+        with open(os.path.join(tmp_path, "store.json"), "w", encoding="utf-8") as f:
+            json.dump(header, f)
+
+        # Readers that mapped the old files keep their pages after the directory is removed
+        old_path = path + ".old"
+        shutil.rmtree(old_path, ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CandidateStore":
+        with open(os.path.join(path, "store.json"), "r", encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("format") != STORE_FORMAT:
+            raise ValueError(f"Unsupported candidate store format: {header.get('format')}")
+
+        def load_array(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+        text, categorical, numeric, tokens = {}, {}, {}, {}
+        for i, column in enumerate(header["columns"]):
+            key, kind = f"c{i}", header["kinds"].get(column)
+            if kind == "text":
+                text[column] = StringColumn(load_array(f"{key}_data"), load_array(f"{key}_offsets"),
+                                            load_array(f"{key}_missing"))
+            elif kind == "categorical":
+                categorical[column] = (load_array(f"{key}_codes"), header["categories"][column])
+            elif kind == "numeric":
+                numeric[column] = load_array(f"{key}_values")
+            elif kind == "tokens":
+                tokens[column] = TokenColumn(header["vocabs"][column], load_array(f"{key}_codes"),
+                                             load_array(f"{key}_offsets"))
+        return cls(load_array("ids"), header["columns"], text, categorical, numeric, tokens)
+
+
+def take_rows(candidates, positions) -> pd.DataFrame:
+    """DataFrame of the given row positions from a CandidateStore or a plain candidate DataFrame."""
+    if isinstance(candidates, CandidateStore):
+        return candidates.rows(positions)
+    return candidates.iloc[np.asarray(positions, dtype=np.int64)].copy()
@@ -0,0 +1,412 @@
+# matcher/embedding_service.py
+"""
+The text encoder behind matcher.similarity:
+
+- One process-wide sentence-transformers model. The model is configurable, and can be a smaller
+  model, an ONNX / OpenVINO export or an int8-quantized one.
+- An LRU cache of embeddings keyed by normalized text.
+- A micro-batcher that merges concurrent encode() calls from request threads into one model call.
+
+With EMBEDDING_SOCKET set, app workers share a single sidecar process over a Unix socket
+(one model in memory, one cache, batches across workers):
+
+    python -m matcher.embedding_service --socket /tmp/matcher-embeddings.sock
+"""
+
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from matcher import metrics
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+# --- Model (e.g. EMBEDDING_MODEL=sentence-transformers/all-MiniLM-L6-v2 for a ~5x cheaper encoder) ---
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", DEFAULT_MODEL_NAME)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch | onnx | openvino
+EMBEDDING_QUANTIZE = os.getenv("EMBEDDING_QUANTIZE", "")  # "" (float32) | int8
+EMBEDDING_MODEL_FILE = os.getenv("EMBEDDING_MODEL_FILE", "")  # export inside the model repo (onnx / openvino)
+
+# --- Batching and caching ---
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "2"))
+EMBEDDING_MAX_BATCH = int(os.getenv("EMBEDDING_MAX_BATCH", "64"))
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+
+# --- Shared sidecar (empty = encode in-process) ---
+EMBEDDING_SOCKET = os.getenv("EMBEDDING_SOCKET", "")
+
+BACKENDS = ("torch", "onnx", "openvino")
+# Pre-quantized int8 exports published with the sentence-transformers models
+QUANTIZED_FILES = {"onnx": "onnx/model_qint8_avx512_vnni.onnx", "openvino": "openvino/openvino_model_qint8_quantized.xml"}
+
+
+def model_id(name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND, quantize: str = EMBEDDING_QUANTIZE,
+             model_file: str = EMBEDDING_MODEL_FILE) -> str:
+    """Names the vector space a configuration produces; part of every cached embedding matrix's key."""
+    parts = [name]
+    if backend != "torch":
+        parts.append(backend)
+    if quantize:
+        parts.append(quantize)
+    if model_file:
+        parts.append(model_file)
+    return ":".join(parts)
+
+
+def load_model(name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND, quantize: str = EMBEDDING_QUANTIZE,
+               model_file: str = EMBEDDING_MODEL_FILE):
+    """A CPU SentenceTransformer for the configuration (onnx / openvino need sentence-transformers >= 3.2 + optimum)."""
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {', '.join(BACKENDS)}.")
+    if quantize not in ("", "int8"):
+        raise ValueError("EMBEDDING_QUANTIZE must be empty or 'int8'.")
+
+    if backend == "torch":
+        model = SentenceTransformer(name, device="cpu")
+        if quantize == "int8":
+            import torch
+            # Dynamic int8 quantization of the linear layers (weights int8, activations quantized on the fly)
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    file_name = model_file or (QUANTIZED_FILES[backend] if quantize == "int8" else "")
+    return SentenceTransformer(name, device="cpu", backend=backend,
+                               model_kwargs={"file_name": file_name} if file_name else None)
+
+
+def normalize_text(text) -> str:
+    """Cache key / model input: NFC-normalized, whitespace collapsed (tokenization is unchanged by both)."""
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFC", str(text)).split())
+
+
+# ==============================================================================
+# --- In-process encoder ---
+# ==============================================================================
+
+class LocalEncoder:
+    """Loads the configured model on first use; encode_batch returns L2-normalized float32 rows."""
+
+    def __init__(self, name: str = EMBEDDING_MODEL, backend: str = EMBEDDING_BACKEND,
+                 quantize: str = EMBEDDING_QUANTIZE, model_file: str = EMBEDDING_MODEL_FILE):
+        self.config = (name, backend, quantize, model_file)
+        self.model_id = model_id(*self.config)
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = load_model(*self.config)
+                    print(f"✅ Loaded encoder {self.model_id} in {time.perf_counter() - started:.1f}s.")
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode_batch(self, texts: list, batch_size: int = 64) -> np.ndarray:
+        encoded = self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True)
+        return np.asarray(encoded, dtype=np.float32).reshape(len(texts), -1)
+
+
+class MicroBatcher:
+    """
+    Merges concurrent encode requests into one model call. A worker thread takes the first waiting
+    request, collects whatever else arrives within window_ms (up to max_batch texts), encodes the
+    distinct texts once and hands every caller its rows. It stops waiting as soon as every caller
+    currently inside encode() is in the batch, so a lone caller never pays the window.
+    """
+
+    def __init__(self, encode_batch, window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch: int = EMBEDDING_MAX_BATCH):
+        self.encode_batch = encode_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue = queue.Queue()
+        self._worker = None
+        self._callers = 0
+        self._lock = threading.Lock()
+
+    def encode(self, texts: list) -> np.ndarray:
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+            self._callers += 1
+        try:
+            future = Future()
+            self._queue.put((texts, future))
+            return future.result()
+        finally:
+            with self._lock:
+                self._callers -= 1
+
+    def _collect(self) -> list:
+        pending = [self._queue.get()]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.window
+        while size < self.max_batch and len(pending) < self._callers:
+            try:
+                # Requests that queued up while the previous batch was encoding join without waiting
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic())) \
+                    if self.window > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            unique = list(dict.fromkeys(text for texts, _ in pending for text in texts))
+            try:
+                vectors = self.encode_batch(unique)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            metrics.record_embedding_batch(len(pending), len(unique))
+            rows = {text: i for i, text in enumerate(unique)}
+            for texts, future in pending:
+                future.set_result(vectors[[rows[text] for text in texts]])
+
+
+class EmbeddingService:
+    """
+    encode(texts) for the whole process: cached, micro-batched calls into one LocalEncoder.
+    Large requests (candidate stores, bulk jobs) go straight to the model in full batches and
+    bypass the cache, which is meant for the small, repetitive query texts of searches.
+    """
+
+    def __init__(self, encoder: LocalEncoder = None, cache_size: int = EMBEDDING_CACHE_SIZE,
+                 window_ms: float = EMBEDDING_BATCH_WINDOW_MS, max_batch: int = EMBEDDING_MAX_BATCH):
+        self.encoder = encoder or LocalEncoder()
+        self.cache_size = cache_size
+        self.max_batch = max_batch
+        self.batcher = MicroBatcher(self.encoder.encode_batch, window_ms, max_batch)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model_id(self) -> str:
+        return self.encoder.model_id
+
+    @property
+    def dimension(self) -> int:
+        return self.encoder.dimension
+
+    def _cached(self, texts: list) -> dict:
+        with self._lock:
+            found = {}
+            for text in texts:
+                vector = self._cache.get(text)
+                if vector is not None:
+                    self._cache.move_to_end(text)
+                    found[text] = vector
+            return found
+
+    def _remember(self, texts: list, vectors: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                self._cache[text] = vector
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def encode(self, texts, batch_size: int = 64) -> np.ndarray:
+        """L2-normalized float32 vectors, one row per text; empty texts map to zero vectors."""
+        texts = [normalize_text(text) for text in texts]
+        rows = {}
+        for i, text in enumerate(texts):
+            if text:
+                rows.setdefault(text, []).append(i)
+        if not rows:
+            return np.zeros((len(texts), self.dimension), dtype=np.float32)
+
+        unique = list(rows)
+        if len(unique) > self.max_batch:
+            vectors = dict(zip(unique, self.encoder.encode_batch(unique, batch_size)))
+        else:
+            vectors = self._cached(unique)
+            missing = [text for text in unique if text not in vectors]
+            metrics.record_embedding_cache(len(vectors), len(missing))
+            if missing:
+                encoded = self.batcher.encode(missing)
+                self._remember(missing, encoded)
+                vectors.update(zip(missing, encoded))
+
+        embeddings = np.zeros((len(texts), len(next(iter(vectors.values())))), dtype=np.float32)
+        for text, positions in rows.items():
+            embeddings[positions] = vectors[text]
+        return embeddings
+
+
+# ==============================================================================
+# --- Sidecar: Unix socket server and client ---
+# ==============================================================================
+# Messages are a (header length, payload length) pair of uint32s, a JSON header and raw bytes.
+
+def _send(sock, header: dict, payload: bytes = b""):
+    data = json.dumps(header).encode("utf-8")
+    sock.sendall(struct.pack("!II", len(data), len(payload)) + data + payload)
+
+
+def _recv_exact(sock, size: int) -> bytes:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            raise ConnectionError("Embedding service connection closed.")
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock) -> tuple:
+    header_size, payload_size = struct.unpack("!II", _recv_exact(sock, 8))
+    return json.loads(_recv_exact(sock, header_size)), _recv_exact(sock, payload_size)
+
+
+class _EmbeddingHandler(socketserver.BaseRequestHandler):
+    """One persistent client connection; requests are answered in order."""
+
+    def handle(self):
+        service = self.server.service
+        while True:
+            try:
+                request, _ = _recv(self.request)
+            except (ConnectionError, struct.error):
+                return
+            try:
+                if request.get("op") == "info":
+                    _send(self.request, {"model_id": service.model_id, "dimension": service.dimension})
+                else:
+                    vectors = service.encode(request.get("texts", []), request.get("batch_size", 64))
+                    _send(self.request, {"shape": list(vectors.shape)}, vectors.tobytes())
+            except Exception as e:
+                _send(self.request, {"error": f"{type(e).__name__}: {e}"})
+
+
+class RemoteEmbeddingService:
+    """The EmbeddingService API, answered by the sidecar; each thread keeps its own connection."""
+
+    def __init__(self, socket_path: str, timeout: float = 60.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._info = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self._local.sock = sock
+        return sock
+
+    def _call(self, request: dict) -> tuple:
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None) or self._connect()
+            try:
+                _send(sock, request)
+                header, payload = _recv(sock)
+                break
+            except (ConnectionError, BrokenPipeError, socket.timeout):
+                sock.close()
+                self._local.sock = None
+                if attempt:
+                    raise
+        if "error" in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return header, payload
+
+    def info(self) -> dict:
+        if self._info is None:
+            self._info = self._call({"op": "info"})[0]
+        return self._info
+
+    @property
+    def model_id(self) -> str:
+        return self.info()["model_id"]
+
+    @property
+    def dimension(self) -> int:
+        return self.info()["dimension"]
+
+    def encode(self, texts, batch_size: int = 64) -> np.ndarray:
+        header, payload = self._call({"op": "encode", "texts": [str(text or "") for text in texts],
+                                      "batch_size": batch_size})
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"]).copy()
+
+
+def serve(socket_path: str, service: EmbeddingService = None):
+    """Runs the sidecar until interrupted; the model is loaded before the socket accepts connections."""
+    service = service or EmbeddingService()
+    print(f"-> Loading encoder {service.model_id}...")
+    service.dimension
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _EmbeddingHandler)
+    server.daemon_threads = True
+    server.service = service
+    print(f"✅ Embedding service listening on {socket_path}.")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+# ==============================================================================
+# --- Process-wide service ---
+# ==============================================================================
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service():
+    """The sidecar client when EMBEDDING_SOCKET is set and reachable, else an in-process EmbeddingService."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                service = None
+                if EMBEDDING_SOCKET:
+                    try:
+                        service = RemoteEmbeddingService(EMBEDDING_SOCKET)
+                        print(f"✅ Using the embedding service at {EMBEDDING_SOCKET} ({service.model_id}).")
+                    except OSError as e:
+                        print(f"⚠️ Embedding service at {EMBEDDING_SOCKET} is unreachable ({e}). Encoding in-process.")
+                        service = None
+                _service = service or EmbeddingService()
+    return _service
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared sentence-embedding service for app workers.")
+    parser.add_argument("--socket", default=EMBEDDING_SOCKET or "/tmp/matcher-embeddings.sock")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,100 @@
+# matcher/embedding_store.py
+
+import hashlib
+import os
+
+import numpy as np
+
+from matcher.preprocessing import DEFAULT_CACHE_DIR
+from matcher.similarity import embedding_model_id, encode_texts
+
+# Store field -> source column in the talent CSV
+EMBEDDING_FIELDS = {
+    "verticals": "Content Verticals",
+    "job_types": "Job Types",
+    "skills": "Skills",
+    "profile": "Profile Description",
+}
+
+
+def _field_texts(df, column: str) -> list:
+    if column not in df.columns:
+        return [""] * len(df)
+    return df[column].fillna("").astype(str).str.strip().tolist()
+
+
+def _content_hash(texts: list) -> str:
+    """Hash of the encoder id plus every text, so any edit (or another model) invalidates the cached matrix."""
+    digest = hashlib.sha256(embedding_model_id().encode("utf-8"))
+    for text in texts:
+        digest.update(b"\x1f")
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _load_or_encode(texts: list, path: str) -> np.ndarray:
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp.npy"
+        np.save(tmp_path, encode_texts(texts))
+        os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+class EmbeddingStore:
+    """Normalized candidate embeddings per field, row-aligned with the candidate ids."""
+
+    def __init__(self, ids, matrices: dict, hashes: dict = None):
+        self.ids = np.asarray(ids)
+        self.matrices = matrices
+        self.hashes = hashes or {}
+        self._positions = {cid: pos for pos, cid in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, candidate_id):
+        return candidate_id in self._positions
+
+    def positions(self, ids) -> np.ndarray:
+        return np.fromiter((self._positions[cid] for cid in ids), dtype=np.int64)
+
+    def encode_query(self, text: str) -> np.ndarray:
+        return encode_texts([text])[0]
+
+    def similarity_to(self, field: str, query_vec: np.ndarray, ids=None) -> np.ndarray:
+        """Cosine similarity of a pre-encoded query to every (or the given) candidate."""
+        matrix = self.matrices[field]
+        if ids is not None:
+            matrix = matrix[self.positions(ids)]
+        return np.asarray(matrix @ query_vec, dtype=np.float32)
+
+    def apply_changes(self, keep_positions: np.ndarray, added_df) -> "EmbeddingStore":
+        """New in-memory store with the kept rows followed by freshly encoded rows for added_df."""
+        matrices = {}
+        for field, column in EMBEDDING_FIELDS.items():
+            added = encode_texts(_field_texts(added_df, column))
+            matrices[field] = np.vstack([np.asarray(self.matrices[field][keep_positions]), added])
+        ids = np.concatenate([self.ids[keep_positions], np.asarray(added_df.index)])
+        return EmbeddingStore(ids, matrices)
+
+    def similarity(self, field: str, query_text: str, ids=None) -> np.ndarray:
+        """Encodes the query once and scores it against all candidates with one mat-vec product."""
+        size = len(self) if ids is None else len(ids)
+        if not query_text:
+            return np.zeros(size, dtype=np.float32)
+        return self.similarity_to(field, self.encode_query(query_text), ids)
+
+
+def build_embedding_store(df, cache_dir: str = DEFAULT_CACHE_DIR) -> EmbeddingStore:
+    """
+    Batch-encodes every candidate field once and memory-maps the result from disk.
+    Matrices are keyed by a content hash, so unchanged data is never re-encoded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    matrices, hashes = {}, {}
+    for field, column in EMBEDDING_FIELDS.items():
+        texts = _field_texts(df, column)
+        hashes[field] = _content_hash(texts)
+        path = os.path.join(cache_dir, f"emb_{field}_{hashes[field]}.npy")
+        matrices[field] = _load_or_encode(texts, path)
+    return EmbeddingStore(df.index, matrices, hashes)
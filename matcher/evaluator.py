@@ -1,8 +1,25 @@
+import math
+
+
 def evaluate_precision_at_k(predicted: list, relevant_ids: set, k=10):
     top_k = predicted[:k]
     hits = sum(1 for cand_id in top_k if cand_id in relevant_ids)
     return hits / k
 
+def evaluate_recall_at_k(predicted: list, relevant_ids: set, k=10):
+    if not relevant_ids:
+        return 0.0
+    top_k = predicted[:k]
+    hits = sum(1 for cand_id in top_k if cand_id in relevant_ids)
+    return hits / len(relevant_ids)
+
+def evaluate_ndcg_at_k(predicted: list, relevance: dict, k=10):
+    # relevance maps candidate id -> graded gain (e.g. 1 = relevant, 2 = highly relevant)
+    dcg = sum(relevance.get(cand_id, 0) / math.log2(rank + 2) for rank, cand_id in enumerate(predicted[:k]))
+    ideal = sorted(relevance.values(), reverse=True)[:k]
+    idcg = sum(gain / math.log2(rank + 2) for rank, gain in enumerate(ideal))
+    return dcg / idcg if idcg else 0.0
+
 def dummy_relevant_ids(df):
     # For mock testing: assume top viewed candidates are relevant
     return set(df.sort_values(by="Views_norm", ascending=False).head(10).index)
@@ -0,0 +1,230 @@
+# matcher/feature_engine.py
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from matcher.features import join_terms, location_score, vertical_score
+from matcher.metrics import stage
+from matcher.personality import PERSONALITY_KEYWORDS, extract_traits
+
+# Candidate column holding the creators a candidate has worked with (comma-separated in the CSV),
+# and the normalized name lists preprocessing materializes from it
+CREATOR_COLUMN = "Past Creators"
+CREATOR_TOKENS = "Creators_list"
+# Profile traits materialized by preprocessing (personality.extract_traits)
+TRAIT_TOKENS = "Traits_list"
+TRAIT_NAMES = list(PERSONALITY_KEYWORDS)
+
+
+def split_creators(value) -> list:
+    """Comma string (or list) of creator names -> stripped, lowercased names."""
+    if isinstance(value, str):
+        value = value.split(",")
+    elif not isinstance(value, (list, tuple, set, np.ndarray)):
+        return []
+    return [str(name).strip().lower() for name in value if str(name).strip()]
+
+
+def parse_job_budget(job: dict) -> float:
+    """First run of digits in the job's budget_monthly, parsed once per job (inf if there are none)."""
+    job_budget_str = str(job.get("budget_monthly", "inf"))
+    if re.search(r'\d', job_budget_str):
+        return float(re.search(r'\d+', job_budget_str).group())
+    return float("inf")
+
+
+# ==============================================================================
+# --- Array versions of features.py (same numbers, one call per candidate set) ---
+# ==============================================================================
+
+def budget_scores(rates: np.ndarray, job_budget: float) -> np.ndarray:
+    """features.budget_score over an array of monthly rates (a missing rate scores 0, as before)."""
+    if job_budget == float("inf"):
+        return np.ones(len(rates))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = np.where(rates <= job_budget, 1.0, np.maximum(0.0, 1 - (rates - job_budget) / job_budget))
+    return np.nan_to_num(scores, nan=0.0)
+
+
+def location_table(categories: list, job_pref: str) -> np.ndarray:
+    """features.location_score for each country category; index it with the candidates' category codes."""
+    return np.array([location_score(country, job_pref) for country in categories] or [0.0], dtype=np.float64)
+
+
+def creator_postings(values) -> tuple:
+    """CSR-style (indptr, indices, vocab) of each candidate's normalized creator names."""
+    vocab, indptr, indices = {}, [0], []
+    for value in values:
+        for name in set(split_creators(value)):
+            indices.append(vocab.setdefault(name, len(vocab)))
+        indptr.append(len(indices))
+    return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64), vocab
+
+
+def token_postings(df, column: str) -> tuple:
+    """
+    creator_postings of a materialized token column. A CandidateStore's interned column already is
+    a posting list (row offsets + vocabulary codes), so it is used as is.
+    """
+    tokens = getattr(df, "tokens", {})
+    if column in tokens:
+        column = tokens[column]
+        return column.offsets, column.codes, {token: code for code, token in enumerate(column.vocab)}
+    return creator_postings(df[column])
+
+
+def creator_scores(indptr: np.ndarray, indices: np.ndarray, creator_index: int) -> np.ndarray:
+    """features.creator_history_score for every row of a (possibly sliced) posting list."""
+    scores = np.zeros(len(indptr) - 1)
+    if creator_index < 0:
+        return scores
+    hits = np.flatnonzero(np.asarray(indices[indptr[0]:indptr[-1]]) == creator_index) + indptr[0]
+    scores[np.searchsorted(indptr, hits, side="right") - 1] = 1.0
+    return scores
+
+
+def trait_flags(profiles: pd.Series) -> np.ndarray:
+    """Candidate x TRAIT_NAMES matrix of personality.extract_traits hits."""
+    return posting_flags(*creator_postings(extract_traits(profile) for profile in profiles))
+
+
+def posting_flags(indptr: np.ndarray, indices: np.ndarray, vocab: dict) -> np.ndarray:
+    """Candidate x TRAIT_NAMES matrix from a posting list of trait names (e.g. the materialized Traits_list)."""
+    rows = len(indptr) - 1
+    flags = np.zeros((rows, len(TRAIT_NAMES)), dtype=np.uint8)
+    codes = np.asarray(indices[indptr[0]:indptr[-1]])
+    owners = np.repeat(np.arange(rows), np.diff(np.asarray(indptr)))
+    for col, trait in enumerate(TRAIT_NAMES):
+        if trait in vocab:
+            flags[owners[codes == vocab[trait]], col] = 1
+    return flags
+
+
+def trait_weights(job_traits) -> np.ndarray:
+    """Weights over TRAIT_NAMES so that flags @ weights == personality.trait_score; None if the job lists no traits."""
+    job_traits = set(job_traits or [])
+    if not job_traits:
+        return None
+    return np.array([1.0 if t in job_traits else 0.0 for t in TRAIT_NAMES], dtype=np.float32) / len(job_traits)
+
+
+class FeatureEngine:
+    """
+    Columnar copies of the candidate fields the feature scores read, row-aligned with df:
+    country category codes, monthly rates, a creator-name posting list and profile trait flags.
+    Creators and traits come from the columns preprocessing materialized (the raw text is only
+    re-parsed for frames without them). A job is parsed once (prepare) and scored against every
+    row with NumPy (feature_arrays).
+    """
+
+    def __init__(self, df):
+        self.ids = np.asarray(df.index)
+        countries = df["Country"]
+        if not isinstance(countries.dtype, pd.CategoricalDtype):
+            countries = countries.astype("category")
+        # Missing countries score as "" (the last category)
+        self.countries = [str(c) for c in countries.cat.categories] + [""]
+        self.country_codes = countries.cat.codes.to_numpy(dtype=np.int32)
+        self.country_codes[self.country_codes < 0] = len(self.countries) - 1
+        self.monthly_rate = pd.to_numeric(df["Monthly Rate"], errors="coerce").to_numpy(dtype=np.float64)
+        if CREATOR_TOKENS in df.columns:
+            self.creator_indptr, self.creator_indices, self.creator_vocab = token_postings(df, CREATOR_TOKENS)
+        else:
+            creators = df[CREATOR_COLUMN] if CREATOR_COLUMN in df.columns else [None] * len(df)
+            self.creator_indptr, self.creator_indices, self.creator_vocab = creator_postings(creators)
+        self.verticals = df["Content Verticals"].tolist() if "Content Verticals" in df.columns else [""] * len(df)
+        if TRAIT_TOKENS in df.columns:
+            self.trait_flags = posting_flags(*token_postings(df, TRAIT_TOKENS))
+        else:
+            self.trait_flags = trait_flags(df["Profile_clean"].fillna("").astype(str))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def apply_changes(self, keep_positions: np.ndarray, added) -> "FeatureEngine":
+        """
+        New engine with the kept rows followed by added's rows (a cleaned frame or CandidateStore),
+        without re-reading the kept candidates: arrays are gathered and the country and creator
+        vocabularies extended, like CandidateStore.concat.
+        """
+        from matcher.candidate_store import TokenColumn
+
+        keep_positions = np.asarray(keep_positions, dtype=np.int64)
+        other = FeatureEngine(added)
+        engine = FeatureEngine.__new__(FeatureEngine)
+        engine.ids = np.concatenate([self.ids[keep_positions], other.ids])
+
+        # The last country is always "" (missing); it stays last in the merged list
+        index = {country: code for code, country in enumerate(self.countries[:-1])}
+        other_codes = np.array([index.setdefault(country, len(index)) for country in other.countries[:-1]]
+                               + [-1], dtype=np.int32)
+        engine.countries = list(index) + [""]
+        kept = self.country_codes[keep_positions].copy()
+        kept[kept == len(self.countries) - 1] = -1
+        codes = np.concatenate([kept, other_codes[other.country_codes]])
+        codes[codes < 0] = len(engine.countries) - 1
+        engine.country_codes = codes.astype(np.int32)
+
+        engine.monthly_rate = np.concatenate([self.monthly_rate[keep_positions], other.monthly_rate])
+        creators = TokenColumn(sorted(self.creator_vocab, key=self.creator_vocab.get), self.creator_indices,
+                               self.creator_indptr).take(keep_positions)
+        creators = creators.concat(TokenColumn(sorted(other.creator_vocab, key=other.creator_vocab.get),
+                                               other.creator_indices, other.creator_indptr))
+        engine.creator_indptr = creators.offsets
+        engine.creator_indices = np.asarray(creators.codes, dtype=np.int64)
+        engine.creator_vocab = {name: code for code, name in enumerate(creators.vocab)}
+        engine.verticals = [self.verticals[p] for p in keep_positions.tolist()] + other.verticals
+        engine.trait_flags = np.concatenate([np.asarray(self.trait_flags)[keep_positions], other.trait_flags])
+        return engine
+
+    def prepare(self, job: dict) -> dict:
+        """Everything about the job the feature scores need, computed once per request."""
+        creator = job.get("hiring_creator_name") or ""
+        return {
+            "budget": parse_job_budget(job),
+            "location_table": location_table(self.countries, job.get("location_pref", "anywhere")),
+            "creator_index": self.creator_vocab.get(creator.lower(), -1) if creator else -1,
+            "verticals_text": join_terms(job.get("content_verticals", [])),
+        }
+
+    def _vertical_sims(self, prepared: dict, store) -> np.ndarray:
+        if store is None:
+            # No embedding store: one encoder call per row (the original per-row path)
+            return np.array([vertical_score(v, prepared["verticals_text"]) for v in self.verticals], dtype=np.float64)
+        ids = None if np.array_equal(store.ids, self.ids) else self.ids
+        with stage("embedding"):
+            return store.similarity("verticals", prepared["verticals_text"], ids=ids).astype(np.float64)
+
+    def feature_arrays(self, job: dict, store=None) -> dict:
+        """features.py scores for every row as arrays keyed like scoring.feature_scores."""
+        prepared = self.prepare(job)
+        return {
+            "vertical_sim": self._vertical_sims(prepared, store),
+            "budget_sim": budget_scores(self.monthly_rate, prepared["budget"]),
+            "loc_sim": prepared["location_table"][self.country_codes],
+            "creator_sim": creator_scores(self.creator_indptr, self.creator_indices, prepared["creator_index"]),
+        }
+
+
+def weighted_scores(columns: dict, weights: dict) -> np.ndarray:
+    """scoring.combine_scores over arrays: the weighted sum in weight order, rounded to 4 places."""
+    scores = np.zeros(len(next(iter(columns.values()))), dtype=np.float64)
+    for name, weight in weights.items():
+        scores += weight * np.asarray(columns[name], dtype=np.float64)
+    return np.round(scores, 4)
+
+
+def top_positions(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k best scores, best first, in the order of a stable full sort: ties go to the
+    lower position, including ties straddling the k-th place, so every ranking path returns the same rows.
+    """
+    scores = np.asarray(scores)
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+    top = np.flatnonzero(scores >= threshold)
+    return top[np.argsort(-scores[top], kind="stable")][:k]
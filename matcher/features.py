@@ -1,13 +1,16 @@
 # matcher/features.py
 
+from matcher.keyword_matcher import KeywordMatcher
+from matcher.prefilter import PREFILTER_FIELDS, normalize_terms
 from matcher.similarity import embedding_similarity
 import re
 
 HOBBY_KEYWORDS = ["animals", "dogs", "cats", "gaming", "music", "sports", "fashion", "travel", "art", "photography"]
+HOBBY_MATCHER = KeywordMatcher({h: [h] for h in HOBBY_KEYWORDS})
 
 
 def extract_hobbies(text):
-    return [h for h in HOBBY_KEYWORDS if h in text.lower()]
+    return HOBBY_MATCHER.match(text)
 
 
 def location_score(candidate_country: str, job_pref: str) -> float:
@@ -30,14 +33,21 @@ def budget_score(candidate_rate: float, job_budget: float) -> float:
     return max(0.0, 1 - (candidate_rate - job_budget) / job_budget)
 
 
+def join_terms(terms) -> str:
+    """Joins a list of terms into one string; plain strings are passed through unchanged."""
+    if isinstance(terms, str):
+        return terms
+    if isinstance(terms, float):
+        return ""  # NaN: a field left out of an ingested profile
+    return " ".join(terms or [])
+
+
 def vertical_score(candidate_verticals, job_verticals):
-    cand_text = " ".join(candidate_verticals or [])
-    job_text = " ".join(job_verticals or [])
-    return embedding_similarity(cand_text, job_text)
+    return embedding_similarity(join_terms(candidate_verticals), join_terms(job_verticals))
 
 
 def job_type_score(candidate_types, job_types):
-    return embedding_similarity(" ".join(candidate_types or []), " ".join(job_types or []))
+    return embedding_similarity(join_terms(candidate_types), join_terms(job_types))
 
 
 def creator_history_score(past_creators, target_creator):
@@ -49,20 +59,12 @@ def creator_history_score(past_creators, target_creator):
 # --- Pre-filtering Function ---
 def pre_filter_score(candidate: dict, job: dict) -> float:
     """
-    Calculates a simple, fast, non-LLM score for initial filtering.
+    Calculates a simple, fast, non-LLM score for initial filtering: one point for a matching skill
+    and one for a matching job type. Job terms are lowercased like the candidate tokens.
     """
     score = 0
-
-    # Must have at least one matching skill
-    job_skills = set(job.get("relevant_skills", []))
-    candidate_skills = set(candidate.get("Skills_list", []))
-    if job_skills and candidate_skills.intersection(job_skills):
-        score += 1
-
-    # Must have at least one matching job type
-    job_types = set(job.get("job_types", []))
-    candidate_job_types = set(candidate.get("JobTypes_list", []))
-    if job_types and candidate_job_types.intersection(job_types):
-        score += 1
-
+    for field, column in PREFILTER_FIELDS.items():
+        job_terms = set(normalize_terms(job.get(field, [])))
+        if job_terms and job_terms.intersection(candidate.get(column, [])):
+            score += 1
     return score
\ No newline at end of file
@@ -0,0 +1,323 @@
+# matcher/ingest.py
+
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from matcher.candidate_store import CandidateStore
+from matcher.embedding_store import build_embedding_store
+from matcher.feature_engine import FeatureEngine
+from matcher.local_scoring import RuleBasedJobParser
+from matcher.prefilter import build_prefilter_index
+from matcher.preprocessing import (
+    DEFAULT_CACHE_DIR,
+    DERIVED_COLUMNS,
+    NORMALIZED_COLUMNS,
+    apply_normalization,
+    clean_profiles,
+    compute_norm_stats,
+    parse_rates,
+    read_snapshot_manifest,
+)
+from matcher.retrieval import build_retriever
+
+
+class InvalidRecord(ValueError):
+    """An ingested record that cannot be applied; `field` names the offending field (None for the record itself)."""
+
+    def __init__(self, message: str, field: str = None):
+        super().__init__(message)
+        self.field = field
+
+
+class CandidateDirectory:
+    """
+    One consistent, read-only version of the candidate data and every index built from it.
+    Searches grab a single CandidateDirectory and use only that, so ingestion never tears a request.
+    """
+
+    def __init__(self, candidates: CandidateStore, prefilter_index, embedding_store, retriever, norm_stats: dict,
+                 version: int = 0, lineage: tuple = None, job_parser: RuleBasedJobParser = None,
+                 feature_engine: FeatureEngine = None):
+        self.candidates = candidates
+        self.prefilter_index = prefilter_index
+        self.embedding_store = embedding_store
+        self.retriever = retriever
+        self.norm_stats = norm_stats
+        self.version = version
+        # (parent version, parent row positions kept as this version's first rows); None for a full build
+        self.lineage = lineage
+        # Ingested versions get both derived from their parent; a full build makes them on first use
+        self._job_parser = job_parser
+        self._feature_engine = feature_engine
+        self._lazy_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.candidates)
+
+    @property
+    def job_parser(self) -> RuleBasedJobParser:
+        """Rule-based job parser over this version's skills / job types / verticals (built on first use)."""
+        if self._job_parser is None:
+            with self._lazy_lock:
+                if self._job_parser is None:
+                    self._job_parser = RuleBasedJobParser(self.candidates)
+        return self._job_parser
+
+    @property
+    def feature_engine(self) -> FeatureEngine:
+        """Columnar country / rate / creator arrays for vectorized feature scoring (built on first use)."""
+        if self._feature_engine is None:
+            with self._lazy_lock:
+                if self._feature_engine is None:
+                    self._feature_engine = FeatureEngine(self.candidates)
+        return self._feature_engine
+
+
+def build_directory(candidates) -> CandidateDirectory:
+    """Builds every index over a CandidateStore (a cleaned DataFrame is compacted first)."""
+    if isinstance(candidates, pd.DataFrame):
+        candidates = CandidateStore.from_frame(candidates)
+    store = build_embedding_store(candidates)
+    return CandidateDirectory(
+        candidates,
+        build_prefilter_index(candidates),
+        store,
+        build_retriever(store),
+        compute_norm_stats(candidates),
+    )
+
+
+def _merge_extreme(current, new, pick):
+    values = [v for v in (current, new) if pd.notna(v)]
+    return pick(values) if values else current
+
+
+def _update_norm_stats(stats: dict, df, removed, added) -> tuple:
+    """
+    Incrementally maintains (min, max) per normalized column.
+    Insertions only widen the range; a full column scan happens only when a removed row held an extreme.
+    Returns (new_stats, columns whose range changed).
+    """
+    new_stats, changed = {}, []
+    for col in NORMALIZED_COLUMNS:
+        min_val, max_val = stats[col]
+        if len(removed) and removed[col].isin([min_val, max_val]).any():
+            new_range = (df[col].min(), df[col].max())
+        else:
+            new_range = (_merge_extreme(min_val, added[col].min(), min), _merge_extreme(max_val, added[col].max(), max))
+        new_stats[col] = new_range
+        if new_range != (min_val, max_val):
+            changed.append(col)
+    return new_stats, changed
+
+
+class DirectoryHolder:
+    """
+    Owns the live CandidateDirectory. Batches are applied copy-on-write under a writer lock and the
+    new version is published with a single reference swap, so in-flight searches keep their snapshot.
+    Applied batches are appended to a journal that is replayed on the next start.
+    """
+
+    def __init__(self, directory: CandidateDirectory, journal_path: str = None):
+        self._current = directory
+        self._write_lock = threading.Lock()
+        self.journal_path = journal_path
+        self._next_id = int(directory.candidates.ids.max()) + 1 if len(directory) else 0
+
+    @property
+    def current(self) -> CandidateDirectory:
+        return self._current
+
+    def _prepare_upserts(self, candidates: CandidateStore, upserts: list) -> tuple:
+        """
+        Validates the records, assigns ids to new ones and merges each record over the existing raw row
+        (for updates) before the row-local cleaning. Returns (cleaned rows, records with their candidate_id).
+        Raises InvalidRecord without touching any state.
+        """
+        raw_columns = [c for c in candidates.columns if c not in DERIVED_COLUMNS]
+        existing = dict(zip(candidates.ids.tolist(), range(len(candidates)))) if upserts else {}
+        next_id = self._next_id
+        rows, assigned = {}, []
+        for record in upserts:
+            _validate_record(record)
+            record = dict(record)
+            candidate_id = record.pop("candidate_id", None)
+            if candidate_id is None:
+                candidate_id = next_id
+            candidate_id = int(candidate_id)
+            next_id = max(next_id, candidate_id + 1)
+            assigned.append({"candidate_id": candidate_id, **record})
+
+            if candidate_id in rows:
+                merged = rows[candidate_id]
+            elif candidate_id in existing:
+                merged = candidates.rows([existing[candidate_id]]).iloc[0][raw_columns].to_dict()
+            else:
+                merged = {}
+            merged.update({k: v for k, v in record.items() if k in raw_columns})
+            rows[candidate_id] = merged
+
+        added = pd.DataFrame(list(rows.values()), index=pd.Index(list(rows), dtype=np.int64), columns=raw_columns)
+        added = added.replace({None: np.nan})
+        self._next_id = next_id
+        return clean_profiles(added), assigned
+
+    def apply_batch(self, upserts: list = None, deletes: list = None, journal: bool = True) -> dict:
+        """Applies new/updated profiles (dicts with CSV column names, optional candidate_id) and deletions."""
+        for field, records in (("upserts", upserts), ("deletes", deletes)):
+            if records is not None and not isinstance(records, (list, tuple)):
+                raise InvalidRecord(f"{field} must be a list", field)
+        upserts, deletes = list(upserts or []), list(deletes or [])
+        for cid in deletes:
+            if not _is_candidate_id(cid):
+                raise InvalidRecord(f"deletes: {cid!r} is not a candidate id", "deletes")
+        with self._write_lock:
+            base = self._current
+            candidates = base.candidates
+            ids = candidates.index
+
+            added, upserts = self._prepare_upserts(candidates, upserts)
+            deleted_ids = {int(cid) for cid in deletes if int(cid) in ids} - set(added.index)
+            removed_ids = deleted_ids | (set(added.index) & set(ids))
+            removed_mask = ids.isin(list(removed_ids))
+            keep_positions = np.flatnonzero(~removed_mask)
+
+            rate_cols = list(NORMALIZED_COLUMNS)
+            rates = pd.DataFrame({col: candidates.numeric[col] for col in rate_cols})
+            norm_stats, changed = _update_norm_stats(
+                base.norm_stats, pd.concat([rates.iloc[keep_positions], added[rate_cols]]), rates[removed_mask], added)
+            added = CandidateStore.from_frame(apply_normalization(added, norm_stats), like=candidates)
+            new_candidates = candidates.take(keep_positions).concat(added)
+            if changed:
+                # Renormalize in float64 from the raw rates, exactly as a full rebuild would
+                rates = pd.DataFrame({col: np.asarray(new_candidates.numeric[col], dtype=np.float64) for col in changed})
+                rates = apply_normalization(rates, norm_stats, changed)
+                new_candidates = new_candidates.with_numeric({NORMALIZED_COLUMNS[col]: rates[NORMALIZED_COLUMNS[col]]
+                                                              for col in changed})
+
+            store = base.embedding_store.apply_changes(keep_positions, added)
+            # Everything derived is built here, before publishing, so searches never build it on the hot path
+            self._current = CandidateDirectory(
+                new_candidates,
+                base.prefilter_index.apply_changes(keep_positions, added),
+                store,
+                base.retriever.apply_changes(store, deleted_ids, added.index),
+                norm_stats,
+                base.version + 1,
+                (base.version, keep_positions),
+                base.job_parser.apply_changes(new_candidates),
+                base.feature_engine.apply_changes(keep_positions, added),
+            )
+
+            if journal and self.journal_path:
+                # Records are journaled with their assigned ids, so a replay recreates exactly these candidates
+                with open(self.journal_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"upserts": upserts, "deletes": deletes}, default=str) + "\n")
+
+        return {
+            "version": self._current.version,
+            "upserted": len(added),
+            "candidate_ids": [int(cid) for cid in added.index],
+            "deleted": len(deleted_ids),
+            "total": len(self._current),
+        }
+
+    def replay_journal(self) -> int:
+        """Re-applies previously ingested batches (e.g. after a restart). Returns the number of batches."""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        count = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    batch = json.loads(line)
+                    self.apply_batch(batch.get("upserts"), batch.get("deletes"), journal=False)
+                    count += 1
+        return count
+
+
+def _is_candidate_id(value) -> bool:
+    if isinstance(value, bool):
+        return False
+    try:
+        return int(value) == float(value) and int(value) >= 0
+    except (TypeError, ValueError, OverflowError):
+        return False
+
+
+def _validate_record(record):
+    """Raises InvalidRecord for anything apply_batch could only store as garbage."""
+    if not isinstance(record, dict):
+        raise InvalidRecord(f"each upsert must be an object, got {type(record).__name__}")
+    for field, value in record.items():
+        if field == "candidate_id":
+            if value is not None and not _is_candidate_id(value):
+                raise InvalidRecord(f"candidate_id: {value!r} is not a candidate id", field)
+        elif isinstance(value, (list, dict, bool)):
+            raise InvalidRecord(f"{field}: expected text or a number, got {type(value).__name__}", field)
+        elif field in NORMALIZED_COLUMNS and isinstance(value, str) and value.strip():
+            if pd.isna(parse_rates(pd.Series([value], dtype=object)).iloc[0]):
+                raise InvalidRecord(f"{field}: {value!r} is not a number", field)
+
+
+def journal_path_for(file_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """Ingestion journal tied to the exact source CSV, so a rewritten CSV starts a fresh journal."""
+    source_hash = read_snapshot_manifest(file_path, cache_dir).get("source_sha256", "unknown")[:12]
+    stem = os.path.splitext(os.path.basename(file_path))[0].replace(" ", "_")
+    return os.path.join(cache_dir, f"{stem}.{source_hash}.ingest.jsonl")
+
+
+# ==============================================================================
+# --- CLI: push JSONL / CSV chunks to a running server ---
+# ==============================================================================
+
+def read_records(path: str) -> tuple:
+    """Returns (upserts, deletes) from a JSONL file (records with "_delete": true are deletions) or a CSV."""
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path).dropna(how="all")
+        records = json.loads(df.to_json(orient="records"))
+        return records, []
+
+    upserts, deletes = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.pop("_delete", False):
+                deletes.append(record["candidate_id"])
+            else:
+                upserts.append(record)
+    return upserts, deletes
+
+
+def _post_batch(url: str, upserts: list, deletes: list) -> dict:
+    from urllib import request as urlrequest
+
+    body = json.dumps({"upserts": upserts, "deletes": deletes}).encode("utf-8")
+    req = urlrequest.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    with urlrequest.urlopen(req) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest candidate profiles into a running dashboard server.")
+    parser.add_argument("path", nargs="?", help="JSONL or CSV file with profiles (CSV column names, optional candidate_id)")
+    parser.add_argument("--delete", default="", help="Comma-separated candidate ids to delete")
+    parser.add_argument("--url", default="http://127.0.0.1:8080/api/candidates/ingest")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    upserts, deletes = read_records(args.path) if args.path else ([], [])
+    deletes += [int(cid) for cid in args.delete.split(",") if cid.strip()]
+
+    for start in range(0, max(len(upserts), 1), args.chunk_size):
+        chunk_deletes = deletes if start == 0 else []
+        summary = _post_batch(args.url, upserts[start:start + args.chunk_size], chunk_deletes)
+        print(f"✅ Batch applied: {summary}")
@@ -0,0 +1,66 @@
+# matcher/keyword_matcher.py
+"""
+Multi-pattern keyword matching: every keyword of every label is found in one scan of the text,
+with the same result as testing `keyword in text` for each keyword (overlapping and nested keywords included).
+"""
+
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordMatcher:
+    """
+    Labels -> keywords (e.g. personality trait -> its phrases), compiled once.
+    With pyahocorasick installed the keywords form an Aho-Corasick automaton. Otherwise one regex finds,
+    at every text position where some keyword starts, the longest keyword starting there; the shorter
+    keywords that are prefixes of it come from a precomputed table, so no occurrence is missed.
+    """
+
+    def __init__(self, keywords_by_label: dict):
+        self.labels = list(keywords_by_label)
+        labels_of = {}
+        for label, keywords in keywords_by_label.items():
+            for keyword in keywords:
+                if keyword:
+                    labels_of.setdefault(keyword.lower(), set()).add(label)
+
+        self._automaton = self._pattern = None
+        if not labels_of:
+            return
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for keyword, labels in labels_of.items():
+                self._automaton.add_word(keyword, frozenset(labels))
+            self._automaton.make_automaton()
+            return
+        # Longest first, so the alternation matches the longest keyword at each position
+        keywords = sorted(labels_of, key=len, reverse=True)
+        self._hits = {keyword: set().union(*(labels_of[other] for other in keywords if keyword.startswith(other)))
+                      for keyword in keywords}
+        self._pattern = re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+    def found(self, text) -> set:
+        """Labels with at least one keyword in the text (case-insensitive)."""
+        if not isinstance(text, str) or not text:
+            return set()
+        text = text.lower()
+        if self._automaton is not None:
+            return set().union(*(labels for _, labels in self._automaton.iter(text)))
+        if self._pattern is None:
+            return set()
+        labels, search = set(), self._pattern.search
+        # Resuming one character after each hit (not after its end) keeps overlapping keywords
+        match = search(text)
+        while match is not None:
+            labels |= self._hits[match.group()]
+            match = search(text, match.start() + 1)
+        return labels
+
+    def match(self, text) -> list:
+        """found(text) in label order."""
+        found = self.found(text)
+        return [label for label in self.labels if label in found]
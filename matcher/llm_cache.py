@@ -0,0 +1,97 @@
+# matcher/llm_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM results.
+    An in-process LRU with TTL sits in front of a SQLite table that survives restarts.
+    Values must be JSON-serializable; every get returns a fresh copy.
+    """
+
+    def __init__(self, db_path: str, max_entries: int = 2048, ttl_seconds: float = 7 * 24 * 3600, enabled: bool = True):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if enabled:
+            self._open_db()
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str, fields=None) -> str:
+        payload = json.dumps([provider, model, prompt, list(fields or [])], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached value, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+            self._memory.pop(key, None)
+
+            row = None
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key: str, value):
+        expires_at = time.time() + self.ttl_seconds
+        serialized = json.dumps(value)
+        with self._lock:
+            self._remember(key, serialized, expires_at)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                                 (key, serialized, expires_at))
+                self._db.commit()
+
+    def _remember(self, key: str, serialized: str, expires_at: float):
+        self._memory[key] = (expires_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
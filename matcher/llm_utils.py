@@ -3,21 +3,36 @@
 import os
 import json
 import re
-import time
-import sys
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # --- Import API libraries ---
-from openai import OpenAI, RateLimitError, AuthenticationError
+from openai import OpenAI, AuthenticationError
 import google.generativeai as genai
-from google.api_core.exceptions import ResourceExhausted, GoogleAPIError
 from google.auth.exceptions import DefaultCredentialsError
 
+from matcher import metrics
+from matcher.llm_cache import LLMCache
+from matcher.prompt_builder import batch_prompt, score_prompt
+from matcher.providers import HEDGED_OPERATIONS, LLM_TIMEOUT_SECONDS, openai_http_client, provider_manager
+
+# --- Models ---
+OPENAI_MODEL_NAME = "gpt-3.5-turbo"
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+
+# --- Endpoint overrides (e.g. the load-test stand-in server); unset = the real APIs ---
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT") or None
+
 # --- Initialize BOTH clients (globally, with error handling) ---
 openai_client = None
 try:
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if openai_api_key:
-        openai_client = OpenAI(api_key=openai_api_key)
+        # Pooled keep-alive connections; retries are handled by provider_manager, not the SDK
+        openai_client = OpenAI(api_key=openai_api_key, base_url=OPENAI_BASE_URL, http_client=openai_http_client(),
+                               max_retries=0, timeout=LLM_TIMEOUT_SECONDS)
         print("✅ OpenAI client initialized successfully (globally).")
     else:
         print("⚠️ OPENAI_API_KEY not found. OpenAI client will not be available.")
@@ -30,8 +45,13 @@ GEMINI_MODEL = None
 try:
     gemini_api_key = os.getenv("GOOGLE_API_KEY")
     if gemini_api_key:
-        genai.configure(api_key=gemini_api_key)
-        GEMINI_MODEL = genai.GenerativeModel("gemini-1.5-flash")
+        if GEMINI_API_ENDPOINT:
+            # A custom endpoint is plain HTTP(S): use the REST transport instead of gRPC
+            genai.configure(api_key=gemini_api_key, transport="rest",
+                            client_options={"api_endpoint": GEMINI_API_ENDPOINT})
+        else:
+            genai.configure(api_key=gemini_api_key)
+        GEMINI_MODEL = genai.GenerativeModel(GEMINI_MODEL_NAME)
         print("✅ Gemini client initialized successfully (globally).")
     else:
         print("⚠️ GOOGLE_API_KEY not found. Gemini client will not be available.")
@@ -40,18 +60,24 @@ except DefaultCredentialsError:
 except Exception as e:
     print(f"🚨 Failed to initialize Gemini client globally: {type(e).__name__} - {e}")
 
-# --- Models ---
-OPENAI_MODEL_NAME = "gpt-3.5-turbo"
+# --- Concurrency (max in-flight requests per provider) ---
+LLM_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "4")),
+}
+_provider_slots = {provider: threading.BoundedSemaphore(limit) for provider, limit in LLM_CONCURRENCY.items()}
 
+ZERO_SCORES = {"skills_score": 0.0, "jobtype_score": 0.0, "trait_score": 0.0}
 
-# --- Utility Functions ---
-def _optimize_prompt(prompt: str) -> str:
-    """Optimize prompt for faster processing."""
-    if len(prompt) > 500:
-        prompt = prompt[:450] + "... Please provide a concise response."
-    return prompt
+# --- Response cache (set LLM_CACHE_ENABLED=0 to bypass globally) ---
+llm_cache = LLMCache(
+    os.getenv("LLM_CACHE_PATH", os.path.join("data", "cache", "llm_cache.sqlite3")),
+    ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))),
+    enabled=os.getenv("LLM_CACHE_ENABLED", "1") != "0",
+)
 
 
+# --- Utility Functions ---
 def is_available(provider: str) -> bool:
     """Check if a specific LLM provider is available."""
     if provider.lower() == 'openai':
@@ -61,6 +87,83 @@ def is_available(provider: str) -> bool:
     return False
 
 
+def _cached_call(provider: str, model: str, prompt: str, fields, call, use_cache: bool = True):
+    """Returns the cached result for this (provider, model, prompt, fields) or runs call() and stores it."""
+    if not use_cache or not llm_cache.enabled:
+        return call()
+    key = llm_cache.make_key(provider, model, prompt, fields)
+    cached = llm_cache.get(key)
+    metrics.record_cache(cached is not None)
+    if cached is not None:
+        return cached
+    result = call()
+    llm_cache.set(key, result)
+    return result
+
+
+def _record_openai_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.record_tokens('openai', usage.prompt_tokens or 0, usage.completion_tokens or 0, usage.total_tokens)
+
+
+def _record_gemini_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        metrics.record_tokens('gemini', usage.prompt_token_count or 0, usage.candidates_token_count or 0,
+                              usage.total_token_count)
+
+
+PROVIDER_LABELS = {'openai': 'OpenAI', 'gemini': 'Gemini'}
+
+
+def _with_slot(provider: str, request):
+    """
+    request (one HTTP call) run while holding one of the provider's concurrency slots.
+    Wraps the callable given to provider_manager.send, so backoff sleeps between retries don't hold a slot.
+    """
+    def run():
+        with _provider_slots[provider]:
+            return request()
+    return run
+
+
+def _run_with_fallback(operation: str, action: str, attempts: dict):
+    """
+    Runs attempts (provider -> fn, in preference order) until one succeeds, skipping providers
+    that are unavailable or whose circuit is open. Latency-critical operations may be hedged.
+    Raises the last error if every provider fails.
+    """
+    def logged(provider, fn):
+        def run():
+            print(f"-> {action} with {PROVIDER_LABELS[provider]}...")
+            try:
+                return fn()
+            except Exception as e:
+                print(f"⚠️ {PROVIDER_LABELS[provider]} failed ({type(e).__name__}).")
+                raise
+        return run
+
+    ready = [(provider, logged(provider, fn)) for provider, fn in attempts.items()
+             if is_available(provider) and not provider_manager.is_open(provider)]
+    return provider_manager.first_success(operation, ready, hedge=operation in HEDGED_OPERATIONS)
+
+
+def _gemini_generate(prompt: str):
+    return GEMINI_MODEL.generate_content(prompt, request_options={"timeout": LLM_TIMEOUT_SECONDS})
+
+
+def _openai_request(system_prompt: str, user_prompt: str, json_mode: bool = True) -> dict:
+    """Keyword arguments for chat.completions.create (shared by the sync and async clients)."""
+    request = {
+        "model": OPENAI_MODEL_NAME,
+        "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+    }
+    if json_mode:
+        request["response_format"] = {"type": "json_object"}
+    return request
+
+
 def clean_json_response(content: str) -> str:
     """Remove ```json ... ``` fences if the model returns them."""
     if content.startswith("```"):
@@ -72,117 +175,234 @@ def clean_json_response(content: str) -> str:
 # --- DYNAMIC EXTRACTION FUNCTIONS (THESE ARE THE CHANGES) ---
 # ==============================================================================
 
-def extract_job_info_from_text(text: str, fields_to_extract: list) -> dict:
+DEFAULT_JOB_FIELDS = ["hiring_creator_name", "location_pref", "job_types", "relevant_skills",
+                      "personality_traits", "budget_monthly", "content_verticals"]
+
+
+def extract_job_info_from_text(text: str, fields_to_extract: list = None, use_cache: bool = True) -> dict:
     """
     Tries to extract job info with OpenAI, falls back to Gemini on failure.
     Dynamically builds the prompt based on the fields_to_extract list.
+    Identical requests are served from llm_cache unless use_cache is False.
     """
     # Use a default set of fields if the user provides none, ensuring scoring can work.
-    if not fields_to_extract:
-        fields_to_extract = ["hiring_creator_name", "location_pref", "job_types", "relevant_skills",
-                             "personality_traits", "budget_monthly", "content_verticals"]
-
-    if is_available('openai'):
-        try:
-            print("-> Extracting job info with OpenAI...")
-            return _openai_extract_job_info(text, fields_to_extract)
-        except (RateLimitError, Exception) as e:
-            print(f"⚠️ OpenAI failed ({type(e).__name__}). Switching to Gemini fallback.")
-
-    if is_available('gemini'):
-        try:
-            print("-> Extracting job info with Gemini...")
-            return _gemini_extract_job_info(text, fields_to_extract)
-        except Exception as e2:
-            print(f"🚨 Fallback API (Gemini) also failed: {e2}")
+    fields_to_extract = fields_to_extract or DEFAULT_JOB_FIELDS
 
-    print("🚨 All LLM providers failed. Cannot extract job info.")
-    return {}
+    try:
+        return _run_with_fallback('extract_job', "Extracting job info", {
+            'openai': lambda: _openai_extract_job_info(text, fields_to_extract, use_cache),
+            'gemini': lambda: _gemini_extract_job_info(text, fields_to_extract, use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed ({type(e).__name__}). Cannot extract job info.")
+        return {}
 
 
-def _openai_extract_job_info(text: str, fields_to_extract: list) -> dict:
+def _openai_extract_prompts(text: str, fields_to_extract: list) -> tuple:
     """Dynamically creates a prompt for OpenAI based on user-defined fields."""
     # Convert the list of fields into a formatted string for the prompt
     fields_str = "\n- ".join(fields_to_extract)
 
     system_prompt = "You are an AI assistant that extracts structured talent profile information into a valid JSON object. Extract only the fields the user requests."
     user_prompt = f"From the job description below, please extract the following fields:\n- {fields_str}\n\nJob Description:\n\"\"\" \n{text}\n\"\"\""
+    return system_prompt, user_prompt
 
-    response = openai_client.chat.completions.create(
-        model=OPENAI_MODEL_NAME,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-        response_format={"type": "json_object"}
-    )
-    return json.loads(response.choices[0].message.content)
 
-
-def _gemini_extract_job_info(text: str, fields_to_extract: list) -> dict:
+def _gemini_extract_prompt(text: str, fields_to_extract: list) -> str:
     """Dynamically creates a prompt for Gemini based on user-defined fields."""
     # Convert the list of fields into a formatted string for the prompt
     fields_str = "\n- ".join(fields_to_extract)
 
-    prompt = f"You are an AI assistant. From the job description below, extract the following fields into a valid JSON object:\n- {fields_str}\n\nJob Description:\n\"\"\" \n{text}\n\"\"\""
+    return f"You are an AI assistant. From the job description below, extract the following fields into a valid JSON object:\n- {fields_str}\n\nJob Description:\n\"\"\" \n{text}\n\"\"\""
+
+
+def _openai_extract_job_info(text: str, fields_to_extract: list, use_cache: bool = True) -> dict:
+    system_prompt, user_prompt = _openai_extract_prompts(text, fields_to_extract)
+
+    def call():
+        response = provider_manager.send('openai', 'extract_job', lambda: openai_client.chat.completions.create(
+            **_openai_request(system_prompt, user_prompt)))
+        _record_openai_usage(response)
+        return json.loads(response.choices[0].message.content)
+
+    return _cached_call('openai', OPENAI_MODEL_NAME, system_prompt + user_prompt, fields_to_extract, call, use_cache)
+
 
-    response = GEMINI_MODEL.generate_content(prompt)
-    content = clean_json_response(response.text.strip())
-    return json.loads(content)
+def _gemini_extract_job_info(text: str, fields_to_extract: list, use_cache: bool = True) -> dict:
+    prompt = _gemini_extract_prompt(text, fields_to_extract)
+
+    def call():
+        response = provider_manager.send('gemini', 'extract_job', lambda: _gemini_generate(prompt))
+        _record_gemini_usage(response)
+        content = clean_json_response(response.text.strip())
+        return json.loads(content)
+
+    return _cached_call('gemini', GEMINI_MODEL_NAME, prompt, fields_to_extract, call, use_cache)
 
 
 # ==============================================================================
 # --- SCORING FUNCTIONS (NO CHANGES NEEDED HERE) ---
 # ==============================================================================
 
-def llm_score_candidate_aspects(candidate: dict, job: dict) -> dict:
+def llm_score_candidate_aspects(candidate: dict, job: dict, use_cache: bool = True) -> dict:
     """
     Tries to score aspects with OpenAI, falls back to Gemini on failure.
     This function remains fixed to ensure consistent scoring.
+    Repeated candidate/job pairs are served from llm_cache unless use_cache is False.
     """
-    if is_available('openai'):
-        try:
-            print("-> Scoring with OpenAI...")
-            return _openai_score_candidate_aspects(candidate, job)
-        except (RateLimitError, Exception) as e:
-            print(f"⚠️ OpenAI failed ({type(e).__name__}). Switching to Gemini fallback.")
-
-    if is_available('gemini'):
-        try:
-            print("-> Scoring with Gemini...")
-            return _gemini_score_candidate_aspects(candidate, job)
-        except Exception as e2:
-            print(f"🚨 Fallback API (Gemini) also failed: {e2}")
-
-    print("🚨 All LLM providers failed. Returning zero scores.")
-    return {"skills_score": 0.0, "jobtype_score": 0.0, "trait_score": 0.0}
-
-
-def _openai_score_candidate_aspects(candidate: dict, job: dict) -> dict:
-    # This function is unchanged.
+    try:
+        return _run_with_fallback('score_candidate', "Scoring", {
+            'openai': lambda: _openai_score_candidate_aspects(candidate, job, use_cache),
+            'gemini': lambda: _gemini_score_candidate_aspects(candidate, job, use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed ({type(e).__name__}). Returning zero scores.")
+        return dict(ZERO_SCORES)
+
+
+SCORE_SYSTEM_PROMPT = "You are an expert talent evaluator. Return a valid JSON with keys 'skills_score', 'jobtype_score', 'trait_score' (floats from 0.0 to 1.0)."
+GEMINI_SCORE_INSTRUCTIONS = "You are an expert talent evaluator. On a scale of 0.0 to 1.0, provide scores for Skill Match, Job Type Match, and Personality Alignment. Return a valid JSON with keys 'skills_score', 'jobtype_score', 'trait_score'."
+
+
+def _openai_score_prompts(candidate: dict, job: dict) -> tuple:
+    return SCORE_SYSTEM_PROMPT, score_prompt(candidate, job, SCORE_SYSTEM_PROMPT)
+
+
+def _gemini_score_prompt(candidate: dict, job: dict) -> str:
+    return f"{GEMINI_SCORE_INSTRUCTIONS}\n\n{score_prompt(candidate, job, GEMINI_SCORE_INSTRUCTIONS)}"
+
+
+def _openai_score_candidate_aspects(candidate: dict, job: dict, use_cache: bool = True) -> dict:
     if not openai_client:
         raise RuntimeError("OpenAI client not initialized.")
-    system_prompt = "You are an expert talent evaluator. Return a valid JSON with keys 'skills_score', 'jobtype_score', 'trait_score' (floats from 0.0 to 1.0)."
-    user_prompt = f"Candidate Skills: {candidate.get('Skills_list', [])}\nJob Skills: {job.get('relevant_skills', [])}\n\nCandidate Job Types: {candidate.get('JobTypes_list', [])}\nJob Types: {job.get('job_types', [])}\n\nCandidate Profile: {candidate.get('Profile_clean', '')}\nJob Traits: {job.get('personality_traits', [])}"
+    system_prompt, user_prompt = _openai_score_prompts(candidate, job)
 
-    optimized_user_prompt = _optimize_prompt(user_prompt)
+    def call():
+        response = provider_manager.send('openai', 'score_candidate', _with_slot('openai', lambda: openai_client.chat.completions.create(
+            **_openai_request(system_prompt, user_prompt))))
+        _record_openai_usage(response)
+        return json.loads(response.choices[0].message.content)
 
-    response = openai_client.chat.completions.create(
-        model=OPENAI_MODEL_NAME,
-        messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": optimized_user_prompt}],
-        response_format={"type": "json_object"}
-    )
-    return json.loads(response.choices[0].message.content)
+    return _cached_call('openai', OPENAI_MODEL_NAME, system_prompt + user_prompt, list(ZERO_SCORES), call, use_cache)
 
 
-def _gemini_score_candidate_aspects(candidate: dict, job: dict) -> dict:
-    # This function is unchanged.
+def _gemini_score_candidate_aspects(candidate: dict, job: dict, use_cache: bool = True) -> dict:
     if not GEMINI_MODEL:
         raise RuntimeError("Gemini model not initialized.")
-    prompt = f"You are an expert talent evaluator. On a scale of 0.0 to 1.0, provide scores for Skill Match, Job Type Match, and Personality Alignment. Return a valid JSON with keys 'skills_score', 'jobtype_score', 'trait_score'.\n\nCandidate Skills: {candidate.get('Skills_list', [])}\nJob Skills: {job.get('relevant_skills', [])}\n\nCandidate Job Types: {candidate.get('JobTypes_list', [])}\nJob Types: {job.get('job_types', [])}\n\nCandidate Profile: {candidate.get('Profile_clean', '')}\nJob Traits: {job.get('personality_traits', [])}"
+    prompt = _gemini_score_prompt(candidate, job)
+
+    def call():
+        response = provider_manager.send('gemini', 'score_candidate', _with_slot('gemini', lambda: _gemini_generate(prompt)))
+        _record_gemini_usage(response)
+        content = clean_json_response(response.text.strip())
+        return json.loads(content)
+
+    return _cached_call('gemini', GEMINI_MODEL_NAME, prompt, list(ZERO_SCORES), call, use_cache)
+
+
+# ==============================================================================
+# --- CONCURRENT / BATCHED SCORING ---
+# ==============================================================================
+
+def _parse_batch_scores(content: str) -> dict:
+    """Maps candidate id (as a string) -> scores from a {"results": [...]} or bare JSON array reply."""
+    data = json.loads(clean_json_response(content))
+    if isinstance(data, dict):
+        data = data.get("results", [])
+    scores = {}
+    for item in data:
+        if isinstance(item, dict) and "candidate_id" in item:
+            scores[str(item["candidate_id"])] = {key: float(item.get(key, 0.0)) for key in ZERO_SCORES}
+    return scores
 
-    optimized_prompt = _optimize_prompt(prompt)
 
-    response = GEMINI_MODEL.generate_content(optimized_prompt)
-    content = clean_json_response(response.text.strip())
-    return json.loads(content)
+def _openai_batch_prompts(candidates: list, job: dict) -> tuple:
+    system_prompt = "You are an expert talent evaluator. Return a valid JSON object {\"results\": [...]} with one entry per candidate, each with keys 'candidate_id', 'skills_score', 'jobtype_score', 'trait_score' (floats from 0.0 to 1.0)."
+    return system_prompt, batch_prompt(candidates, job)
+
+
+def _gemini_batch_prompt(candidates: list, job: dict) -> str:
+    return "You are an expert talent evaluator. For every candidate below, score Skill Match, Job Type Match and Personality Alignment from 0.0 to 1.0. Return a valid JSON array with one object per candidate, each with keys 'candidate_id', 'skills_score', 'jobtype_score', 'trait_score'.\n\n" + batch_prompt(candidates, job)
+
+
+def _openai_score_candidate_batch(candidates: list, job: dict, use_cache: bool = True) -> dict:
+    if not openai_client:
+        raise RuntimeError("OpenAI client not initialized.")
+    system_prompt, user_prompt = _openai_batch_prompts(candidates, job)
+
+    def call():
+        response = provider_manager.send('openai', 'score_batch', _with_slot('openai', lambda: openai_client.chat.completions.create(
+            **_openai_request(system_prompt, user_prompt))))
+        _record_openai_usage(response)
+        return _parse_batch_scores(response.choices[0].message.content)
+
+    return _cached_call('openai', OPENAI_MODEL_NAME, system_prompt + user_prompt, list(ZERO_SCORES), call, use_cache)
+
+
+def _gemini_score_candidate_batch(candidates: list, job: dict, use_cache: bool = True) -> dict:
+    if not GEMINI_MODEL:
+        raise RuntimeError("Gemini model not initialized.")
+    prompt = _gemini_batch_prompt(candidates, job)
+
+    def call():
+        response = provider_manager.send('gemini', 'score_batch', _with_slot('gemini', lambda: _gemini_generate(prompt)))
+        _record_gemini_usage(response)
+        return _parse_batch_scores(response.text.strip())
+
+    return _cached_call('gemini', GEMINI_MODEL_NAME, prompt, list(ZERO_SCORES), call, use_cache)
+
+
+def llm_score_candidate_batch(candidates: list, job: dict, use_cache: bool = True) -> list:
+    """
+    Scores a batch of (candidate_id, candidate) pairs in a single prompt.
+    Tries OpenAI first, falls back to Gemini; candidates missing from the reply are scored individually.
+    """
+    try:
+        scores = _run_with_fallback('score_batch', f"Batch scoring {len(candidates)} candidates", {
+            'openai': lambda: _openai_score_candidate_batch(candidates, job, use_cache),
+            'gemini': lambda: _gemini_score_candidate_batch(candidates, job, use_cache),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed the batch ({type(e).__name__}). Scoring candidates individually.")
+        scores = {}
+
+    return [scores.get(str(candidate_id)) or llm_score_candidate_aspects(candidate, job, use_cache)
+            for candidate_id, candidate in candidates]
+
+
+def iter_candidate_scores(candidates: list, job: dict, batch_size: int = None, max_workers: int = None,
+                          use_cache: bool = True):
+    """
+    Scores (candidate_id, candidate) pairs on a thread pool, one call per candidate or per batch,
+    and yields (candidate_id, scores) as each call completes. Per-provider semaphores cap in-flight requests.
+    """
+    if not candidates:
+        return
+    if batch_size and batch_size > 1:
+        chunks = [candidates[i:i + batch_size] for i in range(0, len(candidates), batch_size)]
+        work = lambda chunk: llm_score_candidate_batch(chunk, job, use_cache)
+    else:
+        chunks = [[pair] for pair in candidates]
+        work = lambda chunk: [llm_score_candidate_aspects(chunk[0][1], job, use_cache)]
+
+    max_workers = max_workers or max(LLM_CONCURRENCY.values())
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as pool:
+        # Each task runs in a copy of the caller's context so per-request traces see the LLM calls
+        futures = {pool.submit(contextvars.copy_context().run, work, chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            for (candidate_id, _), scores in zip(futures[future], future.result()):
+                yield candidate_id, scores
+
+
+def score_candidates_concurrently(candidates: list, job: dict, batch_size: int = None, max_workers: int = None,
+                                  use_cache: bool = True) -> list:
+    """Same as iter_candidate_scores, but waits for every score and returns them in input order."""
+    scores_by_id = dict(iter_candidate_scores(candidates, job, batch_size, max_workers, use_cache))
+    return [scores_by_id[candidate_id] for candidate_id, _ in candidates]
+
+
+CHAT_SYSTEM_PROMPT = "You are a friendly and helpful AI assistant for a talent dashboard. Your name is Eva. Keep your answers concise and cheerful."
+CHAT_FAILURE_MESSAGE = "I'm sorry, I'm having trouble connecting right now. Please try again later."
 
 
 def get_friendly_chat_response(user_message: str) -> str:
@@ -190,37 +410,34 @@ def get_friendly_chat_response(user_message: str) -> str:
     Gets a friendly response from an LLM for the chat agent.
     Tries OpenAI first, then falls back to Gemini.
     """
-    if is_available('openai'):
-        try:
-            return _openai_get_chat_response(user_message)
-        except Exception as e:
-            print(f"⚠️ OpenAI chat failed ({type(e).__name__}). Switching to Gemini fallback.")
+    try:
+        return _run_with_fallback('chat', "Chatting", {
+            'openai': lambda: _openai_get_chat_response(user_message),
+            'gemini': lambda: _gemini_get_chat_response(user_message),
+        })
+    except Exception as e:
+        print(f"🚨 All LLM providers failed for chat ({type(e).__name__}).")
+
+    return CHAT_FAILURE_MESSAGE
 
-    if is_available('gemini'):
-        try:
-            return _gemini_get_chat_response(user_message)
-        except Exception as e2:
-            print(f"🚨 Fallback API (Gemini) for chat also failed: {e2}")
 
-    return "I'm sorry, I'm having trouble connecting right now. Please try again later."
+def _gemini_chat_prompt(user_message: str) -> str:
+    # Gemini works better with the instruction integrated into the prompt
+    return f"You are a friendly and helpful AI assistant for a talent dashboard named Eva. Keep your answer concise and cheerful.\n\nUSER: {user_message}\nEVA:"
 
 
 def _openai_get_chat_response(user_message: str) -> str:
     """Gets a chat response from OpenAI."""
-    system_prompt = "You are a friendly and helpful AI assistant for a talent dashboard. Your name is Eva. Keep your answers concise and cheerful."
-
-    response = openai_client.chat.completions.create(
-        model=OPENAI_MODEL_NAME,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_message}])
+    response = provider_manager.send('openai', 'chat', lambda: openai_client.chat.completions.create(
+        **_openai_request(CHAT_SYSTEM_PROMPT, user_message, json_mode=False)))
+    _record_openai_usage(response)
     return response.choices[0].message.content
 
 
 def _gemini_get_chat_response(user_message: str) -> str:
     """Gets a chat response from Gemini."""
-    # Gemini works better with the instruction integrated into the prompt
-    prompt = f"You are a friendly and helpful AI assistant for a talent dashboard named Eva. Keep your answer concise and cheerful.\n\nUSER: {user_message}\nEVA:"
+    prompt = _gemini_chat_prompt(user_message)
 
-    response = GEMINI_MODEL.generate_content(prompt)
-    return response.text
\ No newline at end of file
+    response = provider_manager.send('gemini', 'chat', lambda: _gemini_generate(prompt))
+    _record_gemini_usage(response)
+    return response.text
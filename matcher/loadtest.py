@@ -0,0 +1,452 @@
+# matcher/loadtest.py
+"""
+Load-test harness: starts a local stand-in for the OpenAI and Gemini HTTP APIs (configurable latency,
+error rate and 429 injection), starts the app (waitress or ASGI) pointed at it, and drives
+/api/find_matches and /api/ai_chat at increasing concurrency. Reports throughput, p50/p95/p99 latency
+and error rates per level, plus where the time went (the app's stage metrics) and what the mock served.
+
+    python -m matcher.loadtest --concurrency 1,4,16 --requests 40 --llm-latency lognormal:800,0.5 --rate-limit-rate 0.05
+
+No API quota is used. With --target the app is not started; run it yourself with
+OPENAI_BASE_URL=<mock>/v1 and GEMINI_API_ENDPOINT=<mock> (see --mock-only).
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from matcher.benchmark import DEFAULT_JOBS_PATH, FixtureLLM
+from matcher.llm_utils import CHAT_FAILURE_MESSAGE
+
+DEFAULT_OUTPUT_PATH = os.path.join("benchmarks", "results", "loadtest.json")
+CHAT_MESSAGES = [
+    "Hi Eva! What can you help me with?",
+    "How do I write a good job description for a video editor?",
+    "What does the match score mean?",
+]
+
+
+# ==============================================================================
+# --- Latency distributions ---
+# ==============================================================================
+
+def parse_latency(spec: str):
+    """
+    A latency spec -> a function returning one sampled delay in seconds. All values are milliseconds:
+    "300" (fixed), "uniform:200,1200", "normal:800,200" (mean, stddev), "lognormal:800,0.5" (median, sigma),
+    "exp:500" (mean).
+    """
+    kind, _, params = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+    try:
+        values = [float(value) for value in params.split(",")]
+    except ValueError:
+        raise ValueError(f"Bad latency spec: {spec!r}")
+    seconds = [value / 1000.0 for value in values]
+    if kind == "fixed" and len(values) == 1:
+        return lambda: seconds[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda: random.uniform(seconds[0], seconds[1])
+    if kind == "normal" and len(values) == 2:
+        return lambda: max(0.0, random.gauss(seconds[0], seconds[1]))
+    if kind == "lognormal" and len(values) == 2 and values[0] > 0:
+        return lambda: random.lognormvariate(math.log(seconds[0]), values[1])
+    if kind == "exp" and len(values) == 1 and values[0] > 0:
+        return lambda: random.expovariate(1.0 / seconds[0])
+    raise ValueError(f"Bad latency spec: {spec!r}")
+
+
+# ==============================================================================
+# --- LLM stand-in server ---
+# ==============================================================================
+
+class MockLLMServer:
+    """
+    Speaks enough of the OpenAI chat.completions and Gemini generateContent REST APIs for llm_utils and
+    async_llm. Answers come from the benchmark's FixtureLLM (chat gets a canned reply). Each request sleeps
+    for a sampled latency, then fails with 500 at error_rate, with 429 at rate_limit_rate, or with 429 once
+    a provider exceeds rpm_limit requests in the last minute (0 = no quota).
+    """
+
+    def __init__(self, jobs: list, latency=lambda: 0.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 rpm_limit: int = 0, host: str = "127.0.0.1", port: int = 0):
+        self.fixture = FixtureLLM(jobs)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rpm_limit = rpm_limit
+        self._lock = threading.Lock()
+        self._recent = {"openai": [], "gemini": []}
+        self._in_flight = 0
+        self.reset_stats()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {"requests": {"openai": 0, "gemini": 0}, "injected_errors": 0, "rate_limited": 0,
+                          "max_in_flight": 0}
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _admit(self, provider: str):
+        """Counts the request and decides its fate: None (answer it), 429 or 500."""
+        with self._lock:
+            now = time.monotonic()
+            self.stats["requests"][provider] += 1
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            recent = self._recent[provider] = [t for t in self._recent[provider] if now - t < 60.0]
+            over_quota = self.rpm_limit and len(recent) >= self.rpm_limit
+            if not over_quota:
+                recent.append(now)
+        roll = random.random()
+        if over_quota or roll < self.rate_limit_rate:
+            status = 429
+        elif roll < self.rate_limit_rate + self.error_rate:
+            status = 500
+        else:
+            return None
+        with self._lock:
+            self.stats["rate_limited" if status == 429 else "injected_errors"] += 1
+        return status
+
+    def _done(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/").endswith("/chat/completions"):
+                    provider = "openai"
+                elif re.search(r"/models/[^/:]+:generateContent", self.path):
+                    provider = "gemini"
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                try:
+                    status = server._admit(provider)
+                    time.sleep(server.latency())
+                    if status is not None:
+                        self._send_error(provider, status)
+                    elif provider == "openai":
+                        self._send(200, server._openai_reply(body))
+                    else:
+                        self._send(200, server._gemini_reply(body))
+                finally:
+                    server._done()
+
+            def _send_error(self, provider: str, status: int):
+                message = "Rate limit reached (mock)." if status == 429 else "Injected server error (mock)."
+                if provider == "openai":
+                    body = {"error": {"message": message, "code": None,
+                                      "type": "rate_limit_error" if status == 429 else "server_error"}}
+                else:
+                    body = {"error": {"code": status, "message": message,
+                                      "status": "RESOURCE_EXHAUSTED" if status == 429 else "INTERNAL"}}
+                self._send(status, body, {"Retry-After": "1"} if status == 429 else None)
+
+        return Handler
+
+    def _answer(self, prompt: str, chat: bool) -> str:
+        if chat:
+            return "Hi, I'm Eva (mock)! I can help you find the right creators for your project."
+        return self.fixture.respond(prompt)
+
+    def _openai_reply(self, body: dict) -> dict:
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        # Chat is the only call made without JSON mode
+        content = self._answer(prompt, chat="response_format" not in body)
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        return {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def _gemini_reply(self, body: dict) -> dict:
+        prompt = "\n".join(part.get("text", "") for content in body.get("contents", [])
+                           for part in content.get("parts", []))
+        content = self._answer(prompt, chat=prompt.rstrip().endswith("EVA:"))
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        return {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": content}]}, "finishReason": "STOP",
+                            "index": 0}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                              "totalTokenCount": prompt_tokens + completion_tokens},
+        }
+
+
+# ==============================================================================
+# --- App under test ---
+# ==============================================================================
+
+def mock_env(mock_url: str, llm_cache: bool = False) -> dict:
+    """Environment that points llm_utils / async_llm at the mock (any key works)."""
+    return {
+        "OPENAI_API_KEY": "loadtest", "OPENAI_BASE_URL": f"{mock_url}/v1",
+        "GOOGLE_API_KEY": "loadtest", "GEMINI_API_ENDPOINT": mock_url,
+        "LLM_CACHE_ENABLED": "1" if llm_cache else "0",
+    }
+
+
+def start_app(server: str, port: int, env: dict, startup_timeout: float = 300.0):
+    """Starts `python app.py` (waitress) or uvicorn asgi:app on port and waits until /metrics answers."""
+    if server == "asgi":
+        command = [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                   "--log-level", "warning"]
+    else:
+        command = [sys.executable, "app.py"]
+    process = subprocess.Popen(command, env=dict(os.environ, **env, PORT=str(port)))
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The {server} server exited during startup (code {process.returncode}).")
+        try:
+            with urllib.request.urlopen(f"{base_url}/metrics", timeout=2.0):
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"The {server} server did not come up within {startup_timeout:.0f}s.")
+
+
+def scrape_stages(base_url: str) -> dict:
+    """stage -> (total seconds, count) from the app's matcher_stage_duration_seconds histogram."""
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=10.0) as response:
+            text = response.read().decode("utf-8")
+    except OSError:
+        return {}
+    stages = {}
+    for kind, name, value in re.findall(r'^matcher_stage_duration_seconds_(sum|count)\{stage="([^"]+)"\} (\S+)$',
+                                        text, re.MULTILINE):
+        total, count = stages.get(name, (0.0, 0))
+        stages[name] = (float(value), count) if kind == "sum" else (total, int(float(value)))
+    return stages
+
+
+# ==============================================================================
+# --- Load driver ---
+# ==============================================================================
+
+def _percentile(sorted_values: list, pct: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _summarize(samples: list, wall_s: float) -> dict:
+    latencies = sorted(latency for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / wall_s, 3) if wall_s else None,
+        **{f"p{pct}_ms": round(_percentile(latencies, pct) * 1000, 1) if latencies else None for pct in (50, 95, 99)},
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+    }
+
+
+def run_level(base_url: str, jobs: list, concurrency: int, requests: int, chat_ratio: float = 0.2,
+              scoring_mode: str = None, timeout: float = 120.0) -> dict:
+    """
+    Closed loop: `concurrency` workers issue `requests` requests in total, each starting its next
+    request as soon as the last one returns. A request counts as an error on a transport failure,
+    a non-2xx status or a chat reply that is the failure message.
+    """
+    counter = itertools.count()
+    samples = {"find_matches": [], "ai_chat": []}
+    lock = threading.Lock()
+    rng = random.Random(concurrency)
+
+    address = urllib.parse.urlsplit(base_url)
+
+    def worker():
+        # One keep-alive connection per worker, reopened after a failure
+        connection = None
+        while next(counter) < requests:
+            with lock:
+                is_chat = rng.random() < chat_ratio
+                job = rng.choice(jobs)
+                message = rng.choice(CHAT_MESSAGES)
+            endpoint = "ai_chat" if is_chat else "find_matches"
+            payload = {"message": message} if is_chat else {"job_description": job["description"]}
+            if scoring_mode and not is_chat:
+                payload["scoring_mode"] = scoring_mode
+            start = time.perf_counter()
+            try:
+                connection = connection or http.client.HTTPConnection(address.hostname, address.port or 80,
+                                                                       timeout=timeout)
+                connection.request("POST", f"/api/{endpoint}", json.dumps(payload),
+                                   {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                text = response.read().decode("utf-8")
+                ok = 200 <= response.status < 300 and not (is_chat and CHAT_FAILURE_MESSAGE in text)
+            except (OSError, http.client.HTTPException):
+                if connection is not None:
+                    connection.close()
+                connection, ok = None, False
+            with lock:
+                samples[endpoint].append((time.perf_counter() - start, ok))
+        if connection is not None:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(worker) for _ in range(concurrency)]:
+            future.result()
+    wall_s = time.perf_counter() - start
+
+    report = {"concurrency": concurrency, "wall_time_s": round(wall_s, 3),
+              "overall": _summarize(samples["find_matches"] + samples["ai_chat"], wall_s)}
+    report.update({endpoint: _summarize(values, wall_s) for endpoint, values in samples.items() if values})
+    return report
+
+
+def run_loadtest(concurrency_levels: list, requests: int, jobs_path: str = DEFAULT_JOBS_PATH,
+                 latency_spec: str = "lognormal:800,0.5", error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 rpm_limit: int = 0, server: str = "waitress", port: int = 8090, target: str = None,
+                 chat_ratio: float = 0.2, scoring_mode: str = None, llm_cache: bool = False) -> dict:
+    with open(jobs_path, "r", encoding="utf-8") as f:
+        jobs = json.load(f)["jobs"]
+
+    # An external target brings its own LLM endpoints (e.g. a --mock-only server)
+    mock = process = None
+    try:
+        if target:
+            base_url = target.rstrip("/")
+        else:
+            mock = MockLLMServer(jobs, parse_latency(latency_spec), error_rate, rate_limit_rate, rpm_limit).start()
+            print(f"✅ Mock LLM server listening on {mock.url}")
+            print(f"-> Starting the {server} server on port {port}...")
+            process, base_url = start_app(server, port, mock_env(mock.url, llm_cache))
+
+        levels = []
+        for concurrency in concurrency_levels:
+            before = scrape_stages(base_url)
+            if mock is not None:
+                mock.reset_stats()
+            level = run_level(base_url, jobs, concurrency, requests, chat_ratio, scoring_mode)
+            after = scrape_stages(base_url)
+            level["stage_mean_ms"] = {}
+            for name, (total, count) in sorted(after.items()):
+                old_total, old_count = before.get(name, (0.0, 0))
+                if count > old_count:
+                    level["stage_mean_ms"][name] = round((total - old_total) / (count - old_count) * 1000, 1)
+            if mock is not None:
+                level["mock_llm"] = dict(mock.stats, requests=dict(mock.stats["requests"]))
+            levels.append(level)
+            overall = level["overall"]
+            print(f"   c={concurrency:<4} {overall['throughput_rps']:>7} req/s  p50={overall['p50_ms']}ms "
+                  f"p95={overall['p95_ms']}ms p99={overall['p99_ms']}ms  errors={overall['error_rate']:.1%}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if mock is not None:
+            mock.stop()
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "config": {"server": "external" if target else server, "requests_per_level": requests,
+                       "llm_latency": latency_spec, "error_rate": error_rate, "rate_limit_rate": rate_limit_rate,
+                       "rpm_limit": rpm_limit, "chat_ratio": chat_ratio, "scoring_mode": scoring_mode,
+                       "llm_cache": llm_cache},
+        },
+        "levels": levels,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test against a local OpenAI / Gemini stand-in.")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per concurrency level")
+    parser.add_argument("--jobs", default=DEFAULT_JOBS_PATH)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_PATH)
+    parser.add_argument("--llm-latency", default="lognormal:800,0.5",
+                        help="ms: 300 | uniform:a,b | normal:mean,sd | lognormal:median,sigma | exp:mean")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of LLM calls answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of LLM calls answered with 429")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Mock quota per provider (429 beyond it; 0 = none)")
+    parser.add_argument("--server", choices=["waitress", "asgi"], default="waitress")
+    parser.add_argument("--port", type=int, default=8090, help="Port for the app under test")
+    parser.add_argument("--target", help="Base URL of an already running app (not started here)")
+    parser.add_argument("--chat-ratio", type=float, default=0.2, help="Fraction of requests sent to /api/ai_chat")
+    parser.add_argument("--scoring-mode", choices=["llm", "local", "hybrid"], default=None)
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the app's LLM response cache on")
+    parser.add_argument("--mock-only", action="store_true", help="Only run the mock LLM server (Ctrl+C to stop)")
+    args = parser.parse_args()
+
+    if args.mock_only:
+        with open(args.jobs, "r", encoding="utf-8") as f:
+            mock = MockLLMServer(json.load(f)["jobs"], parse_latency(args.llm_latency), args.error_rate,
+                                 args.rate_limit_rate, args.rpm_limit, port=args.port).start()
+        print(f"✅ Mock LLM server listening on {mock.url}. Start the app with:")
+        print("   " + " ".join(f"{name}={value}" for name, value in mock_env(mock.url, args.llm_cache).items()))
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            mock.stop()
+        sys.exit(0)
+
+    report = run_loadtest([int(level) for level in args.concurrency.split(",")], args.requests, args.jobs,
+                          args.llm_latency, args.error_rate, args.rate_limit_rate, args.rpm_limit, args.server,
+                          args.port, args.target, args.chat_ratio, args.scoring_mode, args.llm_cache)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.output}")
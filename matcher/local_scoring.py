@@ -0,0 +1,175 @@
+# matcher/local_scoring.py
+
+import re
+
+import numpy as np
+
+from matcher.feature_engine import TRAIT_NAMES
+from matcher.features import join_terms
+from matcher.personality import PERSONALITY_KEYWORDS, extract_traits
+
+# Fallback conversion for budgets quoted per hour
+HOURS_PER_MONTH = 160
+
+ASIA_KEYWORDS = ["asia", "asian"]
+ANYWHERE_KEYWORDS = ["remote", "anywhere", "worldwide", "global"]
+
+_MONEY_PATTERN = re.compile(
+    r"(?:\$\s*(?P<dollar>\d[\d,]*(?:\.\d+)?)\s*(?P<dollar_k>k\b)?"
+    r"|(?P<plain>\d[\d,]*(?:\.\d+)?)\s*(?P<plain_k>k\b)?\s*(?:usd|dollars))",
+    re.IGNORECASE,
+)
+_HOURLY_PATTERN = re.compile(r"^\W{0,3}(?:/\s*h(?:ou)?r|per\s+h(?:ou)?r|an\s+hour|hourly)", re.IGNORECASE)
+
+
+def _token_terms(df, column: str) -> set:
+    """Every token of a list column; a CandidateStore answers from its interned vocabulary."""
+    tokens = getattr(df, "tokens", {})
+    if column in tokens:
+        return tokens[column].terms()
+    return {t for token_list in df[column] for t in token_list}
+
+
+def _split_column(df, column: str) -> set:
+    if column not in df.columns:
+        return set()
+    categorical = getattr(df, "categorical", {})
+    if column in categorical:
+        # A CandidateStore category column: split each category that occurs, not every row
+        codes, categories = categorical[column]
+        values = [categories[code] for code in np.unique(codes).tolist() if code >= 0]
+    else:
+        values = df[column].dropna().astype(str)
+    terms = set()
+    for value in values:
+        terms.update(term.strip().lower() for term in value.split(",") if term.strip())
+    return terms
+
+
+def _materialized_terms(df, token_column: str, column: str) -> set:
+    """Terms of a comma-separated column, from its materialized token list when preprocessing made one."""
+    if token_column in df.columns:
+        return _token_terms(df, token_column)
+    return _split_column(df, column)
+
+
+def _term_pattern(terms):
+    """Whole-word alternation over the terms, longest first so "video editor" wins over "editor"."""
+    terms = sorted((t for t in terms if len(t) > 1), key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(re.escape(t) for t in terms) + r")(?!\w)")
+
+
+def _find_terms(pattern, text: str) -> list:
+    if pattern is None:
+        return []
+    return list(dict.fromkeys(pattern.findall(text)))
+
+
+def parse_budget(text: str) -> str:
+    """First money amount in the text as a monthly figure ("" if there is none)."""
+    match = _MONEY_PATTERN.search(text)
+    if not match:
+        return ""
+    amount = float((match.group("dollar") or match.group("plain")).replace(",", ""))
+    if match.group("dollar_k") or match.group("plain_k"):
+        amount *= 1000
+    if _HOURLY_PATTERN.search(text[match.end():match.end() + 20]):
+        amount *= HOURS_PER_MONTH
+    return str(int(round(amount)))
+
+
+class RuleBasedJobParser:
+    """
+    Offline stand-in for extract_job_info_from_text. Skills, job types, verticals, countries and
+    creator names are matched against the terms that actually occur in the candidate data.
+    """
+
+    def __init__(self, df, previous: "RuleBasedJobParser" = None):
+        self.terms = {
+            "relevant_skills": _token_terms(df, "Skills_list"),
+            "job_types": _token_terms(df, "JobTypes_list"),
+            "content_verticals": _materialized_terms(df, "Verticals_list", "Content Verticals"),
+            "country": _split_column(df, "Country"),
+            "creator": _materialized_terms(df, "Creators_list", "Past Creators"),
+        }
+        # Compiling the alternations is the expensive part; reuse the previous version's when its terms match
+        self.patterns = {key: previous.patterns[key] if previous is not None and previous.terms[key] == terms
+                         else _term_pattern(terms) for key, terms in self.terms.items()}
+
+    def apply_changes(self, df) -> "RuleBasedJobParser":
+        """Parser over an updated candidate set (the new CandidateStore), recompiling only the changed term lists."""
+        return RuleBasedJobParser(df, previous=self)
+
+    def _location(self, text: str) -> str:
+        countries = _find_terms(self.patterns["country"], text)
+        if countries:
+            return countries[0]
+        if any(re.search(rf"\b{kw}\b", text) for kw in ASIA_KEYWORDS):
+            return "asia"
+        return "anywhere"
+
+    def parse(self, text: str) -> dict:
+        """Same keys as the LLM extraction, so every scorer accepts the result."""
+        lowered = (text or "").lower()
+        traits = set(extract_traits(lowered)) | {t for t in PERSONALITY_KEYWORDS if t in lowered}
+        creators = _find_terms(self.patterns["creator"], lowered)
+        return {
+            "hiring_creator_name": creators[0] if creators else "",
+            "location_pref": self._location(lowered),
+            "job_types": _find_terms(self.patterns["job_types"], lowered),
+            "relevant_skills": _find_terms(self.patterns["relevant_skills"], lowered),
+            "personality_traits": sorted(traits),
+            "budget_monthly": parse_budget(lowered),
+            "content_verticals": _find_terms(self.patterns["content_verticals"], lowered),
+        }
+
+
+def _embedding_scores(store, field: str, terms, ids) -> np.ndarray:
+    """Cosine of the joined job terms to every candidate, clipped to [0, 1]; 0.5 (neutral) if the job lists none."""
+    text = join_terms(terms)
+    if not text.strip():
+        return np.full(len(store) if ids is None else len(ids), 0.5, dtype=np.float32)
+    return np.clip(store.similarity(field, text, ids=ids), 0.0, 1.0)
+
+
+def _trait_scores(profiles, job_traits) -> np.ndarray:
+    """Vectorized personality.trait_score(extract_traits(profile), job_traits) over a column of profiles."""
+    job_traits = set(job_traits or [])
+    if not job_traits:
+        return np.full(len(profiles), 0.5, dtype=np.float32)
+    matches = np.zeros(len(profiles), dtype=np.float32)
+    for trait in job_traits & set(PERSONALITY_KEYWORDS):
+        pattern = "|".join(re.escape(kw) for kw in PERSONALITY_KEYWORDS[trait])
+        matches += profiles.str.contains(pattern, regex=True).to_numpy(dtype=np.float32)
+    return matches / len(job_traits)
+
+
+def _flag_trait_scores(flags: np.ndarray, job_traits) -> np.ndarray:
+    """_trait_scores from a FeatureEngine's precomputed trait flags instead of the profile text."""
+    job_traits = set(job_traits or [])
+    if not job_traits:
+        return np.full(len(flags), 0.5, dtype=np.float32)
+    matches = np.zeros(len(flags), dtype=np.float32)
+    for col, trait in enumerate(TRAIT_NAMES):
+        if trait in job_traits:
+            matches += np.asarray(flags[:, col], dtype=np.float32)
+    return matches / len(job_traits)
+
+
+def local_aspect_scores(df, job: dict, store, engine=None) -> dict:
+    """
+    LLM-free skills / job-type / trait scores for every row of df, keyed like the LLM scores.
+    Skills and job types come from the embedding store; traits from the keyword extractor
+    (or, given a FeatureEngine row-aligned with df, from its trait flags).
+    """
+    # Rows aligned with the store (the whole directory) skip the id -> position lookup
+    ids = None if len(df) == len(store) and np.array_equal(store.ids, df.index) else df.index
+    return {
+        "skills_score": _embedding_scores(store, "skills", job.get("relevant_skills", []), ids),
+        "jobtype_score": _embedding_scores(store, "job_types", job.get("job_types", []), ids),
+        "trait_score": (_flag_trait_scores(engine.trait_flags, job.get("personality_traits", []))
+                        if engine is not None else
+                        _trait_scores(df["Profile_clean"].fillna(""), job.get("personality_traits", []))),
+    }
@@ -0,0 +1,236 @@
+# matcher/metrics.py
+
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help = {}
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name: str, labels: dict = None, value: float = 1.0, help_text: str = ""):
+        with self._lock:
+            self._help.setdefault(name, ("counter", help_text))
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict = None, help_text: str = "", buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help_text))
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            state = series.get(key)
+            if state is None:
+                state = series[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(state["buckets"]):
+                if value <= bound:
+                    state["counts"][i] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._help[name][1]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    for bound, count in zip(state["buckets"], state["counts"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {state['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {state['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {state['count']}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class RequestTrace:
+    """Per-request timing breakdown; shared by every worker thread that runs in the request's context."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.stages = []
+        self.llm_calls = []
+        self.fallbacks = 0
+        self.retries = 0
+        self.tokens = {"prompt": 0, "completion": 0, "total": 0}
+        self.cache = {"hits": 0, "misses": 0}
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            by_provider = {}
+            for call in self.llm_calls:
+                stats = by_provider.setdefault(call["provider"], {"calls": 0, "errors": 0, "total_ms": 0.0})
+                stats["calls"] += 1
+                stats["errors"] += call["status"] != "ok"
+                stats["total_ms"] = round(stats["total_ms"] + call["ms"], 3)
+            return {
+                "total_ms": round((time.perf_counter() - self.started) * 1000, 3),
+                "stages": list(self.stages),
+                "llm": {
+                    "calls": list(self.llm_calls),
+                    "by_provider": by_provider,
+                    "fallbacks": self.fallbacks,
+                    "retries": self.retries,
+                    "tokens": dict(self.tokens),
+                    "cache": dict(self.cache),
+                },
+            }
+
+
+_current_trace = contextvars.ContextVar("matcher_request_trace", default=None)
+
+
+def start_trace() -> RequestTrace:
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def _with_trace(update):
+    trace = _current_trace.get()
+    if trace is not None:
+        with trace._lock:
+            update(trace)
+
+
+def record_stage(name: str, elapsed: float):
+    """Records an already-measured stage duration (for stages that span generator yields)."""
+    registry.observe("matcher_stage_duration_seconds", elapsed, {"stage": name},
+                     "Duration of matching pipeline stages.")
+    _with_trace(lambda t: t.stages.append({"stage": name, "ms": round(elapsed * 1000, 3)}))
+
+
+@contextmanager
+def stage(name: str):
+    """Times a pipeline stage into matcher_stage_duration_seconds and the current request trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+@contextmanager
+def llm_call(provider: str, operation: str):
+    """Times one provider call; records status=error (and re-raises) if it fails."""
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = {"provider": provider, "operation": operation, "status": status}
+        registry.inc("matcher_llm_requests_total", labels, help_text="LLM provider calls.")
+        registry.observe("matcher_llm_request_duration_seconds", elapsed, labels, "Duration of LLM provider calls.")
+        _with_trace(lambda t: t.llm_calls.append({"provider": provider, "operation": operation, "status": status,
+                                                  "ms": round(elapsed * 1000, 3)}))
+
+
+def record_fallback(operation: str, from_provider: str, to_provider: str):
+    registry.inc("matcher_llm_fallbacks_total", {"operation": operation, "from": from_provider, "to": to_provider},
+                 help_text="Provider fallbacks after a failed call.")
+    _with_trace(lambda t: setattr(t, "fallbacks", t.fallbacks + 1))
+
+
+def record_retry(provider: str, operation: str):
+    registry.inc("matcher_llm_retries_total", {"provider": provider, "operation": operation},
+                 help_text="Retried LLM provider calls.")
+    _with_trace(lambda t: setattr(t, "retries", t.retries + 1))
+
+
+def record_hedge(operation: str, provider: str):
+    registry.inc("matcher_llm_hedges_total", {"operation": operation, "provider": provider},
+                 help_text="Hedged requests sent to a second provider while the first was still running.")
+
+
+def record_circuit_open(provider: str):
+    registry.inc("matcher_llm_circuit_open_total", {"provider": provider},
+                 help_text="Times a provider's circuit breaker opened.")
+
+
+def record_tokens(provider: str, prompt_tokens: int, completion_tokens: int, total_tokens: int = None):
+    total_tokens = total_tokens if total_tokens is not None else prompt_tokens + completion_tokens
+    for kind, count in (("prompt", prompt_tokens), ("completion", completion_tokens)):
+        registry.inc("matcher_llm_tokens_total", {"provider": provider, "kind": kind}, count,
+                     help_text="Tokens reported by LLM providers.")
+
+    def update(trace):
+        trace.tokens["prompt"] += prompt_tokens
+        trace.tokens["completion"] += completion_tokens
+        trace.tokens["total"] += total_tokens
+    _with_trace(update)
+
+
+def record_search_tokens(endpoint: str):
+    """Observes the LLM tokens the current request used (all calls, all providers) once it is done."""
+    trace = _current_trace.get()
+    if trace is not None:
+        registry.observe("matcher_search_llm_tokens", trace.tokens["total"], {"endpoint": endpoint},
+                         "LLM tokens used per search request.", buckets=TOKEN_BUCKETS)
+
+
+def record_cache(hit: bool):
+    result = "hit" if hit else "miss"
+    registry.inc("matcher_llm_cache_requests_total", {"result": result}, help_text="LLM response cache lookups.")
+
+    def update(trace):
+        trace.cache["hits" if hit else "misses"] += 1
+    _with_trace(update)
+
+
+def record_embedding_batch(requests: int, texts: int):
+    """One micro-batched encoder call: how many encode requests it served and how many texts it encoded."""
+    registry.observe("matcher_embedding_batch_texts", texts, help_text="Texts per micro-batched encoder call.",
+                     buckets=BATCH_SIZE_BUCKETS)
+    registry.observe("matcher_embedding_batch_requests", requests,
+                     help_text="Encode requests merged into one encoder call.", buckets=BATCH_SIZE_BUCKETS)
+
+
+def record_embedding_cache(hits: int, misses: int):
+    for result, count in (("hit", hits), ("miss", misses)):
+        if count:
+            registry.inc("matcher_embedding_cache_requests_total", {"result": result}, count,
+                         help_text="Embedding cache lookups (one per distinct text).")
@@ -0,0 +1,327 @@
+# matcher/parallel_scoring.py
+
+import heapq
+import os
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from matcher.feature_engine import budget_scores, creator_scores, top_positions, trait_weights
+from matcher.preprocessing import DEFAULT_CACHE_DIR
+
+# Worker processes for app searches; 1 keeps local scoring in the request thread
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", "1"))
+SCORING_SHARD_SIZE = int(os.getenv("SCORING_SHARD_SIZE", "20000"))
+# After an ingest only the changed embedding rows are exported, until they pass this share of all rows
+SCORING_REEXPORT_FRACTION = float(os.getenv("SCORING_REEXPORT_FRACTION", "0.25"))
+
+# Embedding store fields the local scorer reads
+SHARED_FIELDS = ("skills", "job_types", "verticals")
+
+
+# ==============================================================================
+# --- Shared read-only candidate arrays (memory-mapped .npy files) ---
+# ==============================================================================
+
+def _save_array(export_dir: str, name: str, array) -> str:
+    """Reuses the backing file of an already memory-mapped .npy array; writes anything else once."""
+    if isinstance(array, np.memmap) and getattr(array, "filename", None) and str(array.filename).endswith(".npy"):
+        return str(array.filename)
+    path = os.path.join(export_dir, f"{name}.npy")
+    np.save(path, np.ascontiguousarray(array))
+    return path
+
+
+def _link_array(export_dir: str, name: str, path: str, shared_root: str) -> str:
+    """
+    Hard-links an earlier export's file into export_dir, so it outlives the earlier directory.
+    Files outside the shared root (the memory-mapped snapshot cache) are referenced as they are.
+    """
+    if not os.path.abspath(path).startswith(os.path.abspath(shared_root) + os.sep):
+        return path
+    target = os.path.join(export_dir, name)
+    try:
+        os.link(path, target)
+    except OSError:  # no hard links on this filesystem
+        shutil.copyfile(path, target)
+    return target
+
+
+def export_shared_arrays(directory, export_dir: str, previous: dict = None, shared_root: str = None) -> dict:
+    """
+    Writes every array the shard workers need and returns a small, picklable spec of paths.
+    Workers memory-map the files, so the candidate table itself never crosses a process boundary.
+
+    With the spec of the directory's parent version (previous), the embedding matrices are not
+    written again: the parent's base files are hard-linked, and only the rows added since that base
+    go to a delta file, located through a per-row origin array (>= 0 base row, < 0 delta row).
+    Once the delta passes SCORING_REEXPORT_FRACTION of the rows the matrices are written in full.
+    """
+    candidates, store, engine = directory.candidates, directory.embedding_store, directory.feature_engine
+    if not np.array_equal(store.ids, candidates.ids):
+        raise ValueError("Embedding store rows are not aligned with the candidate table.")
+    os.makedirs(export_dir, exist_ok=True)
+
+    origin = None
+    if previous is not None and directory.lineage is not None and directory.lineage[0] == previous["version"]:
+        keep_positions = directory.lineage[1]
+        kept = np.load(previous["origin"]) if previous["origin"] else np.arange(previous["rows"], dtype=np.int64)
+        origin = np.concatenate([kept[keep_positions], np.full(len(candidates) - len(keep_positions), -1, np.int64)])
+        if np.count_nonzero(origin < 0) > SCORING_REEXPORT_FRACTION * len(candidates):
+            origin = None
+
+    paths, deltas = {}, {}
+    if origin is None:
+        paths.update({field: _save_array(export_dir, f"emb_{field}", store.matrices[field]) for field in SHARED_FIELDS})
+    else:
+        delta_rows = np.flatnonzero(origin < 0)
+        origin[delta_rows] = -np.arange(1, len(delta_rows) + 1)
+        for field in SHARED_FIELDS:
+            paths[field] = _link_array(export_dir, f"emb_{field}.npy", previous["paths"][field], shared_root)
+            deltas[field] = os.path.join(export_dir, f"emb_{field}_delta.npy")
+            np.save(deltas[field], np.ascontiguousarray(store.matrices[field][delta_rows]))
+        origin_path = os.path.join(export_dir, "origin.npy")
+        np.save(origin_path, origin)
+
+    # The per-row feature arrays are small next to the embeddings and are written in full
+    paths.update({
+        "monthly_rate": _save_array(export_dir, "monthly_rate", engine.monthly_rate),
+        "country_codes": _save_array(export_dir, "country_codes", engine.country_codes),
+        "trait_flags": _save_array(export_dir, "trait_flags", engine.trait_flags),
+        "creator_indptr": _save_array(export_dir, "creator_indptr", engine.creator_indptr),
+        "creator_indices": _save_array(export_dir, "creator_indices", engine.creator_indices),
+    })
+    return {
+        "paths": paths,
+        "deltas": deltas,
+        "origin": None if origin is None else origin_path,
+        "rows": len(candidates),
+        "version": directory.version,
+    }
+
+
+# ==============================================================================
+# --- Worker side ---
+# ==============================================================================
+
+# Per-process cache of memory-mapped arrays: {directory version: {file path: array}}.
+# Only the newest version is kept; opening it drops the mappings of every older one.
+_worker_arrays = {}
+
+
+def _version_arrays(version: int) -> dict:
+    arrays = _worker_arrays.get(version)
+    if arrays is None:
+        arrays = {}
+        # A late shard of an older version maps its files just for that task
+        if not _worker_arrays or version > max(_worker_arrays):
+            _worker_arrays.clear()
+            _worker_arrays[version] = arrays
+    return arrays
+
+
+def _array(arrays: dict, path: str) -> np.ndarray:
+    array = arrays.get(path)
+    if array is None:
+        array = arrays[path] = np.load(path, mmap_mode="r")
+    return array
+
+
+def _embedding_rows(spec: dict, arrays: dict, field: str, start: int, stop: int) -> np.ndarray:
+    """Rows [start, stop) of an embedding matrix, gathered from the base and delta files of a delta export."""
+    base = _array(arrays, spec["paths"][field])
+    if spec["origin"] is None:
+        return base[start:stop]
+    origin = np.asarray(_array(arrays, spec["origin"])[start:stop])
+    from_base = origin >= 0
+    rows = np.empty((stop - start, base.shape[1]), dtype=base.dtype)
+    rows[from_base] = base[origin[from_base]]
+    if not from_base.all():
+        rows[~from_base] = _array(arrays, spec["deltas"][field])[-origin[~from_base] - 1]
+    return rows
+
+
+def _shard_scores(spec: dict, arrays: dict, job: dict, start: int, stop: int) -> np.ndarray:
+    """Final local match scores (see scoring.rank_candidates_local) for rows [start, stop)."""
+    paths = spec["paths"]
+    weights = job["weights"]
+    scores = np.zeros(stop - start, dtype=np.float64)
+
+    for field, name in (("skills", "skills_score"), ("job_types", "jobtype_score")):
+        vec = job["vectors"].get(field)
+        if vec is None:
+            aspect = np.full(stop - start, 0.5)
+        else:
+            aspect = np.clip(np.asarray(_embedding_rows(spec, arrays, field, start, stop) @ vec, dtype=np.float32),
+                             0.0, 1.0)
+        scores += weights[name] * aspect.astype(np.float64)
+
+    if job["trait_weights"] is None:
+        scores += weights["trait_score"] * 0.5
+    else:
+        flags = np.asarray(_array(arrays, paths["trait_flags"])[start:stop], dtype=np.float32)
+        scores += weights["trait_score"] * (flags @ job["trait_weights"]).astype(np.float64)
+
+    vec = job["vectors"].get("verticals")
+    if vec is not None:
+        vertical = np.asarray(_embedding_rows(spec, arrays, "verticals", start, stop) @ vec, dtype=np.float32)
+        scores += weights["vertical_sim"] * vertical.astype(np.float64)
+
+    rates = np.asarray(_array(arrays, paths["monthly_rate"])[start:stop])
+    scores += weights["budget_sim"] * budget_scores(rates, job["budget"])
+
+    scores += weights["loc_sim"] * job["location_table"][np.asarray(_array(arrays, paths["country_codes"])[start:stop])]
+
+    indptr = np.asarray(_array(arrays, paths["creator_indptr"])[start:stop + 1])
+    scores += weights["creator_sim"] * creator_scores(indptr, _array(arrays, paths["creator_indices"]),
+                                                      job["creator_index"])
+
+    return np.round(scores, 4)
+
+
+def _score_shard(spec: dict, jobs: list, start: int, stop: int, top_n: int) -> list:
+    """Top N (score, position) pairs of this shard for each job, best first."""
+    arrays = _version_arrays(spec["version"])
+    results = []
+    for job in jobs:
+        scores = _shard_scores(spec, arrays, job, start, stop)
+        # (score, -position) pairs: tuple order is rank order, ties to the lower position
+        results.append([(float(scores[i]), -(start + int(i))) for i in top_positions(scores, top_n)])
+    return results
+
+
+# ==============================================================================
+# --- Driver side ---
+# ==============================================================================
+
+def encode_job_fields(jobs: list) -> list:
+    """Per job, {field: query vector} for its non-empty skills / job types / verticals, from one encoder batch."""
+    from matcher.features import join_terms
+    from matcher.similarity import encode_texts
+
+    texts = [(index, field, join_terms(job.get(key, []))) for index, job in enumerate(jobs)
+             for field, key in (("skills", "relevant_skills"), ("job_types", "job_types"),
+                                ("verticals", "content_verticals"))]
+    texts = [item for item in texts if item[2].strip()]
+    vectors = [{} for _ in jobs]
+    if texts:
+        for (index, field, _), vector in zip(texts, encode_texts([text for _, _, text in texts])):
+            vectors[index][field] = vector
+    return vectors
+
+
+def prepare_job(job: dict, directory, vectors: dict) -> dict:
+    """Everything a worker needs about one job: its query vectors plus the FeatureEngine's lookup tables."""
+    from matcher.scoring import SCORE_WEIGHTS
+
+    prepared = directory.feature_engine.prepare(job)
+    return {
+        "weights": dict(SCORE_WEIGHTS),
+        "vectors": vectors,
+        "trait_weights": trait_weights(job.get("personality_traits", [])),
+        "budget": prepared["budget"],
+        "location_table": prepared["location_table"],
+        "creator_index": prepared["creator_index"],
+    }
+
+
+class ProcessScoringBackend:
+    """
+    Scores whole candidate directories with the local scorer across a process pool.
+    The directory is cut into row shards; workers memory-map the exported arrays and
+    return their shard's top N, which are merged through a bounded heap.
+    """
+
+    def __init__(self, workers: int = None, shard_size: int = SCORING_SHARD_SIZE,
+                 cache_dir: str = DEFAULT_CACHE_DIR):
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.shard_size = max(1, shard_size)
+        self.cache_dir = cache_dir
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        # Start the workers now (before the server's threads exist) rather than on the first search
+        self._pool.submit(os.getpid).result()
+        self._lock = threading.Lock()
+        self.shared_root = os.path.join(cache_dir, "shared")
+        # {version: {"directory", "spec", "dir", "refs"}}; refs counts the searches in flight
+        self._exports = {}
+        self._latest = None
+
+    def _acquire(self, directory) -> dict:
+        """The directory's export (written once per version), held until _release."""
+        with self._lock:
+            entry = self._exports.get(directory.version)
+            if entry is None or entry["directory"] is not directory:
+                export_dir = os.path.join(self.shared_root, f"{os.getpid()}_v{directory.version}")
+                previous = self._exports.get(directory.lineage[0]) if directory.lineage else None
+                spec = export_shared_arrays(directory, export_dir, previous and previous["spec"], self.shared_root)
+                entry = {"directory": directory, "spec": spec, "dir": export_dir, "refs": 0}
+                self._exports[directory.version] = entry
+                self._latest = directory.version
+            entry["refs"] += 1
+            self._sweep()
+            return entry
+
+    def _release(self, entry: dict):
+        with self._lock:
+            entry["refs"] -= 1
+            self._sweep()
+
+    def _sweep(self):
+        """Deletes the exports of older versions once their last search has finished."""
+        for version, entry in list(self._exports.items()):
+            if version != self._latest and entry["refs"] == 0:
+                shutil.rmtree(entry["dir"], ignore_errors=True)
+                del self._exports[version]
+
+    def _shards(self, rows: int) -> list:
+        # At least one shard per worker, so small directories still spread across cores
+        size = min(self.shard_size, max(1, -(-rows // self.workers)))
+        return [(start, min(start + size, rows)) for start in range(0, rows, size)]
+
+    def top_positions(self, directory, jobs: list, top_n: int = 10, vectors: list = None) -> list:
+        """
+        For each job: [(match_score, position), ...] of the top N rows of directory.candidates, best first.
+        vectors: the jobs' encode_job_fields output, if the caller has already encoded them.
+        """
+        if vectors is None:
+            vectors = encode_job_fields(jobs)
+        entry = self._acquire(directory)
+        try:
+            spec = entry["spec"]
+            prepared = [prepare_job(job, directory, job_vectors) for job, job_vectors in zip(jobs, vectors)]
+            heaps = [[] for _ in jobs]
+            futures = [self._pool.submit(_score_shard, spec, prepared, start, stop, top_n)
+                       for start, stop in self._shards(spec["rows"])]
+            for future in as_completed(futures):
+                for heap, shard_top in zip(heaps, future.result()):
+                    for item in shard_top:
+                        if len(heap) < top_n:
+                            heapq.heappush(heap, item)
+                        elif item > heap[0]:  # equal scores: the lower position wins, as in top_positions
+                            heapq.heapreplace(heap, item)
+                        else:
+                            break  # shard_top is sorted, nothing further can enter the heap
+        finally:
+            self._release(entry)
+        return [[(score, -neg_position) for score, neg_position in sorted(heap, reverse=True)] for heap in heaps]
+
+    def rank(self, directory, job: dict, top_n: int = 10):
+        """Same result frame as scoring.rank_candidates_local over the whole directory (minus the aspect columns)."""
+        return self.rank_many(directory, [job], top_n)[0]
+
+    def rank_many(self, directory, jobs: list, top_n: int = 10) -> list:
+        """rank() for many jobs in one pass over the shards."""
+        frames = []
+        for top in self.top_positions(directory, jobs, top_n):
+            positions = [position for _, position in top]
+            frames.append(directory.candidates.rows(positions).assign(match_score=[score for score, _ in top]))
+        return frames
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        with self._lock:
+            for entry in self._exports.values():
+                shutil.rmtree(entry["dir"], ignore_errors=True)
+            self._exports.clear()
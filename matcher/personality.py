@@ -1,5 +1,7 @@
 import re
 
+from matcher.keyword_matcher import KeywordMatcher
+
 PERSONALITY_KEYWORDS = {
     "collaborative": ["team player", "collaborate", "group work"],
     "detail-oriented": ["attention to detail", "meticulous", "organized"],
@@ -8,14 +10,11 @@ PERSONALITY_KEYWORDS = {
     "fast learner": ["quick learner", "adaptable", "flexible"],
 }
 
+TRAIT_MATCHER = KeywordMatcher(PERSONALITY_KEYWORDS)
+
 def extract_traits(text: str):
-    text = text.lower()
-    traits = set()
-    for trait, keywords in PERSONALITY_KEYWORDS.items():
-        for kw in keywords:
-            if kw in text:
-                traits.add(trait)
-    return list(traits)
+    """Traits whose keywords occur in the text, in PERSONALITY_KEYWORDS order."""
+    return TRAIT_MATCHER.match(text)
 
 def trait_score(candidate_traits, job_traits):
     if not job_traits:
@@ -0,0 +1,98 @@
+# matcher/prefilter.py
+
+import numpy as np
+from scipy import sparse
+
+from matcher.candidate_store import TokenColumn
+
+# Job field -> tokenized candidate column it is matched against
+PREFILTER_FIELDS = {
+    "relevant_skills": "Skills_list",
+    "job_types": "JobTypes_list",
+}
+
+
+def normalize_terms(value) -> list:
+    """Lowercases/strips job terms; accepts a list or a comma-separated string."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(term).strip().lower() for term in value if str(term).strip()]
+
+
+def _token_column(candidates, column: str) -> TokenColumn:
+    """The interned token column of a CandidateStore, or one built from a DataFrame's list column."""
+    tokens = getattr(candidates, "tokens", {})
+    return tokens[column] if column in tokens else TokenColumn.from_lists(candidates[column].tolist())
+
+
+def _build_term_matrix(tokens: TokenColumn, vocab: dict = None) -> tuple:
+    """
+    Candidate x term incidence matrix (CSC, so each column is a term -> candidates posting list),
+    built straight from the interned token codes.
+    An existing vocab is extended in place, so new rows share column numbers with an older matrix.
+    """
+    vocab = {} if vocab is None else vocab
+    mapping = np.array([vocab.setdefault(token, len(vocab)) for token in tokens.vocab], dtype=np.int64)
+    rows = np.repeat(np.arange(len(tokens)), np.diff(tokens.offsets))
+    cols = mapping[np.asarray(tokens.codes)] if len(tokens.codes) else np.zeros(0, dtype=np.int64)
+    data = np.ones(len(rows), dtype=np.bool_)
+    matrix = sparse.csc_matrix((data, (rows, cols)), shape=(len(tokens), len(vocab)), dtype=np.bool_)
+    matrix.sum_duplicates()
+    return matrix, vocab
+
+
+class PreFilterIndex:
+    """Inverted skill / job-type index that computes pre-filter scores for every candidate at once."""
+
+    def __init__(self, ids, matrices: dict, vocabs: dict):
+        self.ids = np.asarray(ids)
+        self.matrices = matrices
+        self.vocabs = vocabs
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _any_match(self, field: str, terms: list) -> np.ndarray:
+        vocab = self.vocabs[field]
+        cols = sorted({vocab[t] for t in terms if t in vocab})
+        if not cols:
+            return np.zeros(len(self), dtype=np.bool_)
+        return self.matrices[field][:, cols].getnnz(axis=1) > 0
+
+    def score(self, job: dict) -> np.ndarray:
+        """
+        features.pre_filter_score for every row: one point per field with any overlap, job terms
+        lowercased (normalize_terms) so "Video Editor" matches the candidate token "video editor".
+        Returned as a fresh array aligned with self.ids.
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        for field in PREFILTER_FIELDS:
+            scores += self._any_match(field, normalize_terms(job.get(field, [])))
+        return scores
+
+    def apply_changes(self, keep_positions: np.ndarray, added_df) -> "PreFilterIndex":
+        """New index holding the kept rows followed by added_df's rows; the current index is left untouched."""
+        matrices, vocabs = {}, {}
+        for field, column in PREFILTER_FIELDS.items():
+            vocab = dict(self.vocabs[field])
+            kept = self.matrices[field].tocsr()[keep_positions]
+            added, vocab = _build_term_matrix(_token_column(added_df, column), vocab)
+            kept.resize((kept.shape[0], len(vocab)))
+            matrices[field] = sparse.vstack([kept, added], format="csc")
+            vocabs[field] = vocab
+        ids = np.concatenate([self.ids[keep_positions], np.asarray(added_df.index)])
+        return PreFilterIndex(ids, matrices, vocabs)
+
+    def shortlist(self, job: dict, k: int) -> np.ndarray:
+        """Positions of the k best pre-filter scores (stable, so ties keep dataset order)."""
+        scores = self.score(job)
+        return np.argsort(-scores, kind="stable")[:k]
+
+
+def build_prefilter_index(candidates) -> PreFilterIndex:
+    matrices, vocabs = {}, {}
+    for field, column in PREFILTER_FIELDS.items():
+        matrices[field], vocabs[field] = _build_term_matrix(_token_column(candidates, column))
+    return PreFilterIndex(candidates.index, matrices, vocabs)
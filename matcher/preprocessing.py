@@ -1,5 +1,52 @@
+import hashlib
+import json
+import os
+
 import pandas as pd
-from langdetect import detect
+from langdetect import DetectorFactory, detect
+
+from matcher.candidate_store import CandidateStore, clean_profile_text
+from matcher.features import HOBBY_KEYWORDS
+from matcher.keyword_matcher import KeywordMatcher
+from matcher.personality import PERSONALITY_KEYWORDS
+
+# langdetect is randomized unless seeded; fix it so rebuilt snapshots are reproducible
+DetectorFactory.seed = 0
+
+DEFAULT_CACHE_DIR = os.path.join("data", "cache")
+SNAPSHOT_VERSION = 3
+
+
+# Raw rate/view column -> min-max normalized column
+NORMALIZED_COLUMNS = {
+    "Monthly Rate": "MonthlyRate_norm",
+    "Hourly Rate": "HourlyRate_norm",
+    "# of Views by Creators": "Views_norm",
+}
+
+TOKENIZED_COLUMNS = {
+    "Skills": "Skills_list",
+    "Software": "Software_list",
+    "Job Types": "JobTypes_list",
+    "Platforms": "Platforms_list"
+}
+
+# Materialized once per profile (and stored in the snapshot) so scoring only does lookups
+MATERIALIZED_TOKEN_COLUMNS = {
+    "Content Verticals": "Verticals_list",
+    "Past Creators": "Creators_list",
+}
+PROFILE_KEYWORD_COLUMNS = {
+    "Traits_list": PERSONALITY_KEYWORDS,
+    "Hobbies_list": {hobby: [hobby] for hobby in HOBBY_KEYWORDS},
+}
+# Traits and hobbies of a profile come out of one keyword scan
+_PROFILE_MATCHER = KeywordMatcher({(column, label): keywords
+                                   for column, keywords_by_label in PROFILE_KEYWORD_COLUMNS.items()
+                                   for label, keywords in keywords_by_label.items()})
+
+DERIVED_COLUMNS = (list(TOKENIZED_COLUMNS.values()) + ["Profile_clean", "language"] + list(NORMALIZED_COLUMNS.values())
+                   + list(MATERIALIZED_TOKEN_COLUMNS.values()) + list(PROFILE_KEYWORD_COLUMNS))
 
 
 def load_and_clean_dataset(file_path: str) -> pd.DataFrame:
@@ -7,36 +54,175 @@ def load_and_clean_dataset(file_path: str) -> pd.DataFrame:
     df = df.drop(columns=df.columns[df.isna().all()])
     df = df.dropna(how="all").reset_index(drop=True)
 
-    text_cols = ["Skills", "Software", "Creative Styles"]
-    for col in text_cols:
-        df[col] = df[col].fillna("")
+    df = clean_profiles(df)
+    return apply_normalization(df, compute_norm_stats(df))
+
+
+def clean_profiles(df: pd.DataFrame) -> pd.DataFrame:
+    """Row-local cleaning: fills text columns, tokenizes list columns and detects profile language."""
+    # Partial records (ingested upserts) may lack any of these; missing text is "", never NaN or "nan"
+    text_cols = ["Profile Description", "Skills", "Software", "Creative Styles"] + list(TOKENIZED_COLUMNS)
+    for col in dict.fromkeys(text_cols):
+        df[col] = df[col].fillna("") if col in df.columns else ""
 
     def tokenize_column(series: pd.Series) -> pd.Series:
         return series.apply(lambda x: [s.strip().lower() for s in str(x).split(",") if s.strip()])
 
-    cols_to_tokenize = {
-        "Skills": "Skills_list",
-        "Software": "Software_list",
-        "Job Types": "JobTypes_list",
-        "Platforms": "Platforms_list"
-    }
-    for col, new_col in cols_to_tokenize.items():
+    for col, new_col in TOKENIZED_COLUMNS.items():
         df[new_col] = tokenize_column(df[col])
 
-    df["Profile_clean"] = df["Profile Description"].astype(str).str.lower().str.strip()
+    df["Profile_clean"] = clean_profile_text(df["Profile Description"])
     df["language"] = df["Profile_clean"].apply(lambda x: detect(x) if x.strip() else "unknown")
+    return materialize_features(df)
 
-    def normalize_column(df, col_name, new_col_name=None):
-        min_val, max_val = df[col_name].min(), df[col_name].max()
-        new_col_name = new_col_name or col_name
+
+def parse_rates(series: pd.Series) -> pd.Series:
+    """Rates / view counts as floats: numbers pass through, strings like "$5,000" are parsed, anything else is NaN."""
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = series.astype(str).str.replace(r"[$,\s]", "", regex=True)
+    return pd.to_numeric(cleaned.where(series.notna()), errors="coerce")
+
+
+def materialize_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-profile attributes the scorers used to recompute on every request: parsed rates, verticals and
+    normalized past-creator names as token lists, and the profile's personality traits and hobbies.
+    """
+    for col in NORMALIZED_COLUMNS:
+        if col in df.columns:
+            df[col] = parse_rates(df[col])
+
+    for col, new_col in MATERIALIZED_TOKEN_COLUMNS.items():
+        values = df[col] if col in df.columns else pd.Series("", index=df.index)
+        df[new_col] = [[s.strip().lower() for s in value.split(",") if s.strip()] if isinstance(value, str) else []
+                       for value in values]
+
+    found = [_PROFILE_MATCHER.found(text) for text in df["Profile_clean"]]
+    for column, keywords_by_label in PROFILE_KEYWORD_COLUMNS.items():
+        df[column] = [[label for label in keywords_by_label if (column, label) in hits] for hits in found]
+    return df
+
+
+def compute_norm_stats(df: pd.DataFrame) -> dict:
+    """Global (min, max) per normalized column."""
+    return {col: (df[col].min(), df[col].max()) for col in NORMALIZED_COLUMNS}
+
+
+def apply_normalization(df: pd.DataFrame, stats: dict, columns=None) -> pd.DataFrame:
+    """Min-max normalizes the given (default: all) columns of df using precomputed stats."""
+    for col in columns or NORMALIZED_COLUMNS:
+        min_val, max_val = stats[col]
+        new_col_name = NORMALIZED_COLUMNS[col]
         if max_val == min_val:
             df[new_col_name] = 0
         else:
-            df[new_col_name] = (df[col_name] - min_val) / (max_val - min_val)
-        return df
+            df[new_col_name] = (df[col] - min_val) / (max_val - min_val)
+    return df
 
-    df = normalize_column(df, "Monthly Rate", "MonthlyRate_norm")
-    df = normalize_column(df, "Hourly Rate", "HourlyRate_norm")
-    df = normalize_column(df, "# of Views by Creators", "Views_norm")
 
-    return df
+# ==============================================================================
+# --- Preprocessed snapshot (skips CSV parsing, tokenization and langdetect) ---
+# The snapshot is a CandidateStore directory of .npy arrays, memory-mapped on load so every
+# worker process on the host shares one copy of the candidate data.
+# ==============================================================================
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(file_path: str, cache_dir: str) -> tuple:
+    stem = os.path.splitext(os.path.basename(file_path))[0].replace(" ", "_")
+    return (os.path.join(cache_dir, f"{stem}.store"),
+            os.path.join(cache_dir, f"{stem}.manifest.json"))
+
+
+def _read_manifest(manifest_path: str) -> dict:
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_atomic(path: str, write):
+    tmp_path = path + ".tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_manifest(manifest_path: str, manifest: dict):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+    _write_atomic(manifest_path, write)
+
+
+def read_snapshot_manifest(file_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> dict:
+    """Manifest of the current snapshot for file_path ({} if none has been built)."""
+    return _read_manifest(_snapshot_paths(file_path, cache_dir)[1])
+
+
+def build_snapshot(file_path: str, cache_dir: str = DEFAULT_CACHE_DIR, source_hash: str = None) -> CandidateStore:
+    """Runs the full cleaning pipeline and writes the result plus a manifest describing its source."""
+    os.makedirs(cache_dir, exist_ok=True)
+    snapshot_path, manifest_path = _snapshot_paths(file_path, cache_dir)
+    candidates = CandidateStore.from_frame(load_and_clean_dataset(file_path))
+
+    stat = os.stat(file_path)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "source": os.path.abspath(file_path),
+        "source_mtime": stat.st_mtime,
+        "source_size": stat.st_size,
+        "source_sha256": source_hash or _file_sha256(file_path),
+        "rows": len(candidates),
+    }
+    candidates.save(snapshot_path)
+    _write_manifest(manifest_path, manifest)
+    # Serve from the mapped files rather than the freshly built arrays, as a restart would
+    return CandidateStore.load(snapshot_path)
+
+
+def load_candidates(file_path: str, cache_dir: str = DEFAULT_CACHE_DIR) -> CandidateStore:
+    """
+    Loads the cleaned candidates from their memory-mapped snapshot when the source CSV is unchanged,
+    and falls back to a full rebuild otherwise. The CSV is only hashed when its mtime or size moved.
+    """
+    snapshot_path, manifest_path = _snapshot_paths(file_path, cache_dir)
+    manifest = _read_manifest(manifest_path)
+    stat = os.stat(file_path)
+
+    fresh = False
+    source_hash = None
+    if manifest.get("version") == SNAPSHOT_VERSION and os.path.exists(snapshot_path):
+        if manifest.get("source_mtime") == stat.st_mtime and manifest.get("source_size") == stat.st_size:
+            fresh = True
+        else:
+            source_hash = _file_sha256(file_path)
+            fresh = source_hash == manifest.get("source_sha256")
+            if fresh:
+                # Touched but identical: record the new mtime so the next start skips hashing
+                manifest.update(source_mtime=stat.st_mtime, source_size=stat.st_size)
+                _write_manifest(manifest_path, manifest)
+
+    if fresh:
+        try:
+            return CandidateStore.load(snapshot_path)
+        except Exception as e:
+            print(f"⚠️ Failed to read dataset snapshot ({type(e).__name__}). Rebuilding.")
+
+    print("-> Building preprocessed dataset snapshot...")
+    return build_snapshot(file_path, cache_dir, source_hash)
+
+
+if __name__ == "__main__":
+    import sys
+
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join("data", "Talent Profiles.csv")
+    snapshot = build_snapshot(csv_path)
+    print(f"✅ Snapshot built for {len(snapshot)} profiles.")
@@ -0,0 +1,193 @@
+# matcher/prompt_builder.py
+"""
+Token-counted scoring prompts. Each prompt is the fixed instructions and the job block, then the
+candidate in compact form: deduplicated lists (the job's own skills first) and the profile cut down to
+the sentences that say most about the job's traits, skills and job types. Each call is held to a
+token budget; the lists are never dropped, only the profile summary and the tail of unmatched skills shrink.
+Budgets are counted with the cl100k_base tokenizer, or estimated without tiktoken, so for other
+tokenizers (newer OpenAI models, Gemini) they are approximate.
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from matcher.keyword_matcher import KeywordMatcher
+from matcher.personality import PERSONALITY_KEYWORDS
+
+# --- Token budgets ---
+# Whole single-candidate scoring call (instructions + job block + candidate)
+SCORE_PROMPT_TOKEN_BUDGET = int(os.getenv("SCORE_PROMPT_TOKEN_BUDGET", "160"))
+# Each candidate of a batch prompt (the instructions and job block are shared)
+BATCH_CANDIDATE_TOKEN_BUDGET = int(os.getenv("BATCH_CANDIDATE_TOKEN_BUDGET", "90"))
+# Unmatched skills are trimmed before the profile summary gets shorter than this
+MIN_PROFILE_TOKENS = 24
+
+# cl100k_base is the gpt-3.5-turbo / gpt-4 tokenizer; without tiktoken (or its data file) tokens are estimated
+TOKEN_ENCODING = "cl100k_base"
+_APPROX_TOKEN = re.compile(r"[A-Za-z]{1,6}|\d{1,3}|[^\sA-Za-z\d]")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+_encoding = None
+if tiktoken is not None:
+    try:
+        _encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception:
+        print("⚠️ tiktoken could not load its encoding. Estimating prompt tokens.")
+
+
+def count_tokens(text: str) -> int:
+    """Tokens in text: exact with tiktoken, otherwise a BPE-like estimate (short word pieces and symbols)."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(_APPROX_TOKEN.findall(text))
+
+
+@lru_cache(maxsize=64)
+def _fixed_tokens(text: str) -> int:
+    """count_tokens for the few constant strings (instructions) counted on every call."""
+    return count_tokens(text)
+
+
+def _as_list(value) -> list:
+    """A job or candidate field as a list of strings (LLM output may give "a, b" instead of a list)."""
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(",") if item.strip()]
+    try:
+        return [str(item).strip() for item in value if str(item).strip()]
+    except TypeError:  # None / NaN
+        return []
+
+
+def _dedupe(items: list) -> list:
+    """Case-insensitive de-duplication, keeping the first spelling and order."""
+    seen = set()
+    return [item for item in items if not (item.lower() in seen or seen.add(item.lower()))]
+
+
+def format_list(items: list, more: int = 0) -> str:
+    """'a; b; c' (semicolons: some skills contain commas), 'none' if empty, '(+N more)' for trimmed items."""
+    text = "; ".join(items) if items else "none"
+    return f"{text} (+{more} more)" if more else text
+
+
+class JobContext:
+    """
+    The job side of a job's scoring prompts: the job block (the shared prefix) and the terms that make
+    a profile sentence relevant (a required trait's keywords count double).
+    """
+
+    def __init__(self, job: dict):
+        self.skills = _dedupe(_as_list(job.get("relevant_skills")))
+        self.job_types = _dedupe(_as_list(job.get("job_types")))
+        self.traits = _dedupe(_as_list(job.get("personality_traits")))
+        self.text = (f"Job Skills: {format_list(self.skills)}\n"
+                     f"Job Types: {format_list(self.job_types)}\n"
+                     f"Job Traits: {format_list(self.traits)}")
+        self.tokens = count_tokens(self.text)
+        self.skill_keys = {skill.lower() for skill in self.skills}
+
+        terms = {("trait", trait): [trait, *PERSONALITY_KEYWORDS.get(trait.lower(), [])] for trait in self.traits}
+        terms.update({("term", term): [term] for term in self.skills + self.job_types})
+        self._matcher = KeywordMatcher(terms)
+
+    def relevance(self, sentence: str) -> int:
+        return sum(2 if kind == "trait" else 1 for kind, _ in self._matcher.found(sentence))
+
+
+@lru_cache(maxsize=256)
+def _cached_context(job_key: str) -> JobContext:
+    return JobContext(json.loads(job_key))
+
+
+def job_context(job: dict) -> JobContext:
+    """The JobContext for a job, built once per distinct job (every candidate of a search reuses it)."""
+    fields = ("relevant_skills", "job_types", "personality_traits")
+    return _cached_context(json.dumps({field: job.get(field) for field in fields}, sort_keys=True, default=str))
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """The longest word prefix of text within max_tokens, marked with an ellipsis."""
+    words = text.split()
+    low, high = 0, len(words)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(" ".join(words[:middle]) + "…") <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return " ".join(words[:low]) + "…" if low else ""
+
+
+def summarize_profile(text: str, context: JobContext, max_tokens: int) -> str:
+    """
+    The profile within max_tokens: repeated sentences dropped, then the most job-relevant sentences
+    kept (earlier first on ties) and shown in their original order.
+    """
+    text = str(text or "").strip()
+    if max_tokens <= 0 or not text:
+        return ""
+    sentences = _dedupe([sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()])
+    # Counted apart, plus one for each joining space (tokenizers rarely need more once joined)
+    costs = [count_tokens(sentence) + 1 for sentence in sentences]
+    if sum(costs) - 1 <= max_tokens:
+        return " ".join(sentences)
+
+    ranked = sorted(range(len(sentences)), key=lambda i: (-context.relevance(sentences[i]), i))
+    chosen, used = [], 0
+    for i in ranked:
+        cost = costs[i]
+        if used + cost <= max_tokens:
+            chosen.append(i)
+            used += cost
+    if not chosen:
+        return _truncate(sentences[ranked[0]], max_tokens)
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+
+def candidate_block(candidate: dict, context: JobContext, max_tokens: int, prefix: str = "Candidate ") -> str:
+    """
+    Skills, job types and profile summary within max_tokens (exceeded only if the job's own skills
+    and the job types alone are longer). prefix starts each line ("Candidate " or an indent in batches).
+    """
+    skills = _dedupe(_as_list(candidate.get("Skills_list")))
+    # Stable sort: the skills the job asks for first, so trimming drops the others
+    skills.sort(key=lambda skill: skill.lower() not in context.skill_keys)
+    matched = sum(1 for skill in skills if skill.lower() in context.skill_keys)
+    job_types = format_list(_dedupe(_as_list(candidate.get("JobTypes_list"))))
+
+    def lists(kept):
+        return (f"{prefix}Skills: {format_list(skills[:kept], len(skills) - kept)}\n"
+                f"{prefix}Job Types: {job_types}")
+
+    kept = len(skills)
+    fixed = lists(kept)
+    while kept > matched and max_tokens - count_tokens(fixed) < MIN_PROFILE_TOKENS:
+        kept -= 1
+        fixed = lists(kept)
+    profile_label = f"{prefix}Profile: "
+    profile_budget = max_tokens - count_tokens(fixed) - count_tokens(profile_label) - 1
+    return f"{fixed}\n{profile_label}{summarize_profile(candidate.get('Profile_clean', ''), context, profile_budget)}"
+
+
+def score_prompt(candidate: dict, job: dict, instructions: str) -> str:
+    """The user part of a single-candidate scoring call: job block, then the candidate, within the call budget."""
+    context = job_context(job)
+    budget = SCORE_PROMPT_TOKEN_BUDGET - _fixed_tokens(instructions) - context.tokens
+    return f"{context.text}\n\n{candidate_block(candidate, context, budget)}"
+
+
+def batch_prompt(candidates: list, job: dict) -> str:
+    """Job block, then every (candidate_id, candidate) pair at BATCH_CANDIDATE_TOKEN_BUDGET tokens each."""
+    context = job_context(job)
+    blocks = [f"Candidate {candidate_id}:\n{candidate_block(candidate, context, BATCH_CANDIDATE_TOKEN_BUDGET, '  ')}"
+              for candidate_id, candidate in candidates]
+    return context.text + "\n\n" + "\n".join(blocks)
@@ -0,0 +1,421 @@
+# matcher/providers.py
+"""
+Traffic control for LLM provider calls: a token bucket per provider (matching its RPM quota), retries with
+jittered exponential backoff that honour retry-after hints, a circuit breaker per provider,
+and optional hedging that races the fallback provider against a slow primary.
+Every entry point has an async twin (send_async, first_success_async) for the ASGI server.
+"""
+
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from matcher import metrics
+
+# --- Retries ---
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+
+# --- Rate limits (requests per minute per provider; 0 = unlimited) ---
+LLM_RATE_LIMITS = {
+    "openai": float(os.getenv("OPENAI_RPM", "3000")),
+    "gemini": float(os.getenv("GEMINI_RPM", "1000")),
+}
+
+# --- Circuit breaker ---
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+# --- Hedging (0 = off): start the fallback provider if the primary hasn't answered after this long ---
+LLM_HEDGE_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DELAY_SECONDS", "0"))
+# Latency-critical operations that may be hedged
+HEDGED_OPERATIONS = ("extract_job", "chat")
+
+# --- HTTP connection pool for the OpenAI client ---
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "32"))
+
+
+class ProviderUnavailable(RuntimeError):
+    """Raised instead of calling a provider whose circuit is open."""
+
+
+def openai_http_client():
+    """
+    Shared, pooled HTTP client for the OpenAI SDK (keep-alive connections sized for our concurrency).
+    Returns None, i.e. the SDK default, if httpx can't be imported.
+    """
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.Client(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                            keepalive_expiry=60.0),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+    )
+
+
+def openai_async_http_client():
+    """openai_http_client for AsyncOpenAI (one pool per event loop's client)."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+                            keepalive_expiry=60.0),
+        timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=5.0),
+    )
+
+
+# ==============================================================================
+# --- Error classification ---
+# ==============================================================================
+
+_RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+_RETRYABLE_NAMES = {
+    # openai
+    "RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError",
+    # google.api_core
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests",
+}
+_RATE_LIMIT_NAMES = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+
+
+def _status_code(error):
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_rate_limited(error) -> bool:
+    return type(error).__name__ in _RATE_LIMIT_NAMES or _status_code(error) == 429
+
+
+def is_retryable(error) -> bool:
+    """Rate limits, timeouts, connection drops and 5xx responses; anything else fails over immediately."""
+    return type(error).__name__ in _RETRYABLE_NAMES or _status_code(error) in _RETRYABLE_STATUS
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait (retry-after / retry-after-ms headers or a RetryInfo detail), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    return None
+
+
+def backoff_delay(attempt: int, error=None) -> float:
+    """Full-jitter exponential backoff, never shorter than the provider's retry-after."""
+    delay = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * (2 ** attempt)))
+    hint = retry_after(error) if error is not None else None
+    if hint is not None:
+        delay = max(delay, hint + random.uniform(0, LLM_BACKOFF_BASE_SECONDS))
+    return delay
+
+
+# ==============================================================================
+# --- Rate limiter and circuit breaker ---
+# ==============================================================================
+
+class TokenBucket:
+    """
+    Requests-per-minute limiter shared by every thread and model calling one provider.
+    pause() empties the bucket until a deadline, so a 429 backs off all callers together.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst or max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_time(self) -> float:
+        now = time.monotonic()
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def reserve(self) -> float:
+        """Takes a token and returns 0.0, or returns how long to wait before trying again (or out a pause)."""
+        with self._lock:
+            return self._wait_time()
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent; returns the time spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self) -> float:
+        """acquire() that waits on the event loop instead of blocking the thread."""
+        waited = 0.0
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed calls and rejects traffic for `cooldown` seconds;
+    then lets a single trial call through (half-open) and closes again if it succeeds.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_FAILURES, cooldown: float = LLM_BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.cooldown else "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures, self.opened_at, self.trial_in_flight = 0, None, False
+
+    def release_trial(self):
+        """A cancelled call or a rejected request says nothing about the provider; free the trial slot."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Returns True if this failure opened (or re-opened) the circuit."""
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+# ==============================================================================
+# --- Provider manager ---
+# ==============================================================================
+
+class ProviderManager:
+    """Owns the rate limiters and circuit breakers; every LLM HTTP request goes through send()."""
+
+    def __init__(self, rate_limits: dict = None, max_retries: int = LLM_MAX_RETRIES,
+                 hedge_delay: float = LLM_HEDGE_DELAY_SECONDS):
+        self.rate_limits = dict(LLM_RATE_LIMITS if rate_limits is None else rate_limits)
+        self.max_retries = max_retries
+        self.hedge_delay = hedge_delay
+        self._buckets = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._hedge_pool = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+
+    def bucket(self, provider: str) -> TokenBucket:
+        """The provider's bucket; rate_limits are per provider, so all its models share one quota."""
+        with self._lock:
+            if provider not in self._buckets:
+                self._buckets[provider] = TokenBucket(self.rate_limits.get(provider, 0))
+            return self._buckets[provider]
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(provider, CircuitBreaker())
+
+    def is_open(self, provider: str) -> bool:
+        return self.breaker(provider).state == "open"
+
+    def _admit(self, provider: str) -> tuple:
+        breaker, bucket = self.breaker(provider), self.bucket(provider)
+        if not breaker.allow():
+            raise ProviderUnavailable(f"{provider} circuit is open")
+        return breaker, bucket
+
+    def _retry_delay(self, provider: str, operation: str, breaker, bucket, attempt: int, error) -> float:
+        """Backoff before the next attempt; re-raises error if it isn't retryable or the retries are used up."""
+        if not is_retryable(error):
+            # Bad requests / auth errors say nothing about provider health: keep the failure count,
+            # but free the half-open trial slot so the next call can probe the provider
+            breaker.release_trial()
+            raise error
+        if attempt == self.max_retries:
+            if breaker.record_failure():
+                metrics.record_circuit_open(provider)
+                print(f"🚨 {provider} circuit opened for {breaker.cooldown:.0f}s after repeated failures.")
+            raise error
+        delay = backoff_delay(attempt, error)
+        if is_rate_limited(error):
+            bucket.pause(delay)
+        metrics.record_retry(provider, operation)
+        print(f"⚠️ {provider} {type(error).__name__}; retrying in {delay:.1f}s (attempt {attempt + 2}).")
+        return delay
+
+    def send(self, provider: str, operation: str, request):
+        """
+        Runs request() (one HTTP call) under the provider's rate limit and circuit breaker,
+        retrying retryable errors with backoff. Raises the last error, or ProviderUnavailable.
+        """
+        breaker, bucket = self._admit(provider)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                with metrics.llm_call(provider, operation):
+                    response = request()
+            except Exception as e:
+                time.sleep(self._retry_delay(provider, operation, breaker, bucket, attempt, e))
+                continue
+            breaker.record_success()
+            return response
+
+    async def send_async(self, provider: str, operation: str, request):
+        """send() for async clients: request() returns an awaitable; waits happen on the event loop."""
+        breaker, bucket = self._admit(provider)
+        try:
+            for attempt in range(self.max_retries + 1):
+                await bucket.acquire_async()
+                try:
+                    with metrics.llm_call(provider, operation):
+                        response = await request()
+                except Exception as e:
+                    await asyncio.sleep(self._retry_delay(provider, operation, breaker, bucket, attempt, e))
+                    continue
+                breaker.record_success()
+                return response
+        except asyncio.CancelledError:
+            breaker.release_trial()
+            raise
+
+    def first_success(self, operation: str, attempts: list, hedge: bool = False):
+        """
+        attempts: [(provider, fn), ...] in preference order. Without hedging, each fn runs only after
+        the previous one failed. With hedging, the next fn also starts when the current one has run
+        for hedge_delay seconds; the first success wins. Raises the last error if every attempt fails.
+        """
+        if not attempts:
+            raise ProviderUnavailable("No LLM provider is available.")
+        if not (hedge and self.hedge_delay > 0 and len(attempts) > 1):
+            error = None
+            for index, (provider, fn) in enumerate(attempts):
+                try:
+                    return fn()
+                except Exception as e:
+                    error = e
+                    if index + 1 < len(attempts):
+                        metrics.record_fallback(operation, provider, attempts[index + 1][0])
+            raise error
+
+        pending, futures, error = list(attempts), {}, None
+
+        def launch():
+            provider, fn = pending.pop(0)
+            futures[self._hedge_pool.submit(contextvars.copy_context().run, fn)] = provider
+
+        launch()
+        while futures:
+            done, _ = wait(futures, timeout=self.hedge_delay if pending else None, return_when=FIRST_COMPLETED)
+            if not done:
+                metrics.record_hedge(operation, pending[0][0])
+                launch()
+                continue
+            for future in done:
+                provider = futures.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+                    if pending:
+                        metrics.record_fallback(operation, provider, pending[0][0])
+                        launch()
+        raise error
+
+    async def first_success_async(self, operation: str, attempts: list, hedge: bool = False):
+        """first_success() for coroutine functions; hedged attempts run as tasks on the event loop."""
+        if not attempts:
+            raise ProviderUnavailable("No LLM provider is available.")
+        if not (hedge and self.hedge_delay > 0 and len(attempts) > 1):
+            error = None
+            for index, (provider, fn) in enumerate(attempts):
+                try:
+                    return await fn()
+                except Exception as e:
+                    error = e
+                    if index + 1 < len(attempts):
+                        metrics.record_fallback(operation, provider, attempts[index + 1][0])
+            raise error
+
+        pending, tasks, error = list(attempts), {}, None
+
+        def launch():
+            provider, fn = pending.pop(0)
+            # Like the thread version, a losing attempt runs to completion (and fills the cache)
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            tasks[task] = provider
+
+        launch()
+        while tasks:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_delay if pending else None,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                metrics.record_hedge(operation, pending[0][0])
+                launch()
+                continue
+            for task in done:
+                provider = tasks.pop(task)
+                try:
+                    return task.result()
+                except Exception as e:
+                    error = e
+                    if pending:
+                        metrics.record_fallback(operation, provider, pending[0][0])
+                        launch()
+        raise error
+
+
+provider_manager = ProviderManager()
@@ -0,0 +1,139 @@
+# matcher/retrieval.py
+
+import os
+
+import numpy as np
+
+from matcher.embedding_store import DEFAULT_CACHE_DIR
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+# Below this many candidates an exact scan is as fast as the ANN index
+ANN_MIN_CANDIDATES = int(os.getenv("ANN_MIN_CANDIDATES", "2000"))
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 128
+
+
+def _build_hnsw(matrix: np.ndarray, labels: np.ndarray, max_elements: int = None):
+    """HNSW index labelled by candidate id (not row position), so it can be updated in place."""
+    index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+    index.init_index(max_elements=max(max_elements or 0, len(matrix)), ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+    index.add_items(np.asarray(matrix), labels)
+    index.set_ef(HNSW_EF_SEARCH)
+    return index
+
+
+def _load_or_build_hnsw(matrix: np.ndarray, labels: np.ndarray, path: str):
+    if os.path.exists(path):
+        index = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        index.load_index(path, max_elements=len(matrix))
+    else:
+        index = _build_hnsw(matrix, labels)
+        tmp_path = path + ".tmp"
+        index.save_index(tmp_path)
+        os.replace(tmp_path, path)
+    index.set_ef(HNSW_EF_SEARCH)
+    return index
+
+
+class CandidateRetriever:
+    """
+    Semantic top-K retrieval over one EmbeddingStore field.
+    Uses an HNSW index when hnswlib is installed and the directory is large enough,
+    otherwise an exact brute-force scan over the memory-mapped matrix.
+    """
+
+    def __init__(self, store, field: str = "profile", ann_index=None):
+        self.store = store
+        self.field = field
+        self.matrix = store.matrices[field]
+        self.ann_index = ann_index
+
+    def __len__(self):
+        return len(self.store)
+
+    def search(self, query_vec: np.ndarray, k: int) -> tuple:
+        """Returns (positions, cosine similarities) of the k nearest candidates, best first."""
+        k = min(k, len(self))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self.ann_index is not None:
+            try:
+                labels, distances = self.ann_index.knn_query(query_vec, k=k)
+                # The index is shared with newer versions: drop candidates this version doesn't have
+                positions = self.store.positions(labels[0].tolist())
+                known = positions >= 0
+                return positions[known], (1.0 - distances[0][known]).astype(np.float32)
+            except RuntimeError:
+                pass  # e.g. fewer live elements than k after deletions; fall through to exact search
+
+        sims = np.asarray(self.matrix @ query_vec, dtype=np.float32)
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return top.astype(np.int64), sims[top]
+
+    def retrieve(self, query_text: str, k: int, pre_scores: np.ndarray = None,
+                 keyword_weight: float = 0.5, oversample: int = 4, query_vec: np.ndarray = None) -> np.ndarray:
+        """
+        Positions of the k best candidates for the query text (or an already encoded query_vec).
+        With pre_scores (from PreFilterIndex.score), semantic neighbours and the best keyword
+        matches are pooled and re-ranked by cosine + keyword_weight * pre_score.
+        """
+        if query_vec is None:
+            query_vec = self.store.encode_query(query_text)
+        positions, _ = self.search(query_vec, k * oversample)
+        if pre_scores is None:
+            return positions[:k]
+
+        keyword_best = np.argsort(-pre_scores, kind="stable")[:k * oversample]
+        pool = np.union1d(positions, keyword_best)
+        sims = np.asarray(self.matrix[pool] @ query_vec, dtype=np.float32)
+        combined = sims + keyword_weight * pre_scores[pool]
+        return pool[np.argsort(-combined, kind="stable")[:k]]
+
+    def apply_changes(self, store, deleted_ids, added_ids) -> "CandidateRetriever":
+        """
+        Retriever over an updated store; the caller serializes calls (DirectoryHolder's writer lock).
+        The HNSW index is updated in place and shared with older versions, since hnswlib searches are
+        safe alongside add_items / mark_deleted: deleted ids are marked deleted and added/updated ids
+        (re)inserted under their candidate id. Older versions skip labels they don't know and no longer
+        find deleted ones. Only a resize is unsafe under searches, so growth copies the index into one
+        with double the capacity (O(N), amortized over the batches that fill it). A directory that
+        first reaches ANN_MIN_CANDIDATES gets a new index, built once.
+        """
+        ann_index = self.ann_index
+        if ann_index is None:
+            if hnswlib is not None and len(store) >= ANN_MIN_CANDIDATES:
+                ann_index = _build_hnsw(store.matrices[self.field], store.ids.astype(np.int64), 2 * len(store))
+            return CandidateRetriever(store, self.field, ann_index)
+
+        for cid in deleted_ids:
+            try:
+                ann_index.mark_deleted(int(cid))
+            except RuntimeError:
+                pass
+        added_ids = list(added_ids)
+        if added_ids:
+            needed = ann_index.get_current_count() + len(added_ids)
+            if needed > ann_index.get_max_elements():
+                ann_index = hnswlib.Index(ann_index)
+                ann_index.resize_index(max(needed, 2 * ann_index.get_max_elements()))
+            vectors = np.asarray(store.matrices[self.field][store.positions(added_ids)])
+            ann_index.add_items(vectors, np.asarray(added_ids, dtype=np.int64))
+        return CandidateRetriever(store, self.field, ann_index)
+
+
+def build_retriever(store, field: str = "profile", cache_dir: str = DEFAULT_CACHE_DIR) -> CandidateRetriever:
+    """Loads the persisted HNSW index for this store field (building it if needed), or falls back to exact search."""
+    ann_index = None
+    if hnswlib is not None and len(store) >= ANN_MIN_CANDIDATES:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, f"hnsw_{field}_{store.hashes.get(field, 'nohash')}.bin")
+        ann_index = _load_or_build_hnsw(store.matrices[field], store.ids.astype(np.int64), path)
+    elif hnswlib is None:
+        print("⚠️ hnswlib not installed. Candidate retrieval will use exact search.")
+    return CandidateRetriever(store, field, ann_index)
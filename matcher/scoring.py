@@ -1,56 +1,245 @@
 # matcher/scoring.py
 
-import re
+import asyncio
+import time
+
+import numpy as np
+import pandas as pd
+
 from matcher.features import (
     location_score,
     budget_score,
     vertical_score, # This will call embedding_similarity from features
-    creator_history_score
+    creator_history_score,
 )
-from matcher.llm_utils import llm_score_candidate_aspects
-
+from matcher import async_llm
+from matcher.candidate_store import take_rows
+from matcher.feature_engine import (CREATOR_COLUMN, CREATOR_TOKENS, FeatureEngine, parse_job_budget, split_creators,
+                                    top_positions, weighted_scores)
+from matcher.llm_utils import llm_score_candidate_aspects, iter_candidate_scores, score_candidates_concurrently
+from matcher.local_scoring import local_aspect_scores
+from matcher.metrics import stage, record_stage
 
-def score_candidate(candidate: dict, job: dict) -> float:
-    """Compute weighted candidate-job compatibility score with LLM + features."""
+SCORING_MODES = ("llm", "local", "hybrid")
+ASPECT_COLUMNS = ("skills_score", "jobtype_score", "trait_score")
 
-    # --- LLM scores (Calls directly) ---
-    llm_scores = llm_score_candidate_aspects(candidate, job)
+# Final score weights: LLM (or local) aspect scores first, then the feature scores
+SCORE_WEIGHTS = {
+    "skills_score": 0.25,
+    "jobtype_score": 0.15,
+    "trait_score": 0.15,
+    "vertical_sim": 0.10,
+    "budget_sim": 0.10,
+    "loc_sim": 0.05,
+    "creator_sim": 0.05,
+}
 
-    skills_sim = llm_scores.get("skills_score", 0.0)
-    jobtype_sim = llm_scores.get("jobtype_score", 0.0)
-    trait_sim = llm_scores.get("trait_score", 0.0)
 
-    # --- Feature scores ---
-    loc_sim = location_score(candidate.get("Country", ""), job.get("location_pref", "anywhere"))
+def feature_scores(candidate: dict, job: dict, vertical_sim: float = None) -> dict:
+    """Non-LLM feature scores for one candidate. A precomputed vertical_sim skips the encoder call."""
+    country = candidate.get("Country")
+    # A profile ingested without a country has NaN here; FeatureEngine scores it as "" too
+    loc_sim = location_score(country if isinstance(country, str) else "", job.get("location_pref", "anywhere"))
 
-    job_budget_str = str(job.get("budget_monthly", "inf"))
-    job_budget_monthly = float("inf")
-    if re.search(r'\d', job_budget_str):
-        job_budget_monthly = float(re.search(r'\d+', job_budget_str).group())
-
-    budget_sim = budget_score(candidate.get("Monthly Rate", float("inf")), job_budget_monthly)
+    budget_sim = budget_score(candidate.get("Monthly Rate", float("inf")), parse_job_budget(job))
 
     # vertical_score and creator_history_score are imported from features.py
     # features.py will import embedding_similarity from similarity.py
-    vertical_sim = vertical_score(candidate.get("Content Verticals", []), job.get("content_verticals", []))
-    creator_sim = creator_history_score(candidate.get("Creators Worked With", []), job.get("hiring_creator_name", ""))
-
-    # --- Weighted final score ---
-    final_score = (
-            0.25 * skills_sim +
-            0.15 * jobtype_sim +
-            0.15 * trait_sim +
-            0.10 * vertical_sim +
-            0.10 * budget_sim +
-            0.05 * loc_sim +
-            0.05 * creator_sim
-    )
+    if vertical_sim is None:
+        vertical_sim = vertical_score(candidate.get("Content Verticals", []), job.get("content_verticals", []))
+    creators = candidate.get(CREATOR_TOKENS)
+    if creators is None:
+        creators = split_creators(candidate.get(CREATOR_COLUMN))
+    creator_sim = creator_history_score(creators, job.get("hiring_creator_name", ""))
+
+    return {"vertical_sim": vertical_sim, "budget_sim": budget_sim, "loc_sim": loc_sim, "creator_sim": creator_sim}
+
+
+def combine_scores(llm_scores: dict, features: dict) -> float:
+    """Weighted final score. Missing LLM scores count as 0, which gives the provisional feature-only score."""
+    final_score = 0.0
+    for name, weight in SCORE_WEIGHTS.items():
+        value = llm_scores.get(name, 0.0) if name in ASPECT_COLUMNS else features[name]
+        final_score += weight * value
 
     return round(final_score, 4)
 
 
-def rank_candidates(df, job, top_n=10):
-    """Score all candidates and return top N."""
-    df = df.copy()
-    df["match_score"] = df.apply(lambda row: score_candidate(row, job), axis=1)
-    return df.sort_values(by="match_score", ascending=False).head(top_n)
\ No newline at end of file
+def score_candidate(candidate: dict, job: dict, vertical_sim: float = None, llm_scores: dict = None) -> float:
+    """
+    Compute weighted candidate-job compatibility score with LLM + features.
+    A precomputed vertical_sim (from the embedding store) skips the per-row encoder call,
+    and precomputed llm_scores skip the per-row LLM call.
+    """
+
+    # --- LLM scores (Calls directly unless already computed) ---
+    if llm_scores is None:
+        llm_scores = llm_score_candidate_aspects(candidate, job)
+
+    return combine_scores(llm_scores, feature_scores(candidate, job, vertical_sim))
+
+
+def _feature_columns(df, job, store=None, engine=None) -> dict:
+    """feature_scores for every row of df as arrays, from the directory's FeatureEngine or one built for df."""
+    engine = engine if engine is not None else FeatureEngine(df)
+    with stage("feature_scoring"):
+        return engine.feature_arrays(job, store)
+
+
+def _features_by_id(df, features: dict) -> dict:
+    return {cid: {name: float(values[i]) for name, values in features.items()} for i, cid in enumerate(df.index)}
+
+
+def _candidate_pairs(df) -> list:
+    """(candidate_id, candidate dict) pairs, the input of the LLM scorers."""
+    return list(zip(df.index, df.to_dict(orient="records")))
+
+
+def _top_rows(df, scores: list, top_n: int):
+    """The top N rows of df by score (same order as sort_values), with match_score; df itself is not modified."""
+    order = pd.Series(scores, dtype=np.float64).sort_values(ascending=False).index[:top_n]
+    return df.iloc[order].assign(match_score=[scores[i] for i in order])
+
+
+def rank_candidates(df, job, top_n=10, store=None, llm_batch_size=None, features=None):
+    """
+    Score all candidates and return top N.
+    LLM aspect scores are fetched concurrently up front (optionally llm_batch_size candidates per prompt).
+    Feature scores come from a FeatureEngine: the job is parsed once and every row scored with NumPy;
+    with an EmbeddingStore the job verticals are encoded once and scored in one product.
+    features: precomputed feature columns for df's rows (e.g. from bulk matching), skipping that step.
+    df is only read; the returned frame holds just the top N rows.
+    """
+    candidates = _candidate_pairs(df)
+    with stage("llm_scoring"):
+        llm_by_id = dict(zip(df.index, score_candidates_concurrently(candidates, job, batch_size=llm_batch_size)))
+
+    if features is None:
+        features = _feature_columns(df, job, store)
+    features_by_id = _features_by_id(df, features)
+    scores = [combine_scores(llm_by_id[cid], features_by_id[cid]) for cid in df.index]
+    with stage("final_sort"):
+        return _top_rows(df, scores, top_n)
+
+
+def iter_rank_candidates(df, job, top_n=10, store=None, llm_batch_size=None, provisional_scores=None):
+    """
+    Streaming version of rank_candidates. Yields, in order:
+      ("shortlist", df with feature columns and a provisional match_score: feature-only, or using
+                    provisional_scores[candidate_id] (e.g. local aspect scores) where given),
+      ("score", candidate_id, match_score) for each candidate as its LLM score arrives,
+      ("results", top N df) once every candidate is scored.
+    """
+    features = _feature_columns(df, job, store)
+    features_by_id = _features_by_id(df, features)
+    provisional_scores = provisional_scores or {}
+    # The one frame this request owns: df plus the feature columns (df itself is not modified)
+    df = df.assign(**features)
+    provisional = [combine_scores(provisional_scores.get(cid, {}), features_by_id[cid]) for cid in df.index]
+    yield ("shortlist", _top_rows(df, provisional, len(df)))
+
+    candidates = _candidate_pairs(df)
+    final_scores = {}
+    llm_start = time.perf_counter()
+    for candidate_id, llm_scores in iter_candidate_scores(candidates, job, batch_size=llm_batch_size):
+        final_scores[candidate_id] = combine_scores(llm_scores, features_by_id[candidate_id])
+        yield ("score", candidate_id, final_scores[candidate_id])
+
+    # Measured around the loop rather than with stage(), which must not span a yield
+    record_stage("llm_scoring", time.perf_counter() - llm_start)
+
+    with stage("final_sort"):
+        results = _top_rows(df, [final_scores[cid] for cid in df.index], top_n)
+    yield ("results", results)
+
+
+# ==============================================================================
+# --- Async ranking (ASGI server) ---
+# ==============================================================================
+
+async def rank_candidates_async(df, job, top_n=10, store=None, llm_batch_size=None):
+    """
+    rank_candidates for the event loop. The LLM scores are awaited (no thread waits on a provider)
+    while the feature scores, which are CPU work, are computed on a worker thread at the same time.
+    """
+    # Building the records is CPU work too (~10ms for a 30-row shortlist)
+    candidates = await asyncio.to_thread(_candidate_pairs, df)
+    features = asyncio.ensure_future(asyncio.to_thread(_feature_columns, df, job, store))
+    with stage("llm_scoring"):
+        llm_by_id = {cid: scores async for cid, scores in
+                     async_llm.iter_candidate_scores(candidates, job, batch_size=llm_batch_size)}
+
+    features_by_id = _features_by_id(df, await features)
+    scores = [combine_scores(llm_by_id[cid], features_by_id[cid]) for cid in df.index]
+    with stage("final_sort"):
+        return _top_rows(df, scores, top_n)
+
+
+async def iter_rank_candidates_async(df, job, top_n=10, store=None, llm_batch_size=None, provisional_scores=None):
+    """iter_rank_candidates for the event loop: yields the same events, awaiting the LLM scores."""
+    features = await asyncio.to_thread(_feature_columns, df, job, store)
+    features_by_id = _features_by_id(df, features)
+    provisional_scores = provisional_scores or {}
+    df = df.assign(**features)
+    provisional = [combine_scores(provisional_scores.get(cid, {}), features_by_id[cid]) for cid in df.index]
+    yield ("shortlist", _top_rows(df, provisional, len(df)))
+
+    candidates = await asyncio.to_thread(_candidate_pairs, df)
+    final_scores = {}
+    llm_start = time.perf_counter()
+    async for candidate_id, llm_scores in async_llm.iter_candidate_scores(candidates, job, batch_size=llm_batch_size):
+        final_scores[candidate_id] = combine_scores(llm_scores, features_by_id[candidate_id])
+        yield ("score", candidate_id, final_scores[candidate_id])
+    record_stage("llm_scoring", time.perf_counter() - llm_start)
+
+    with stage("final_sort"):
+        results = _top_rows(df, [final_scores[cid] for cid in df.index], top_n)
+    yield ("results", results)
+
+
+# ==============================================================================
+# --- Local (LLM-free) scoring ---
+# ==============================================================================
+
+def rank_candidates_local(df, job, top_n=10, store=None, engine=None):
+    """
+    Scores every row of df (a CandidateStore or a candidate DataFrame) without any LLM call:
+    skills / job-type / trait scores come from local_aspect_scores and are combined with the
+    usual feature scores and weights. Pass the directory's FeatureEngine (row-aligned with df)
+    to skip building one per call. Only the top N rows are materialized; they carry the local
+    aspect scores next to match_score.
+    """
+    engine = engine if engine is not None else FeatureEngine(df)
+    with stage("local_scoring"):
+        columns = dict(local_aspect_scores(df, job, store, engine))
+    columns.update(_feature_columns(df, job, store, engine))
+    scores = weighted_scores(columns, SCORE_WEIGHTS)
+
+    with stage("final_sort"):
+        k = min(top_n, len(df))
+        if k <= 0:
+            return take_rows(df, []).assign(match_score=[])
+        top = top_positions(scores, k)
+        results = take_rows(df, top)
+        for name in ASPECT_COLUMNS:
+            results[name] = np.round(np.asarray(columns[name], dtype=np.float64)[top], 4)
+        results["match_score"] = scores[top]
+        return results
+
+
+def rerank_pool(ranked) -> tuple:
+    """
+    Splits a locally ranked frame into the rows to send to the LLM and their local aspect scores
+    by candidate id (usable as provisional scores while the LLM rescoring is in flight).
+    """
+    aspects = [name for name in ASPECT_COLUMNS if name in ranked.columns]
+    local_scores = {}
+    if len(aspects) == len(ASPECT_COLUMNS):
+        local_scores = {cid: {name: float(row[name]) for name in aspects} for cid, row in ranked.iterrows()}
+    return ranked.drop(columns=aspects + ["match_score"]), local_scores
+
+
+def rank_candidates_hybrid(df, job, top_n=10, store=None, rerank_top=15, llm_batch_size=None):
+    """Local scoring over every row, then LLM aspect scores only for the rerank_top best."""
+    pool, _ = rerank_pool(rank_candidates_local(df, job, top_n=rerank_top, store=store))
+    return rank_candidates(pool, job, top_n=top_n, store=store, llm_batch_size=llm_batch_size)
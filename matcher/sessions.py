@@ -0,0 +1,231 @@
+# matcher/sessions.py
+"""
+Server-side search sessions. A search keeps its parsed job, its candidate pool (the pre-filter /
+retrieval or local ranking order), the pool's feature scores and every match score computed so far.
+Later pages, re-sorts and filters are answered from the session, and only candidates a page needs
+that were never scored cost new LLM calls.
+"""
+
+import asyncio
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from matcher import async_llm
+from matcher.llm_utils import score_candidates_concurrently
+from matcher.metrics import stage
+from matcher.scoring import _candidate_pairs, _feature_columns, _features_by_id, _top_rows, combine_scores
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+# Candidates a session can page through
+SESSION_POOL_SIZE = int(os.getenv("SESSION_POOL_SIZE", "200"))
+MAX_PAGE_SIZE = 100
+
+# Sort key -> candidate column (match_score is the session's own score)
+SORT_FIELDS = {"match_score": None, "monthly_rate": "Monthly Rate", "hourly_rate": "Hourly Rate",
+               "views": "# of Views by Creators"}
+
+
+def parse_page_query(args, default_page_size: int = 10) -> dict:
+    """
+    Page / sort / filter options from query-string args (or a dict):
+    page, page_size, sort (a SORT_FIELDS key), order (asc | desc), country, city, min_rate, max_rate.
+    Raises ValueError for anything malformed.
+    """
+    def number(name, cast, default=None):
+        value = args.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{name} must be a number.")
+
+    query = {
+        "page": number("page", int, 1),
+        "page_size": number("page_size", int, default_page_size),
+        "sort": args.get("sort") or "match_score",
+        "order": (args.get("order") or "").lower(),
+        "filters": {
+            "country": (args.get("country") or "").strip().lower(),
+            "city": (args.get("city") or "").strip().lower(),
+            "min_rate": number("min_rate", float),
+            "max_rate": number("max_rate", float),
+        },
+    }
+    if query["page"] < 1 or not 1 <= query["page_size"] <= MAX_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}.")
+    if query["sort"] not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_FIELDS)}.")
+    if query["order"] not in ("", "asc", "desc"):
+        raise ValueError("order must be asc or desc.")
+    # Best match first; rates and views default to cheapest / most viewed first
+    query["descending"] = query["order"] == "desc" if query["order"] else query["sort"] in ("match_score", "views")
+    return query
+
+
+class SearchSession:
+    """
+    One search's state. pool holds the candidate rows in the order they are worth scoring
+    (retrieval order in llm mode, local ranking in hybrid / local mode); scores maps
+    candidate id -> final match score for every candidate scored so far.
+    margin is how many candidates beyond the end of a match_score page get scored, so the page's
+    ranking is as good as the original "score 30, show 10" shortlist.
+    """
+
+    def __init__(self, job_prompt: str, job_details: dict, mode: str, pool, store=None, scores: dict = None,
+                 margin: int = 0, llm_batch_size: int = None):
+        self.id = secrets.token_urlsafe(16)
+        self.job_prompt = job_prompt
+        self.job_details = job_details
+        self.mode = mode
+        self.pool = pool
+        self.margin = margin
+        self.llm_batch_size = llm_batch_size
+        self.scores = dict(scores or {})
+        self._features = {}
+        if mode != "local" and len(pool):
+            self._features = _features_by_id(pool, _feature_columns(pool, job_details, store))
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    def __len__(self):
+        return len(self.pool)
+
+    def _selected(self, filters: dict) -> np.ndarray:
+        """Pool positions passing the filters, in pool order."""
+        mask = np.ones(len(self.pool), dtype=bool)
+        for name, column in (("country", "Country"), ("city", "City")):
+            if filters.get(name) and column in self.pool.columns:
+                mask &= (self.pool[column].fillna("").astype(str).str.strip().str.lower() == filters[name]).to_numpy()
+        rates = pd.to_numeric(self.pool.get("Monthly Rate"), errors="coerce")
+        if filters.get("min_rate") is not None:
+            mask &= (rates >= filters["min_rate"]).to_numpy()
+        if filters.get("max_rate") is not None:
+            mask &= (rates <= filters["max_rate"]).to_numpy()
+        return np.flatnonzero(mask)
+
+    def _page_positions(self, query: dict, selected: np.ndarray) -> np.ndarray:
+        """For a sort by a candidate column: the pool positions on the requested page."""
+        values = pd.to_numeric(self.pool[SORT_FIELDS[query["sort"]]].iloc[selected], errors="coerce").to_numpy()
+        keys = -values if query["descending"] else values
+        # Stable, missing values last
+        order = selected[np.lexsort((keys, np.isnan(keys)))]
+        start = (query["page"] - 1) * query["page_size"]
+        return order[start:start + query["page_size"]]
+
+    def unscored_rows(self, query: dict):
+        """The rows the page needs scores for that have none yet (pool order)."""
+        if self.mode == "local":
+            return self.pool.iloc[:0]
+        selected = self._selected(query["filters"])
+        if query["sort"] == "match_score":
+            needed = selected[:query["page"] * query["page_size"] + self.margin]
+        else:
+            needed = self._page_positions(query, selected)
+        ids = self.pool.index
+        return self.pool.iloc[[p for p in np.sort(needed) if ids[p] not in self.scores]]
+
+    def add_llm_scores(self, llm_scores: dict):
+        """Final match scores from LLM aspect scores (candidate id -> aspect scores)."""
+        for candidate_id, aspects in llm_scores.items():
+            self.scores[candidate_id] = combine_scores(aspects, self._features[candidate_id])
+
+    def page(self, query: dict) -> dict:
+        """The requested page from what has been scored: {"page", "page_size", "total", "has_more", "results"}."""
+        self.last_used = time.monotonic()
+        selected = self._selected(query["filters"])
+        start = (query["page"] - 1) * query["page_size"]
+        if query["sort"] == "match_score":
+            scored = [p for p in selected if self.pool.index[p] in self.scores]
+            rows = self.pool.iloc[scored]
+            ranked = _top_rows(rows, [self.scores[cid] for cid in rows.index], len(rows))
+            if not query["descending"]:
+                ranked = ranked.iloc[::-1]
+            results = ranked.iloc[start:start + query["page_size"]]
+        else:
+            rows = self.pool.iloc[self._page_positions(query, selected)]
+            results = rows.assign(match_score=[self.scores.get(cid) for cid in rows.index])
+        return {"page": query["page"], "page_size": query["page_size"], "total": int(len(selected)),
+                "has_more": bool(start + len(results) < len(selected)), "results": results}
+
+
+class SessionStore:
+    """Sessions by id, evicted after ttl_seconds without use or beyond max_sessions (least recently used first)."""
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS, max_sessions: int = SESSION_MAX):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict(self, now: float):
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and now - oldest.last_used < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+
+    def add(self, session: SearchSession) -> str:
+        with self._lock:
+            self._sessions[session.id] = session
+            self._evict(time.monotonic())
+        return session.id
+
+    def get(self, session_id: str):
+        """The live session, or None if it is unknown or expired."""
+        with self._lock:
+            now = time.monotonic()
+            self._evict(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+
+# ==============================================================================
+# --- Page fetches (scoring whatever the page is missing) ---
+# ==============================================================================
+
+def fetch_page(session: SearchSession, query: dict) -> dict:
+    """session.page(query), LLM-scoring the candidates it needs that have no score yet."""
+    with session.lock:
+        missing = session.unscored_rows(query)
+        if len(missing):
+            candidates = _candidate_pairs(missing)
+            with stage("llm_scoring"):
+                llm_scores = score_candidates_concurrently(candidates, session.job_details,
+                                                           batch_size=session.llm_batch_size)
+            session.add_llm_scores(dict(zip(missing.index, llm_scores)))
+        with stage("final_sort"):
+            return session.page(query)
+
+
+async def fetch_page_async(session: SearchSession, query: dict) -> dict:
+    """
+    fetch_page for the event loop (async LLM clients). No lock is held across the awaits, so two
+    overlapping requests for one session may both score a candidate (the LLM cache absorbs the repeat).
+    """
+    missing = session.unscored_rows(query)
+    if len(missing):
+        candidates = await asyncio.to_thread(_candidate_pairs, missing)
+        with stage("llm_scoring"):
+            llm_scores = {cid: scores async for cid, scores in
+                          async_llm.iter_candidate_scores(candidates, session.job_details,
+                                                          batch_size=session.llm_batch_size)}
+        session.add_llm_scores(llm_scores)
+    with stage("final_sort"):
+        return session.page(query)
+
+
+search_sessions = SessionStore()
@@ -1,10 +1,18 @@
-from sentence_transformers import SentenceTransformer, util
+# Encoding goes through the process-wide embedding service (micro-batched, cached, optionally a shared sidecar)
+from matcher.embedding_service import get_embedding_service
+
+
+def embedding_model_id() -> str:
+    """Identifies the configured encoder (model, backend, quantization); keys cached embedding matrices."""
+    return get_embedding_service().model_id
 
-model = SentenceTransformer("sentence-transformers/all-mpnet-base-v2")
 
 def embedding_similarity(text1, text2):
     if not text1 or not text2:
         return 0.0
-    emb1 = model.encode(text1, convert_to_tensor=True)
-    emb2 = model.encode(text2, convert_to_tensor=True)
-    return float(util.cos_sim(emb1, emb2))
+    emb1, emb2 = encode_texts([text1, text2])
+    return float(emb1 @ emb2)
+
+def encode_texts(texts, batch_size=64):
+    """Batch-encode texts into L2-normalized float32 vectors (empty texts map to zero vectors)."""
+    return get_embedding_service().encode(list(texts), batch_size=batch_size)
@@ -0,0 +1,32 @@
+# tests/conftest.py
+
+import json
+import os
+
+import pytest
+
+from matcher.ingest import DirectoryHolder, build_directory
+from matcher.preprocessing import load_candidates
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CANDIDATES_CSV = os.path.join(ROOT, "data", "Talent Profiles.csv")
+CACHE_DIR = os.path.join(ROOT, "data", "cache")
+
+
+@pytest.fixture(scope="session")
+def base_directory():
+    """The directory the app builds at startup (snapshot and embeddings come from data/cache)."""
+    return build_directory(load_candidates(CANDIDATES_CSV, CACHE_DIR))
+
+
+@pytest.fixture
+def holder(base_directory, tmp_path):
+    """A fresh holder per test; versions are copy-on-write, so every test starts from the same base."""
+    return DirectoryHolder(base_directory, journal_path=str(tmp_path / "ingest.jsonl"))
+
+
+@pytest.fixture(scope="session")
+def jobs():
+    """The recorded job extractions of the benchmark suite."""
+    with open(os.path.join(ROOT, "benchmarks", "jobs.json"), "r", encoding="utf-8") as f:
+        return [job["job_details"] for job in json.load(f)["jobs"]]
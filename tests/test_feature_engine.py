@@ -0,0 +1,46 @@
+# tests/test_feature_engine.py
+
+import pytest
+
+from matcher.scoring import feature_scores
+
+FEATURES = ("vertical_sim", "budget_sim", "loc_sim", "creator_sim")
+
+
+def assert_matches_feature_scores(directory, job, positions):
+    arrays = directory.feature_engine.feature_arrays(job, directory.embedding_store)
+    rows = directory.candidates.rows(positions).to_dict("records")
+    for position, row in zip(positions, rows):
+        expected = feature_scores(row, job)
+        for name in FEATURES:
+            assert float(arrays[name][position]) == pytest.approx(expected[name], abs=1e-5), (position, name)
+
+
+def extra_jobs(directory):
+    """Jobs for the branches the benchmark jobs miss: a known hiring creator, an hourly budget, a region."""
+    creators = directory.candidates.rows([0, 1, 2, 3])["Past Creators"].dropna()
+    creator = creators.iloc[0].split(",")[0].strip()
+    return [
+        {"hiring_creator_name": creator, "location_pref": "Asia", "relevant_skills": [], "job_types": [],
+         "budget_hourly": "40", "content_verticals": ["Gaming", "Beauty"]},
+        {"hiring_creator_name": "", "location_pref": "India", "budget_monthly": "", "content_verticals": []},
+    ]
+
+
+def test_feature_arrays_match_per_row_feature_scores(base_directory, jobs):
+    positions = list(range(0, len(base_directory), 7))
+    for job in jobs + extra_jobs(base_directory):
+        assert_matches_feature_scores(base_directory, job, positions)
+
+
+def test_feature_arrays_match_after_ingest(holder, jobs):
+    # Rows with no country, rate or creators, and a country the directory has not seen before
+    result = holder.apply_batch(upserts=[
+        {"Skills": "Video Editing"},
+        {"Country": "Atlantis", "Monthly Rate": "$1,200", "Past Creators": "MrBeast, Someone New"},
+        {"candidate_id": 4, "Content Verticals": "Gaming, Travel"},
+    ], deletes=[9])
+    directory = holder.current
+    positions = directory.candidates.positions(result["candidate_ids"]).tolist() + [0, 100, 200]
+    for job in jobs + extra_jobs(directory):
+        assert_matches_feature_scores(directory, job, positions)
@@ -0,0 +1,90 @@
+# tests/test_ingest.py
+
+import json
+
+import numpy as np
+import pytest
+
+from matcher.feature_engine import FeatureEngine
+from matcher.ingest import DirectoryHolder, InvalidRecord
+from matcher.local_scoring import RuleBasedJobParser
+
+
+def test_partial_upsert_is_cleaned_not_rejected(holder):
+    result = holder.apply_batch(upserts=[{"Skills": "Video Editing", "Monthly Rate": "$5,000"}])
+    assert result["upserted"] == 1
+    assert result["total"] == len(holder.current)
+
+    row = holder.current.candidates.rows(holder.current.candidates.positions(result["candidate_ids"])).iloc[0]
+    assert row["Profile_clean"] == ""
+    assert row["language"] == "unknown"
+    assert row["Skills_list"] == ["video editing"]
+    assert row["JobTypes_list"] == [] and row["Platforms_list"] == []
+    assert row["Monthly Rate"] == 5000
+
+
+def test_new_ids_are_returned_and_updates_keep_theirs(holder):
+    next_id = int(holder.current.candidates.ids.max()) + 1
+    result = holder.apply_batch(upserts=[{"First Name": "A"}, {"candidate_id": 5, "Skills": "Blender"},
+                                         {"First Name": "B"}])
+    assert result["candidate_ids"] == [next_id, 5, next_id + 1]
+    assert holder.apply_batch(upserts=[{"First Name": "C"}])["candidate_ids"] == [next_id + 2]
+
+
+VALID = {"First Name": "valid"}
+
+
+@pytest.mark.parametrize("upserts, deletes, field", [
+    ([VALID, {"Monthly Rate": "a lot"}], None, "Monthly Rate"),
+    ([VALID, {"candidate_id": "seven"}], None, "candidate_id"),
+    ([VALID, {"Skills": ["Blender"]}], None, "Skills"),
+    ([VALID, "not a record"], None, None),
+    (VALID, None, "upserts"),
+    ([VALID], ["x"], "deletes"),
+])
+def test_malformed_batches_are_rejected_without_changes(holder, upserts, deletes, field):
+    before, next_id = holder.current, holder._next_id
+    with pytest.raises(InvalidRecord) as error:
+        holder.apply_batch(upserts=upserts, deletes=deletes)
+    assert error.value.field == field
+    assert holder.current is before and holder._next_id == next_id
+
+
+def test_journal_replay_recreates_the_same_ids(base_directory, holder):
+    holder.apply_batch(upserts=[{"First Name": "A", "Country": "India"}, {"First Name": "B"}], deletes=[3])
+    holder.apply_batch(upserts=[{"First Name": "C"}, {"candidate_id": 8, "Skills": "Blender"}])
+    holder.apply_batch(deletes=[int(holder.current.candidates.ids[-1])])
+    with open(holder.journal_path, "r", encoding="utf-8") as f:
+        assert all("candidate_id" in record for line in f for record in json.loads(line)["upserts"])
+
+    replayed = DirectoryHolder(base_directory, journal_path=holder.journal_path)
+    assert replayed.replay_journal() == 3
+    assert replayed.current.candidates.ids.tolist() == holder.current.candidates.ids.tolist()
+    columns = ["First Name", "Country", "Skills_list", "MonthlyRate_norm"]
+    assert replayed.current.candidates.rows(range(len(replayed.current)))[columns].equals(
+        holder.current.candidates.rows(range(len(holder.current)))[columns])
+    # Ids given out after the replay continue where the original holder left off
+    assert replayed._next_id == holder._next_id
+
+
+def test_derived_indexes_match_a_full_rebuild(holder):
+    holder.apply_batch(upserts=[
+        {"Country": "Atlantis", "Past Creators": "MrBeast, Someone New", "Monthly Rate": 999999},
+        {"candidate_id": 3, "Skills": "Underwater Basket Weaving", "Job Types": "Diver"},
+        {"Content Verticals": "Gaming"},
+    ], deletes=[5, 7])
+    directory = holder.current
+    rebuilt = FeatureEngine(directory.candidates)
+    derived = directory.feature_engine
+    for name in ("ids", "country_codes", "creator_indptr", "creator_indices", "trait_flags"):
+        assert np.array_equal(np.asarray(getattr(derived, name)), np.asarray(getattr(rebuilt, name))), name
+    assert np.array_equal(derived.monthly_rate, rebuilt.monthly_rate, equal_nan=True)
+    assert derived.countries == rebuilt.countries
+    assert derived.creator_vocab == rebuilt.creator_vocab
+    assert derived.verticals == rebuilt.verticals
+
+    parser = RuleBasedJobParser(directory.candidates)
+    assert directory.job_parser.terms == parser.terms
+    assert "underwater basket weaving" in parser.terms["relevant_skills"]
+    for key, pattern in parser.patterns.items():
+        assert getattr(directory.job_parser.patterns[key], "pattern", None) == getattr(pattern, "pattern", None)
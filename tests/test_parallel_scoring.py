@@ -0,0 +1,75 @@
+# tests/test_parallel_scoring.py
+
+import numpy as np
+import pytest
+
+from matcher.feature_engine import top_positions
+from matcher.parallel_scoring import ProcessScoringBackend
+from matcher.scoring import rank_candidates_local
+
+# A profile priced far above every other widens the Monthly Rate range, so the batch renormalizes it
+RENORMALIZING_BATCH = {
+    "upserts": [
+        {"First Name": "Rich", "Profile Description": "creative funny video editor", "Monthly Rate": "$250,000",
+         "Skills": "Splice & Dice", "Job Types": "Video Editor", "Country": "India"},
+        {"candidate_id": 7, "Skills": "Premiere Pro, After Effects"},
+    ],
+    "deletes": [1, 2],
+}
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    # Small shards, so equal scores land in different shards and meet in the merge
+    backend = ProcessScoringBackend(workers=2, shard_size=37, cache_dir=str(tmp_path_factory.mktemp("cache")))
+    yield backend
+    backend.close()
+
+
+def assert_same_ranking(backend, directory, jobs, top_ns=(10, 25, 60)):
+    for job in jobs:
+        for top_n in top_ns:
+            local = rank_candidates_local(directory.candidates, job, top_n, directory.embedding_store,
+                                          directory.feature_engine)
+            parallel = backend.rank(directory, job, top_n)
+            assert list(parallel.index) == list(local.index)
+            assert list(parallel["match_score"]) == list(local["match_score"])
+
+
+def test_top_positions_breaks_ties_by_position():
+    scores = np.array([0.5, 0.2918, 0.9, 0.2918, 0.2918, 0.1])
+    assert top_positions(scores, 3).tolist() == [2, 0, 1]
+    assert top_positions(scores, 4).tolist() == [2, 0, 1, 3]
+    assert top_positions(scores, 0).tolist() == []
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        scores = rng.integers(0, 4, rng.integers(1, 50)) / 4
+        k = int(rng.integers(1, 60))
+        assert top_positions(scores, k).tolist() == np.argsort(-scores, kind="stable")[:k].tolist()
+
+
+def test_backend_matches_local_ranking(backend, base_directory, jobs):
+    assert_same_ranking(backend, base_directory, jobs)
+
+
+def test_backend_matches_local_ranking_after_renormalizing_ingest(backend, holder, jobs):
+    before = holder.current.norm_stats["Monthly Rate"]
+    holder.apply_batch(**RENORMALIZING_BATCH)
+    assert holder.current.norm_stats["Monthly Rate"] != before
+    assert_same_ranking(backend, holder.current, jobs)
+
+    holder.apply_batch(upserts=[{"candidate_id": 11, "Job Types": "Video Editor"}], deletes=[3])
+    assert_same_ranking(backend, holder.current, jobs)
+
+
+def test_backend_breaks_ties_like_local_ranking(backend, holder):
+    # With no skills, job types or verticals to tell candidates apart, many scores are equal
+    job = {"hiring_creator_name": "", "location_pref": "anywhere", "job_types": [], "relevant_skills": [],
+           "personality_traits": [], "budget_monthly": "4000", "content_verticals": []}
+    local = rank_candidates_local(holder.current.candidates, job, 60, holder.current.embedding_store,
+                                  holder.current.feature_engine)
+    assert local["match_score"].duplicated().sum() >= 10
+    assert_same_ranking(backend, holder.current, [job], range(1, 61))
+
+    holder.apply_batch(**RENORMALIZING_BATCH)
+    assert_same_ranking(backend, holder.current, [job], range(1, 61))
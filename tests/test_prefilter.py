@@ -0,0 +1,12 @@
+# tests/test_prefilter.py
+
+from matcher.features import pre_filter_score
+
+
+def test_index_score_matches_per_row_score(base_directory, jobs):
+    index = base_directory.prefilter_index
+    rows = base_directory.candidates.rows(range(len(base_directory))).to_dict("records")
+    for job in jobs + [{"relevant_skills": "SPLICE & DICE, ctr optimization", "job_types": ["Video Editor"]}]:
+        scores = index.score(job)
+        assert scores.max() > 0
+        assert scores.tolist() == [pre_filter_score(row, job) for row in rows]